@@ -0,0 +1,53 @@
+# Copyright (C) 2021 Dimitrios-Georgios Akestoridis
+#
+# This file is part of Zigator.
+#
+# Zigator is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 only,
+# as published by the Free Software Foundation.
+#
+# Zigator is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Zigator. If not, see <https://www.gnu.org/licenses/>.
+
+import json
+
+
+# Define the order in which SQLite sorts values of different storage classes
+STORAGE_CLASS_RANKS = {
+    type(None): 0,
+    int: 1,
+    float: 1,
+    str: 2,
+    bytes: 3,
+}
+
+
+def get_task_key(task):
+    """Return a string that identifies the definition of a task."""
+    return json.dumps(task)
+
+
+def merge_aggregates(aggregate, other):
+    """Merge two aggregates that map tuples of values to their counts."""
+    merged = dict(aggregate)
+    for values in other.keys():
+        merged[values] = merged.get(values, 0) + other[values]
+    return merged
+
+
+def sqlite_sorter(var_value):
+    """Sort tuples of values in the same order as a GROUP BY clause."""
+    sort_key = []
+    for value in var_value:
+        if type(value) not in STORAGE_CLASS_RANKS.keys():
+            raise ValueError("Unexpected type: {}".format(type(value)))
+        elif value is None:
+            sort_key.append((0, 0))
+        else:
+            sort_key.append((STORAGE_CLASS_RANKS[type(value)], value))
+    return tuple(sort_key)
@@ -17,123 +17,59 @@
 import logging
 import os
 
+from itertools import groupby
 from operator import itemgetter
 
 from .. import config
 
 
-def battery_percentages(db_filepath, out_dirpath):
-    """Extract battery percentage measurements."""
-    # Make sure that the output directory exists
-    os.makedirs(out_dirpath, exist_ok=True)
+# Define the conditions of the packets that may report battery percentages
+DEVICE_CONDITIONS = [
+    ("error_msg", None),
+    ("der_same_macnwksrc", "Same MAC/NWK Src: True"),
+    ("aps_frametype", "0b00: APS Data"),
+    ("aps_profile_id", "0x0104: Zigbee Home Automation (ZHA)"),
+    ("aps_cluster_id", "0x0001: Power Configuration"),
+]
 
-    # Initialize the dictionary of battery percentage measurements
-    measurements = {}
-    logging.info("Extracting battery percentage measurements...")
 
-    # Connect to the provided database
-    config.db.connect(db_filepath)
+def extract_measurements(database, out_dirpath, shard_conditions=None):
+    logging.debug("Extracting battery percentage measurements...")
+    if shard_conditions is None:
+        shard_conditions = []
 
-    # Extract measurements from Read Attribute Response commands
-    fetched_tuples = config.db.fetch_values(
-        "packets",
+    # Extract measurements from the reported Battery Percentage Remaining
+    # attributes of Read Attributes Response and Report Attributes commands,
+    # sorted by device so that each output file is written in turn, while
+    # measurements with equal timestamps are sorted by command and packet
+    fetched_tuples = database.iter_zcl_attributes(
+        "0x0001: Power Configuration",
+        "0x0021",
+        "0x20: Unsigned 8-bit integer",
         [
             "pkt_time",
-            "zcl_readattributesresponse_identifiers",
-            "zcl_readattributesresponse_statuses",
-            "zcl_readattributesresponse_datatypes",
-            "zcl_readattributesresponse_values",
             "der_nwk_srcextendedaddr",
         ],
+        DEVICE_CONDITIONS + shard_conditions,
         [
-            ("error_msg", None),
-            ("der_same_macnwksrc", "Same MAC/NWK Src: True"),
-            ("aps_frametype", "0b00: APS Data"),
-            ("aps_profile_id", "0x0104: Zigbee Home Automation (ZHA)"),
-            ("aps_cluster_id", "0x0001: Power Configuration"),
-            ("zcl_cmd_id", "0x01: Read Attributes Response"),
-        ],
-        False)
-    for fetched_tuple in fetched_tuples:
-        pkt_time = fetched_tuple[0]
-        identifiers = fetched_tuple[1].split(",")
-        statuses = fetched_tuple[2].split(",")
-        datatypes = fetched_tuple[3].split(",")
-        values = fetched_tuple[4].split(",")
-        srcextendedaddr = fetched_tuple[5]
-        if (len(identifiers) != len(statuses)
-                or len(identifiers) != len(datatypes)
-                or len(identifiers) != len(values)):
-            logging.warning("Invalid ZCL Read Attributes Response entries")
-            continue
-        for i in range(len(identifiers)):
-            if identifiers[i] == "0x0021":
-                if (statuses[i] == "0x00: SUCCESS"
-                        and datatypes[i] == "0x20: Unsigned 8-bit integer"):
-                    percentage = "{:.1f}".format(int(values[i], 16) / 2.0)
-                    measurement = (pkt_time, percentage)
-                    if srcextendedaddr not in measurements.keys():
-                        measurements[srcextendedaddr] = [measurement]
-                    else:
-                        measurements[srcextendedaddr].append(measurement)
-                break
-            else:
-                continue
-
-    # Extract measurements from Report Attributes commands
-    fetched_tuples = config.db.fetch_values(
-        "packets",
-        [
-            "pkt_time",
-            "zcl_reportattributes_identifiers",
-            "zcl_reportattributes_datatypes",
-            "zcl_reportattributes_data",
             "der_nwk_srcextendedaddr",
-        ],
-        [
-            ("error_msg", None),
-            ("der_same_macnwksrc", "Same MAC/NWK Src: True"),
-            ("aps_frametype", "0b00: APS Data"),
-            ("aps_profile_id", "0x0104: Zigbee Home Automation (ZHA)"),
-            ("aps_cluster_id", "0x0001: Power Configuration"),
-            ("zcl_cmd_id", "0x0a: Report Attributes"),
-        ],
-        False)
-    for fetched_tuple in fetched_tuples:
-        pkt_time = fetched_tuple[0]
-        identifiers = fetched_tuple[1].split(",")
-        datatypes = fetched_tuple[2].split(",")
-        data = fetched_tuple[3].split(",")
-        srcextendedaddr = fetched_tuple[4]
-        if (len(identifiers) != len(datatypes)
-                or len(identifiers) != len(data)):
-            logging.warning("Invalid ZCL Report Attributes entries")
-            continue
-        for i in range(len(identifiers)):
-            if identifiers[i] == "0x0021":
-                if datatypes[i] == "0x20: Unsigned 8-bit integer":
-                    percentage = "{:.1f}".format(int(data[i], 16) / 2.0)
-                    measurement = (pkt_time, percentage)
-                    if srcextendedaddr not in measurements.keys():
-                        measurements[srcextendedaddr] = [measurement]
-                    else:
-                        measurements[srcextendedaddr].append(measurement)
-                break
-            else:
-                continue
-
-    # Disconnect from the provided database
-    config.db.disconnect()
-
-    # Sort the extracted measurements
-    for srcextendedaddr in measurements.keys():
-        measurements[srcextendedaddr].sort(key=itemgetter(0))
+            "pkt_time",
+            "zcl_cmd_id",
+            "rowid",
+        ])
 
     # Write the battery percentage measurements in separate output files
-    for srcextendedaddr in measurements.keys():
+    num_devices = 0
+    for (srcextendedaddr, device_tuples) in groupby(fetched_tuples,
+                                                    key=itemgetter(2)):
         out_filepath = os.path.join(
             out_dirpath,
             "battery-percentages-{}.tsv".format(srcextendedaddr))
-        config.fs.write_tsv(measurements[srcextendedaddr], out_filepath)
-    logging.info("Extracted battery percentage measurements of {} devices"
-                 "".format(len(measurements.keys())))
+        config.fs.write_tsv(
+            ((pkt_time, "{:.1f}".format(int(value, 16) / 2.0))
+             for (value, pkt_time, _) in device_tuples),
+            out_filepath)
+        num_devices += 1
+    logging.debug("Extracted battery percentage measurements of {} devices"
+                  "".format(num_devices))
+    return num_devices
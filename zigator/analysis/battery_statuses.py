@@ -17,114 +17,101 @@
 import logging
 import os
 
+from heapq import merge
+from itertools import groupby
 from operator import itemgetter
 
 from .. import config
 
 
-def battery_statuses(db_filepath, out_dirpath):
-    """Extract battery status measurements."""
-    # Make sure that the output directory exists
-    os.makedirs(out_dirpath, exist_ok=True)
+# Define the conditions of the packets that may report battery statuses
+DEVICE_CONDITIONS = [
+    ("error_msg", None),
+    ("der_same_macnwksrc", "Same MAC/NWK Src: True"),
+    ("aps_frametype", "0b00: APS Data"),
+    ("aps_profile_id", "0x0104: Zigbee Home Automation (ZHA)"),
+    ("aps_cluster_id", "0x0500: IAS Zone"),
+]
 
-    # Initialize the dictionary of battery status measurements
-    measurements = {}
-    logging.info("Extracting battery status measurements...")
 
-    # Connect to the provided database
-    config.db.connect(db_filepath)
+def get_battery_status(zone_status):
+    zone_status = int.from_bytes(
+        bytes.fromhex(zone_status[2:]),
+        byteorder="little")
+    return (zone_status >> 3) & 0b1
 
-    # Extract measurements from Read Attribute Response commands
-    fetched_tuples = config.db.fetch_values(
-        "packets",
+
+def get_sort_key(measurement):
+    # Undefined addresses are sorted first, as they are by SQLite
+    return (measurement[0] is not None, measurement[0], measurement[1])
+
+
+def extract_measurements(database, out_dirpath, shard_conditions=None):
+    logging.debug("Extracting battery status measurements...")
+    if shard_conditions is None:
+        shard_conditions = []
+
+    # Extract measurements from the reported Zone Status attributes
+    # of Read Attributes Response commands, sorted by device and then
+    # by packet for equal timestamps
+    fetched_tuples = database.iter_zcl_attributes(
+        "0x0500: IAS Zone",
+        "0x0002",
+        "0x19: 16-bit bitmap",
         [
             "pkt_time",
-            "zcl_readattributesresponse_identifiers",
-            "zcl_readattributesresponse_statuses",
-            "zcl_readattributesresponse_datatypes",
-            "zcl_readattributesresponse_values",
             "der_nwk_srcextendedaddr",
         ],
+        DEVICE_CONDITIONS
+        + [("zcl_cmd_id", "0x01: Read Attributes Response")]
+        + shard_conditions,
         [
-            ("error_msg", None),
-            ("der_same_macnwksrc", "Same MAC/NWK Src: True"),
-            ("aps_frametype", "0b00: APS Data"),
-            ("aps_profile_id", "0x0104: Zigbee Home Automation (ZHA)"),
-            ("aps_cluster_id", "0x0500: IAS Zone"),
-            ("zcl_cmd_id", "0x01: Read Attributes Response"),
-        ],
-        False)
-    for fetched_tuple in fetched_tuples:
-        pkt_time = fetched_tuple[0]
-        identifiers = fetched_tuple[1].split(",")
-        statuses = fetched_tuple[2].split(",")
-        datatypes = fetched_tuple[3].split(",")
-        values = fetched_tuple[4].split(",")
-        srcextendedaddr = fetched_tuple[5]
-        if (len(identifiers) != len(statuses)
-                or len(identifiers) != len(datatypes)
-                or len(identifiers) != len(values)):
-            logging.warning("Invalid ZCL Read Attributes Response entries")
-            continue
-        for i in range(len(identifiers)):
-            if identifiers[i] == "0x0002":
-                if (statuses[i] == "0x00: SUCCESS"
-                        and datatypes[i] == "0x19: 16-bit bitmap"):
-                    zone_status = int.from_bytes(
-                        bytes.fromhex(values[i][2:]),
-                        byteorder="little")
-                    battery_status = (zone_status >> 3) & 0b1
-                    measurement = (pkt_time, battery_status)
-                    if srcextendedaddr not in measurements.keys():
-                        measurements[srcextendedaddr] = [measurement]
-                    else:
-                        measurements[srcextendedaddr].append(measurement)
-                break
-            else:
-                continue
+            "der_nwk_srcextendedaddr",
+            "pkt_time",
+            "rowid",
+        ])
+    attribute_measurements = (
+        (srcextendedaddr, pkt_time, get_battery_status(value))
+        for (value, pkt_time, srcextendedaddr) in fetched_tuples
+    )
 
     # Extract measurements from Zone Status Change Notification commands
-    fetched_tuples = config.db.fetch_values(
+    fetched_tuples = database.iter_values(
         "packets",
         [
+            "der_nwk_srcextendedaddr",
             "pkt_time",
             "zcl_iaszone_zonestatuschangenotif_zonestatus",
-            "der_nwk_srcextendedaddr",
-        ],
-        [
-            ("error_msg", None),
-            ("der_same_macnwksrc", "Same MAC/NWK Src: True"),
-            ("aps_frametype", "0b00: APS Data"),
-            ("aps_profile_id", "0x0104: Zigbee Home Automation (ZHA)"),
-            ("aps_cluster_id", "0x0500: IAS Zone"),
-            ("zcl_cmd_id", "0x00: Zone Status Change Notification"),
         ],
-        False)
-    for fetched_tuple in fetched_tuples:
-        pkt_time = fetched_tuple[0]
-        zone_status = int.from_bytes(
-            bytes.fromhex(fetched_tuple[1][2:]),
-            byteorder="little")
-        srcextendedaddr = fetched_tuple[2]
-        battery_status = (zone_status >> 3) & 0b1
-        measurement = (pkt_time, battery_status)
-        if srcextendedaddr not in measurements.keys():
-            measurements[srcextendedaddr] = [measurement]
-        else:
-            measurements[srcextendedaddr].append(measurement)
-
-    # Disconnect from the provided database
-    config.db.disconnect()
-
-    # Sort the extracted measurements
-    for srcextendedaddr in measurements.keys():
-        measurements[srcextendedaddr].sort(key=itemgetter(0))
+        DEVICE_CONDITIONS
+        + [("zcl_cmd_id", "0x00: Zone Status Change Notification")]
+        + shard_conditions,
+        False,
+        sorted_columns=[
+            "der_nwk_srcextendedaddr",
+            "pkt_time",
+            "rowid",
+        ])
+    notification_measurements = (
+        (srcextendedaddr, pkt_time, get_battery_status(zone_status))
+        for (srcextendedaddr, pkt_time, zone_status) in fetched_tuples
+    )
 
-    # Write the battery status measurements in separate output files
-    for srcextendedaddr in measurements.keys():
+    # Write the battery status measurements in separate output files,
+    # while merging the sorted measurements of both types of commands
+    num_devices = 0
+    for (srcextendedaddr, device_measurements) in groupby(
+            merge(attribute_measurements,
+                  notification_measurements,
+                  key=get_sort_key),
+            key=itemgetter(0)):
         out_filepath = os.path.join(
             out_dirpath,
             "battery-statuses-{}.tsv".format(srcextendedaddr))
-        config.fs.write_tsv(measurements[srcextendedaddr], out_filepath)
-    logging.info("Extracted battery status measurements of {} devices"
-                 "".format(len(measurements.keys())))
+        config.fs.write_tsv(
+            (measurement[1:] for measurement in device_measurements),
+            out_filepath)
+        num_devices += 1
+    logging.debug("Extracted battery status measurements of {} devices"
+                  "".format(num_devices))
+    return num_devices
@@ -0,0 +1,341 @@
+# Copyright (C) 2021 Dimitrios-Georgios Akestoridis
+#
+# This file is part of Zigator.
+#
+# Zigator is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 only,
+# as published by the Free Software Foundation.
+#
+# Zigator is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Zigator. If not, see <https://www.gnu.org/licenses/>.
+
+import numpy as np
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    # Shared memory blocks require Python 3.8 or later
+    shared_memory = None
+
+from .. import config
+from .distinct_matches import COLUMN_MATCHES
+from .field_values import INSPECTED_COLUMNS as FIELD_INSPECTED_COLUMNS
+from .field_values import PACKET_TYPES as FIELD_PACKET_TYPES
+from .form_frequencies import INSPECTED_COLUMNS as FORM_INSPECTED_COLUMNS
+from .form_frequencies import PACKET_TYPES as FORM_PACKET_TYPES
+from .matching_frequencies import CONDITION_MATCHES
+from .selected_frequencies import CONDITION_SELECTIONS
+
+
+# Define the number of rows whose distinct codes are computed at a time
+CHUNK_SIZE = 1000000
+
+
+def get_condition_columns(conditions):
+    return [condition[0].lstrip("!") for condition in conditions]
+
+
+def get_required_columns():
+    """Return the columns that the condition-based analyses examine."""
+    column_names = set(["error_msg"])
+    for condition_match in CONDITION_MATCHES:
+        column_names.update(condition_match[1])
+        column_names.update(get_condition_columns(condition_match[2]))
+    for column_match in COLUMN_MATCHES:
+        column_names.update(column_match[1])
+        column_names.update(get_condition_columns(column_match[2]))
+        column_names.update(column_match[3:])
+    for condition_selection in CONDITION_SELECTIONS:
+        for selection in condition_selection[1:]:
+            column_names.update(get_condition_columns(selection[1:]))
+    for packet_type in FORM_PACKET_TYPES + FIELD_PACKET_TYPES:
+        column_names.update(get_condition_columns(packet_type[1]))
+    column_names.update(FORM_INSPECTED_COLUMNS)
+    column_names.update(FIELD_INSPECTED_COLUMNS)
+    return [
+        column_name for column_name in config.db.PKT_COLUMN_NAMES
+        if column_name in column_names
+    ]
+
+
+class ColumnEngine(object):
+    """Dictionary-encoded columns of the packets table in memory.
+
+    The columns are loaded with a single scan of the packets table and
+    each condition is evaluated as a boolean mask over their codes. The
+    supported queries mirror those of the Database class, so that the
+    analysis workers can use either of them. Once shared, the codes are
+    stored in shared memory blocks, to which the worker processes attach
+    instead of copying them, regardless of how the processes are started.
+    Equal values of different types, such as 1 and 1.0, are encoded
+    separately, so that they are decoded as they were stored.
+    """
+
+    def __init__(self, database, column_names,
+                 fetch_size=config.db.FETCH_SIZE):
+        self.num_rows = 0
+        self.codes = {}
+        self.values = {}
+        self.lookups = {column_name: {} for column_name in column_names}
+        self.blocks = {}
+
+        # Encode the values of each column while scanning the table once
+        code_chunks = {column_name: [] for column_name in column_names}
+        rows = []
+        for row in database.iter_values("packets", column_names, None, False,
+                                        fetch_size):
+            rows.append(row)
+            if len(rows) == fetch_size:
+                self.encode_rows(column_names, rows, code_chunks)
+                rows = []
+        if len(rows) > 0:
+            self.encode_rows(column_names, rows, code_chunks)
+
+        # Use the smallest data type that can hold the codes of each column
+        for column_name in column_names:
+            lookup = self.lookups[column_name]
+            values = [None] * len(lookup)
+            for key in lookup.keys():
+                values[lookup[key]] = key[1]
+            self.values[column_name] = values
+            if len(code_chunks[column_name]) > 0:
+                codes = np.concatenate(code_chunks[column_name])
+            else:
+                codes = np.zeros(0, dtype=np.int64)
+            self.codes[column_name] = codes.astype(
+                np.min_scalar_type(max(len(values) - 1, 0)))
+
+    def encode_rows(self, column_names, rows, code_chunks):
+        self.num_rows += len(rows)
+        columns = list(zip(*rows))
+        for i in range(len(column_names)):
+            lookup = self.lookups[column_names[i]]
+            code_chunks[column_names[i]].append(
+                np.array(
+                    [lookup.setdefault((type(value), value), len(lookup))
+                     for value in columns[i]],
+                    dtype=np.int64))
+
+    def __getstate__(self):
+        # Processes that are spawned attach to the shared memory blocks
+        # of the codes instead of receiving copies of them
+        state = dict(self.__dict__)
+        if len(self.blocks) > 0:
+            state["codes"] = {
+                column_name: (self.blocks[column_name].name,
+                              codes.dtype.str,
+                              len(codes))
+                for (column_name, codes) in self.codes.items()
+            }
+            state["blocks"] = {}
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        for (column_name, codes) in self.codes.items():
+            if isinstance(codes, tuple):
+                name, dtype, num_codes = codes
+                self.blocks[column_name] = shared_memory.SharedMemory(
+                    name=name)
+                self.codes[column_name] = np.ndarray(
+                    (num_codes,),
+                    dtype=dtype,
+                    buffer=self.blocks[column_name].buf)
+
+    def share(self):
+        """Move the codes of the columns into shared memory blocks."""
+        # Without shared memory blocks, forked processes still share the
+        # codes copy-on-write, while spawned processes copy them
+        if shared_memory is None:
+            return
+        for (column_name, codes) in self.codes.items():
+            block = shared_memory.SharedMemory(create=True,
+                                               size=max(codes.nbytes, 1))
+            shared_codes = np.ndarray(codes.shape, dtype=codes.dtype,
+                                      buffer=block.buf)
+            shared_codes[:] = codes
+            self.blocks[column_name] = block
+            self.codes[column_name] = shared_codes
+
+    def close(self):
+        """Detach from the shared memory blocks of the codes."""
+        # The views of the blocks have to be released before closing them
+        self.codes = {}
+        for block in self.blocks.values():
+            block.close()
+
+    def unlink(self):
+        """Free the shared memory blocks, once no process uses them."""
+        blocks = list(self.blocks.values())
+        self.close()
+        for block in blocks:
+            block.unlink()
+        self.blocks = {}
+
+    def get_codes(self, column_name, value):
+        # Equal integers and real numbers match each other, as in SQLite,
+        # even though they are encoded separately
+        keys = [(type(value), value)]
+        if isinstance(value, (int, float)):
+            keys.extend([(int, value), (float, value)])
+        lookup = self.lookups[column_name]
+        return sorted(set(lookup[key] for key in keys if key in lookup))
+
+    def get_mask(self, conditions):
+        mask = np.ones(self.num_rows, dtype=bool)
+        if conditions is None:
+            return mask
+        for condition in conditions:
+            param = condition[0]
+            value = condition[1]
+            if param[0] == "!":
+                neq = True
+                param = param[1:]
+            else:
+                neq = False
+            if param not in self.codes.keys():
+                raise ValueError("Unknown column name \"{}\"".format(param))
+            codes = self.codes[param]
+            if neq:
+                # Undefined values never satisfy an inequality
+                mask &= ~np.isin(codes, self.get_codes(param, None))
+                if value is not None:
+                    mask &= ~np.isin(codes, self.get_codes(param, value))
+            else:
+                # Values that never appeared do not match any code
+                mask &= np.isin(codes, self.get_codes(param, value))
+        return mask
+
+    def get_selected_codes(self, selected_columns, mask, start=0,
+                           end=None):
+        # Sanity check
+        if len(selected_columns) == 0:
+            raise ValueError("At least one selected column is required")
+
+        if end is None:
+            end = self.num_rows
+        return np.stack(
+            [self.codes[column_name][start:end][mask[start:end]].astype(
+                np.int64)
+             for column_name in selected_columns],
+            axis=1)
+
+    def get_grouped_codes(self, selected_columns, mask):
+        # Combine the codes of the selected columns into a single key,
+        # whose order matches the lexicographic order of the codes,
+        # unless the number of their combinations is too large
+        radixes = [
+            max(len(self.values[column_name]), 1)
+            for column_name in selected_columns
+        ]
+        weights = [1] * len(radixes)
+        for i in reversed(range(len(radixes) - 1)):
+            weights[i] = weights[i + 1] * radixes[i + 1]
+        packed = weights[0] * radixes[0] <= np.iinfo(np.int64).max
+
+        # Count the distinct codes of each chunk of rows and merge them
+        # with those of the previous chunks, so that the memory usage
+        # depends on the number of distinct codes, not matching rows
+        grouped_codes = None
+        counts = None
+        for start in range(0, self.num_rows, CHUNK_SIZE):
+            chunk_codes = self.get_selected_codes(
+                selected_columns,
+                mask,
+                start,
+                start + CHUNK_SIZE)
+            if packed:
+                chunk_codes = chunk_codes @ np.array(weights, dtype=np.int64)
+            chunk_codes, chunk_counts = np.unique(
+                chunk_codes,
+                axis=0,
+                return_counts=True)
+            if grouped_codes is None:
+                grouped_codes = chunk_codes
+                counts = chunk_counts
+                continue
+            grouped_codes, inverse = np.unique(
+                np.concatenate((grouped_codes, chunk_codes)),
+                axis=0,
+                return_inverse=True)
+            counts = np.bincount(
+                inverse.reshape(-1),
+                weights=np.concatenate((counts, chunk_counts)),
+                minlength=len(grouped_codes)).astype(np.int64)
+        if grouped_codes is None:
+            grouped_codes = self.get_selected_codes(selected_columns, mask)
+            counts = np.zeros(0, dtype=np.int64)
+        elif packed:
+            grouped_codes = np.stack(
+                [(grouped_codes // weights[i]) % radixes[i]
+                 for i in range(len(radixes))],
+                axis=1)
+        return grouped_codes, counts
+
+    def decode(self, selected_columns, selected_codes):
+        return [
+            tuple(self.values[selected_columns[i]][codes[i]]
+                  for i in range(len(selected_columns)))
+            for codes in selected_codes.tolist()
+        ]
+
+    def matching_frequency(self, tablename, conditions):
+        check_tablename(tablename)
+        return int(np.count_nonzero(self.get_mask(conditions)))
+
+    def fetch_values(self, tablename, selected_columns, conditions,
+                     distinct):
+        check_tablename(tablename)
+        if distinct:
+            selected_codes, _ = self.get_grouped_codes(
+                selected_columns,
+                self.get_mask(conditions))
+        else:
+            selected_codes = self.get_selected_codes(
+                selected_columns,
+                self.get_mask(conditions))
+        return self.decode(selected_columns, selected_codes)
+
+    def count_values(self, tablename, selected_columns, conditions):
+        check_tablename(tablename)
+        mask = self.get_mask(conditions)
+        column_counts = []
+        for column_name in selected_columns:
+            values = self.values[column_name]
+            counts = np.bincount(
+                self.codes[column_name][mask],
+                minlength=len(values))
+            column_counts.extend(
+                (column_name, values[code], int(counts[code]))
+                for code in np.flatnonzero(counts).tolist())
+        return column_counts
+
+    def grouped_count(self, tablename, selected_columns, count_errors,
+                      conditions=None):
+        check_tablename(tablename)
+
+        # Do not count entries with errors, unless requested
+        if not count_errors:
+            if conditions is None:
+                conditions = []
+            conditions = [("error_msg", None)] + list(conditions)
+
+        selected_codes, counts = self.get_grouped_codes(
+            selected_columns,
+            self.get_mask(conditions))
+        return [
+            values + (count,)
+            for (values, count) in zip(
+                self.decode(selected_columns, selected_codes),
+                counts.tolist())
+        ]
+
+
+def check_tablename(tablename):
+    if tablename != "packets":
+        raise ValueError("Unknown table name \"{}\"".format(tablename))
@@ -0,0 +1,153 @@
+# Copyright (C) 2021 Dimitrios-Georgios Akestoridis
+#
+# This file is part of Zigator.
+#
+# Zigator is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 only,
+# as published by the Free Software Foundation.
+#
+# Zigator is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Zigator. If not, see <https://www.gnu.org/licenses/>.
+import heapq
+from collections import Counter
+from itertools import compress
+
+from .. import config
+from .aggregates import sqlite_sorter
+from .sketches import HyperLogLog
+from .sketches import hash_values
+
+
+# Define the number of rows that are examined at a time
+CHUNK_SIZE = 10000
+
+# Define the maximum number of values whose frequencies are stored
+MAX_TOP_VALUES = 1000
+
+# Define the relative error of the approximate distinct counts
+DISTINCT_ERROR = 0.01
+
+
+class ColumnSummary(object):
+    """Statistics of the values of a column that are updated per chunk.
+
+    The frequencies of the values are counted exactly until they exceed
+    twice the maximum number of stored values. After that point, the
+    counts of all values are reduced by the same amount whenever needed,
+    which bounds the error of the most frequent values, and the distinct
+    values are counted with a HyperLogLog sketch.
+    """
+
+    def __init__(self):
+        self.num_rows = 0
+        self.null_count = 0
+        self.min_value = None
+        self.max_value = None
+        self.frequencies = Counter()
+        self.top_error = 0
+        self.distinct_values = None
+
+    def update(self, values):
+        chunk_frequencies = Counter(values)
+        self.num_rows += sum(chunk_frequencies.values())
+        self.null_count += chunk_frequencies.pop(None, 0)
+        if len(chunk_frequencies) == 0:
+            return
+
+        # Update the range of values in the order of SQLite
+        chunk_values = list(chunk_frequencies.keys())
+        if self.min_value is not None:
+            chunk_values.extend([self.min_value, self.max_value])
+        self.min_value = min(chunk_values, key=lambda x: sqlite_sorter((x,)))
+        self.max_value = max(chunk_values, key=lambda x: sqlite_sorter((x,)))
+
+        if self.distinct_values is not None:
+            for value in chunk_frequencies.keys():
+                self.distinct_values.add(hash_values(value))
+        self.frequencies.update(chunk_frequencies)
+        if len(self.frequencies) > 2 * MAX_TOP_VALUES:
+            if self.distinct_values is None:
+                # All the distinct values have been counted so far
+                self.distinct_values = HyperLogLog(DISTINCT_ERROR)
+                for value in self.frequencies.keys():
+                    self.distinct_values.add(hash_values(value))
+            self.reduce()
+
+    def reduce(self):
+        # Keep only the most frequent values
+        threshold = heapq.nlargest(
+            MAX_TOP_VALUES + 1,
+            self.frequencies.values())[-1]
+        for value in list(self.frequencies.keys()):
+            self.frequencies[value] -= threshold
+            if self.frequencies[value] <= 0:
+                del self.frequencies[value]
+        self.top_error += threshold
+
+    def get_stats(self):
+        if self.distinct_values is None:
+            distinct_count = len(self.frequencies)
+        else:
+            distinct_count = self.distinct_values.count()
+        if len(self.frequencies) > MAX_TOP_VALUES:
+            self.reduce()
+        top_values = sorted(
+            self.frequencies.items(),
+            key=lambda x: (-x[1], sqlite_sorter((x[0],))))
+        return (
+            self.num_rows,
+            self.null_count,
+            distinct_count,
+            self.min_value,
+            self.max_value,
+            top_values,
+            self.top_error,
+        )
+
+
+def compute_column_stats(database):
+    """Compute the statistics of every column of the packets table."""
+    # The statistics of the error messages cover all the packets,
+    # while those of the other columns cover the packets without errors,
+    # similar to the frequencies of the analysis methods
+    column_names = config.db.PKT_COLUMN_NAMES
+    if database.lazy:
+        # The lazy columns are dissected only when they are queried
+        column_names = [
+            column_name for column_name in column_names
+            if column_name not in config.db.LAZY_PKT_COLUMNS
+        ]
+    error_index = column_names.index("error_msg")
+    summaries = [ColumnSummary() for _ in column_names]
+
+    # Examine the values of all the columns with a single pass
+    watermark = database.get_max_rowid("packets")
+    database.set_rowid_range(None, watermark)
+    rows = database.iter_values("packets", column_names, None, False,
+                                CHUNK_SIZE)
+    while True:
+        chunk = [row for (_, row) in zip(range(CHUNK_SIZE), rows)]
+        if len(chunk) == 0:
+            break
+        columns = list(zip(*chunk))
+        valid_rows = [error_msg is None for error_msg in columns[error_index]]
+        for i in range(len(column_names)):
+            if i == error_index:
+                summaries[i].update(columns[i])
+            else:
+                summaries[i].update(compress(columns[i], valid_rows))
+    database.set_rowid_range()
+
+    # Store the statistics along with the last row that they cover
+    database.store_column_stats(
+        watermark,
+        {
+            column_names[i]: summaries[i].get_stats()
+            for i in range(len(column_names))
+        })
+    return len(column_names)
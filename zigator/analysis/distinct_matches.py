@@ -14,8 +14,6 @@
 # You should have received a copy of the GNU General Public License
 # along with Zigator. If not, see <https://www.gnu.org/licenses/>.
 
-import logging
-import multiprocessing as mp
 import os
 
 from .. import config
@@ -908,90 +906,41 @@ COLUMN_MATCHES = [
 ]
 
 
-def worker(db_filepath, out_dirpath, task_index, task_lock):
-    # Connect to the provided database
-    config.db.connect(db_filepath)
+def aggregate_task(database, column_match):
+    # Count the matching packets for each distinct combination of values
+    # of the varying columns and the listed columns
+    grouped_counts = database.grouped_count(
+        "packets",
+        list(column_match[1]) + list(column_match[3:]),
+        True,
+        column_match[2])
+    return {
+        grouped_count[:-1]: grouped_count[-1]
+        for grouped_count in grouped_counts
+    }
 
-    while True:
-        with task_lock:
-            # Get the next task
-            if task_index.value < len(COLUMN_MATCHES):
-                column_match = COLUMN_MATCHES[task_index.value]
-                task_index.value += 1
-            else:
-                break
 
-        # Derive the path of the output file, the varying columns,
-        # the matching conditions, and the list of column names
-        out_filepath = os.path.join(out_dirpath, column_match[0])
-        var_columns = column_match[1]
-        conditions = column_match[2]
-        column_names = list(column_match[3:])
+def write_task(out_dirpath, column_match, aggregate):
+    # Derive the path of the output file and the number of varying columns
+    out_filepath = os.path.join(out_dirpath, column_match[0])
+    num_var_columns = len(column_match[1])
 
-        # Compute the distinct values of the varying columns
-        var_values = config.db.fetch_values(
-            "packets",
-            var_columns,
-            conditions,
-            True)
-        var_values.sort(key=config.custom_sorter)
-
-        # Fetch the distinct values with the listed columns
-        fetched_tuples = config.db.fetch_values(
-            "packets",
-            list(var_columns) + column_names,
-            conditions,
-            True)
-
-        # Compute the distinct matches for each value
-        distinct_matches = [set() for _ in range(len(var_values))]
-        for fetched_tuple in fetched_tuples:
-            var_value = fetched_tuple[:len(var_columns)]
-            mat_value = fetched_tuple[len(var_columns):]
-            distinct_matches[var_values.index(var_value)].add(mat_value)
-        results = []
-        for i in range(len(var_values)):
-            matches = list(distinct_matches[i])
-            matches.sort(key=config.custom_sorter)
-            results.append((var_values[i], matches))
-
-        # Write the distinct matches in the output file
-        config.fs.write_tsv(results, out_filepath)
-
-    # Disconnect from the provided database
-    config.db.disconnect()
-
-
-def distinct_matches(db_filepath, out_dirpath, num_workers):
-    """Compute the distinct matching values for certain conditions."""
-    # Make sure that the output directory exists
-    os.makedirs(out_dirpath, exist_ok=True)
-
-    # Determine the number of processes that will be used
-    if num_workers is None:
-        if hasattr(os, "sched_getaffinity"):
-            num_workers = len(os.sched_getaffinity(0))
+    # Compute the distinct matches for each value of the varying columns
+    distinct_matches = {}
+    for fetched_tuple in aggregate.keys():
+        var_value = fetched_tuple[:num_var_columns]
+        mat_value = fetched_tuple[num_var_columns:]
+        if var_value not in distinct_matches.keys():
+            distinct_matches[var_value] = [mat_value]
         else:
-            num_workers = mp.cpu_count()
-    if num_workers < 1:
-        num_workers = 1
-    logging.info("Computing the distinct matching values "
-                 "for {} conditions using {} workers..."
-                 "".format(len(COLUMN_MATCHES), num_workers))
-
-    # Create variables that will be shared by the processes
-    task_index = mp.Value("L", 0, lock=False)
-    task_lock = mp.Lock()
-
-    # Start the processes
-    processes = []
-    for _ in range(num_workers):
-        p = mp.Process(target=worker,
-                       args=(db_filepath, out_dirpath, task_index, task_lock))
-        p.start()
-        processes.append(p)
+            distinct_matches[var_value].append(mat_value)
+    var_values = list(distinct_matches.keys())
+    var_values.sort(key=config.custom_sorter)
+    results = []
+    for var_value in var_values:
+        matches = distinct_matches[var_value]
+        matches.sort(key=config.custom_sorter)
+        results.append((var_value, matches))
 
-    # Make sure that all processes terminated
-    for p in processes:
-        p.join()
-    logging.info("All {} workers completed their tasks".format(num_workers))
+    # Write the distinct matches in the output file
+    config.fs.write_tsv(results, out_filepath)
@@ -14,8 +14,6 @@
 # You should have received a copy of the GNU General Public License
 # along with Zigator. If not, see <https://www.gnu.org/licenses/>.
 
-import logging
-import multiprocessing as mp
 import os
 
 from .. import config
@@ -269,77 +267,25 @@ PACKET_TYPES = [
 ]
 
 
-def worker(db_filepath, out_dirpath, task_index, task_lock):
-    # Connect to the provided database
-    config.db.connect(db_filepath)
+def aggregate_task(database, packet_type):
+    # Compute the matching frequency for each form
+    # by grouping the matching packets by their inspected values
+    grouped_counts = database.grouped_count(
+        "packets",
+        INSPECTED_COLUMNS,
+        True,
+        packet_type[1])
+    return {
+        grouped_count[:-1]: grouped_count[-1]
+        for grouped_count in grouped_counts
+    }
 
-    while True:
-        with task_lock:
-            # Get the next task
-            if task_index.value < len(PACKET_TYPES):
-                packet_type = PACKET_TYPES[task_index.value]
-                task_index.value += 1
-            else:
-                break
 
-        # Derive the path of the output file and the matching conditions
-        out_filepath = os.path.join(out_dirpath, packet_type[0])
-        conditions = packet_type[1]
+def write_task(out_dirpath, packet_type, aggregate):
+    # Derive the path of the output file
+    out_filepath = os.path.join(out_dirpath, packet_type[0])
 
-        # Compute the distinct matching values of the inspected columns
-        form_values = config.db.fetch_values(
-            "packets",
-            INSPECTED_COLUMNS,
-            conditions,
-            True)
-        form_values.sort(key=config.custom_sorter)
-
-        # Compute the matching frequency for each form
-        results = []
-        for form_value in form_values:
-            form_conditions = list(conditions)
-            for i in range(len(form_value)):
-                form_conditions.append((INSPECTED_COLUMNS[i], form_value[i]))
-            matches = config.db.matching_frequency("packets", form_conditions)
-            results.append((form_value, matches))
-
-        # Write the frequency of each form in the output file
-        config.fs.write_tsv(results, out_filepath)
-
-    # Disconnect from the provided database
-    config.db.disconnect()
-
-
-def form_frequencies(db_filepath, out_dirpath, num_workers):
-    """Compute the frequency of forms for certain packet types."""
-    # Make sure that the output directory exists
-    os.makedirs(out_dirpath, exist_ok=True)
-
-    # Determine the number of processes that will be used
-    if num_workers is None:
-        if hasattr(os, "sched_getaffinity"):
-            num_workers = len(os.sched_getaffinity(0))
-        else:
-            num_workers = mp.cpu_count()
-    if num_workers < 1:
-        num_workers = 1
-    logging.info("Computing the frequency of forms "
-                 "for {} packet types using {} workers..."
-                 "".format(len(PACKET_TYPES), num_workers))
-
-    # Create variables that will be shared by the processes
-    task_index = mp.Value("L", 0, lock=False)
-    task_lock = mp.Lock()
-
-    # Start the processes
-    processes = []
-    for _ in range(num_workers):
-        p = mp.Process(target=worker,
-                       args=(db_filepath, out_dirpath, task_index, task_lock))
-        p.start()
-        processes.append(p)
-
-    # Make sure that all processes terminated
-    for p in processes:
-        p.join()
-    logging.info("All {} workers completed their tasks".format(num_workers))
+    # Write the frequency of each form in the output file
+    results = list(aggregate.items())
+    results.sort(key=lambda x: config.custom_sorter(x[0]))
+    config.fs.write_tsv(results, out_filepath)
@@ -0,0 +1,172 @@
+# Copyright (C) 2021 Dimitrios-Georgios Akestoridis
+#
+# This file is part of Zigator.
+#
+# Zigator is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 only,
+# as published by the Free Software Foundation.
+#
+# Zigator is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Zigator. If not, see <https://www.gnu.org/licenses/>.
+
+import logging
+import time
+
+from .distinct_matches import COLUMN_MATCHES
+from .field_values import PACKET_TYPES as FIELD_PACKET_TYPES
+from .form_frequencies import PACKET_TYPES as FORM_PACKET_TYPES
+from .matching_frequencies import CONDITION_MATCHES
+from .selected_frequencies import CONDITION_SELECTIONS
+
+
+# Define the prefix of the names of the advised indexes
+INDEX_PREFIX = "advised_"
+
+# Define the maximum number of columns in each advised index
+MAX_INDEX_COLUMNS = 3
+
+# Define the minimum number of query patterns that an index should serve
+MIN_INDEX_USES = 3
+
+# Define the columns of the index that serves the ranges of devices that
+# the battery analysis methods examine, sorted by device and capture time
+DEVICE_INDEX_COLUMNS = [
+    "aps_cluster_id",
+    "der_nwk_srcextendedaddr",
+    "pkt_time",
+]
+
+
+def get_query_patterns():
+    # Collect the conditions and the varying columns of analysis queries
+    patterns = []
+    for condition_match in CONDITION_MATCHES:
+        patterns.append((condition_match[2], condition_match[1]))
+    for column_match in COLUMN_MATCHES:
+        patterns.append((column_match[2], column_match[1]))
+    for condition_selection in CONDITION_SELECTIONS:
+        for selection in condition_selection[1:]:
+            patterns.append((selection[1:], ()))
+    for packet_type in FORM_PACKET_TYPES + FIELD_PACKET_TYPES:
+        patterns.append((packet_type[1], ()))
+    return patterns
+
+
+def get_equality_columns(conditions):
+    return set(
+        condition[0] for condition in conditions
+        if condition[0][0] != "!" and condition[1] is not None
+    )
+
+
+def advise_indexes():
+    """Return the indexes that would serve the analysis query patterns."""
+    patterns = get_query_patterns()
+
+    # Columns that are examined more often should lead the indexes,
+    # so that different query patterns can share them
+    column_uses = {}
+    for (conditions, _) in patterns:
+        for column_name in get_equality_columns(conditions):
+            column_uses[column_name] = column_uses.get(column_name, 0) + 1
+
+    # Count the query patterns that each candidate index would serve
+    candidate_uses = {}
+    for (conditions, var_columns) in patterns:
+        column_names = sorted(
+            get_equality_columns(conditions),
+            key=lambda x: (-column_uses[x], x))
+        if len(column_names) == 0:
+            column_names = list(var_columns)
+        if len(column_names) == 0:
+            continue
+        partial = ("error_msg", None) in conditions
+        candidate = (tuple(column_names[:MAX_INDEX_COLUMNS]), partial)
+        candidate_uses[candidate] = candidate_uses.get(candidate, 0) + 1
+
+    # Candidates whose columns are a prefix of the columns of another
+    # candidate with the same partiality are served by the latter
+    advised_uses = {}
+    for candidate in sorted(candidate_uses.keys(),
+                            key=lambda x: (-len(x[0]), x)):
+        target = candidate
+        for advised in advised_uses.keys():
+            if (advised[1] == candidate[1]
+                    and advised[0][:len(candidate[0])] == candidate[0]):
+                target = advised
+                break
+        advised_uses[target] = (
+            advised_uses.get(target, 0) + candidate_uses[candidate]
+        )
+
+    # Derive the name and the definition of each advised index
+    indexes = []
+    for (column_names, partial) in sorted(advised_uses.keys()):
+        if advised_uses[(column_names, partial)] < MIN_INDEX_USES:
+            continue
+        indexname = INDEX_PREFIX + "__".join(column_names)
+        conditions = None
+        if partial:
+            indexname += "__without_errors"
+            conditions = [("error_msg", None)]
+        indexes.append((indexname, list(column_names), conditions))
+
+    # The packets of each range of devices are sorted by the same index
+    indexname = INDEX_PREFIX + "__".join(DEVICE_INDEX_COLUMNS)
+    indexname += "__without_errors"
+    if indexname not in set(index[0] for index in indexes):
+        indexes.append(
+            (indexname, list(DEVICE_INDEX_COLUMNS), [("error_msg", None)]))
+    return indexes
+
+
+def create_indexes(database, analyze=True):
+    """Create the advised indexes of the packets table."""
+    # Drop the indexes that are no longer advised
+    indexes = advise_indexes()
+    indexnames = set(index[0] for index in indexes)
+    for indexname in database.fetch_index_names("packets"):
+        if indexname.startswith(INDEX_PREFIX) and indexname not in indexnames:
+            database.drop_index(indexname)
+            logging.debug("Dropped the index \"{}\"".format(indexname))
+
+    # Create the advised indexes that do not already exist
+    existing_indexnames = set(database.fetch_index_names("packets"))
+    total_time = 0.0
+    total_size = 0
+    num_indexes = 0
+    for (indexname, column_names, conditions) in indexes:
+        if indexname in existing_indexnames:
+            continue
+        start_time = time.time()
+        start_size = database.get_size()
+        try:
+            database.create_index(indexname, "packets", column_names,
+                                  conditions)
+        except ValueError as err:
+            # Some indexes cannot be served by the partitioned layouts
+            logging.debug("Skipped the index \"{}\": {}"
+                          "".format(indexname, str(err)))
+            continue
+        index_time = time.time() - start_time
+        index_size = database.get_size() - start_size
+        logging.debug("Created the index \"{}\" in {:.3f} seconds "
+                      "using {} bytes".format(indexname, index_time,
+                                              index_size))
+        total_time += index_time
+        total_size += index_size
+        num_indexes += 1
+
+    # Update the statistics that the query planner uses
+    if analyze or num_indexes > 0:
+        start_time = time.time()
+        database.analyze()
+        total_time += time.time() - start_time
+    database.commit()
+
+    return num_indexes, total_time, total_size
@@ -16,64 +16,204 @@
 
 import logging
 import os
+from datetime import datetime
+from datetime import timezone
+from itertools import product
 
-from .battery_percentages import battery_percentages
-from .battery_statuses import battery_statuses
-from .distinct_matches import distinct_matches
-from .field_values import field_values
-from .form_frequencies import form_frequencies
-from .group_frequencies import group_frequencies
-from .matching_frequencies import matching_frequencies
-from .selected_frequencies import selected_frequencies
-from .solo_frequencies import solo_frequencies
+from .. import config
+from .index_advisor import create_indexes
+from .scheduler import BUCKET_SIZES
+from .scheduler import METHODS
+from .scheduler import run_merged_tasks
+from .scheduler import run_tasks
+from .sketches import APPROX_METHODS
+from .sketches import run_sketches
 
 
-def main(db_filepath, out_dirpath, num_workers):
+def get_timestamp(value):
+    """Return the number of seconds since the epoch of a point in time."""
+    # Points in time without a time zone are assumed to be in UTC
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        point = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError("Invalid point in time \"{}\"".format(value))
+    if point.tzinfo is None:
+        point = point.replace(tzinfo=timezone.utc)
+    return point.timestamp()
+
+
+def get_packet_filters(since, until, panid):
+    """Return the conditions that select the examined packets."""
+    packet_filters = []
+    if panid is not None:
+        try:
+            value = int(panid, 16)
+        except ValueError:
+            value = -1
+        if value < 0 or value > 65535:
+            raise ValueError("Invalid PAN ID \"{}\"".format(panid))
+        packet_filters.append(
+            ("der_mac_srcpanid|der_mac_dstpanid", "0x{:04x}".format(value)))
+    if since is not None:
+        packet_filters.append((">=pkt_time", get_timestamp(since)))
+    if until is not None:
+        packet_filters.append(("<pkt_time", get_timestamp(until)))
+    return packet_filters
+
+
+def prepare_database(db_filepath, filter_columns=()):
+    """Create the indexes and tables that the analysis methods use."""
+    database = config.db.Database(db_filepath)
+
+    # The time range and the PAN ID of the examined packets are served
+    # by a separate index, so that the other packets are never scanned,
+    # while conditions on several columns are served by an index for each
+    # of their columns, which SQLite combines for their disjunction
+    filtered = False
+    if len(filter_columns) > 0:
+        for index_columns in product(*(x.split("|") for x in filter_columns)):
+            indexname = "packets_" + "__".join(index_columns)
+            if indexname not in database.fetch_index_names("packets"):
+                database.create_index(indexname, "packets",
+                                      list(index_columns))
+                filtered = True
+                logging.info("Created the index \"{}\"".format(indexname))
+
+    num_indexes, index_time, index_size = create_indexes(
+        database,
+        analyze=filtered)
+    if num_indexes > 0:
+        logging.info("Created {} indexes in {:.3f} seconds using {} bytes"
+                     "".format(num_indexes, index_time, index_size))
+
+    # Make sure that the reported ZCL attributes are stored in their table
+    if not database.table_exists("zcl_attributes"):
+        num_attributes = database.extract_zcl_attributes()
+        database.commit()
+        logging.info("Extracted {} reported ZCL attributes"
+                     "".format(num_attributes))
+    else:
+        # Older databases lack the index on the row IDs of their packets
+        database.create_zcl_attributes_index()
+        database.commit()
+    database.disconnect()
+
+
+def main(db_filepath, out_dirpath, num_workers, in_memory=False,
+         method_names=None, incremental=False, approx=False,
+         approx_epsilon=0.001, approx_delta=0.01, approx_error=0.05,
+         query_cache=False, other_db_filepaths=None, since=None, until=None,
+         panid=None, bucket=None):
     """Analyze traffic stored in a database file."""
-    # Sanity check
-    if not os.path.isfile(db_filepath):
-        raise ValueError("The provided database file \"{}\" "
-                         "does not exist".format(db_filepath))
+    # Sanity checks
+    db_filepaths = [db_filepath]
+    if other_db_filepaths is not None:
+        db_filepaths.extend(other_db_filepaths)
+    for filepath in db_filepaths:
+        if not os.path.isfile(filepath):
+            raise ValueError("The provided database file \"{}\" "
+                             "does not exist".format(filepath))
+    if approx and (in_memory or incremental):
+        raise ValueError("The approximate analysis cannot be performed "
+                         "in memory or incrementally")
+    if len(db_filepaths) > 1 and (approx or in_memory or incremental):
+        raise ValueError("The analysis of multiple databases cannot be "
+                         "approximate, in memory, or incremental")
+    if bucket is not None and bucket not in BUCKET_SIZES.keys():
+        raise ValueError("Unknown time series interval \"{}\""
+                         "".format(bucket))
+    if bucket is not None and (approx or in_memory or incremental):
+        raise ValueError("The analysis of time series cannot be "
+                         "approximate, in memory, or incremental")
+    packet_filters = get_packet_filters(since, until, panid)
+    if len(packet_filters) > 0 and incremental:
+        raise ValueError("The analysis of filtered packets cannot be "
+                         "incremental")
+    merged = len(db_filepaths) > 1 or bucket is not None
+    if method_names is None:
+        if approx:
+            method_names = list(APPROX_METHODS)
+        elif merged:
+            # Only the aggregates of the analysis methods can be merged
+            method_names = [
+                method_name for method_name in METHODS.keys()
+                if METHODS[method_name][1] is not None
+            ]
+        else:
+            method_names = list(METHODS.keys())
+    for method_name in method_names:
+        if method_name not in METHODS.keys():
+            raise ValueError("Unknown analysis method \"{}\""
+                             "".format(method_name))
 
     # Make sure that the output directory exists
     os.makedirs(out_dirpath, exist_ok=True)
 
+    # Approximate the results with a single pass over the packets table,
+    # without creating indexes or tables for the exact analysis
+    if approx:
+        logging.info("Approximating the analysis of the \"{}\" database..."
+                     "".format(db_filepath))
+        run_sketches(
+            db_filepath,
+            out_dirpath,
+            method_names,
+            approx_epsilon,
+            approx_delta,
+            approx_error,
+            packet_filters)
+        logging.info("Finished the approximate analysis of the \"{}\" "
+                     "database".format(db_filepath))
+        return
+
+    # Reuse the results of the queries of previous analyses, if requested
+    if query_cache:
+        config.db.enable_query_caches()
+
+    # Make sure that the queries of the analysis methods are served by
+    # indexes, even if a database was generated by an older version
+    filter_columns = []
+    for condition in packet_filters:
+        column_name = condition[0].lstrip("<>=")
+        if column_name not in filter_columns:
+            filter_columns.append(column_name)
+    if bucket is not None and "pkt_time" not in filter_columns:
+        filter_columns.append("pkt_time")
+    for filepath in db_filepaths:
+        prepare_database(filepath, filter_columns)
+
+    # Reduce the aggregates of multiple databases or of the intervals
+    # of the time series into one set of results for each interval
+    if merged:
+        if len(db_filepaths) > 1:
+            description = "{} databases".format(len(db_filepaths))
+        else:
+            description = "the \"{}\" database".format(db_filepath)
+        logging.info("Analyzing traffic stored in {}...".format(description))
+        run_merged_tasks(
+            db_filepaths,
+            out_dirpath,
+            num_workers,
+            method_names,
+            packet_filters,
+            None if bucket is None else BUCKET_SIZES[bucket])
+        logging.info("Finished the analysis of {}".format(description))
+        return
+
     # Write the results of each analysis method in the output directory
     logging.info("Analyzing traffic stored in the \"{}\" database..."
                  "".format(db_filepath))
-    solo_frequencies(
-        db_filepath,
-        os.path.join(out_dirpath, "solo-frequencies"),
-        num_workers)
-    group_frequencies(
-        db_filepath,
-        os.path.join(out_dirpath, "group-frequencies"),
-        num_workers)
-    distinct_matches(
-        db_filepath,
-        os.path.join(out_dirpath, "distinct-matches"),
-        num_workers)
-    matching_frequencies(
-        db_filepath,
-        os.path.join(out_dirpath, "matching-frequencies"),
-        num_workers)
-    field_values(
-        db_filepath,
-        os.path.join(out_dirpath, "field-values"),
-        num_workers)
-    form_frequencies(
-        db_filepath,
-        os.path.join(out_dirpath, "form-frequencies"),
-        num_workers)
-    selected_frequencies(
-        db_filepath,
-        os.path.join(out_dirpath, "selected-frequencies"),
-        num_workers)
-    battery_percentages(
-        db_filepath,
-        os.path.join(out_dirpath, "battery-percentages"))
-    battery_statuses(
+    run_tasks(
         db_filepath,
-        os.path.join(out_dirpath, "battery-statuses"))
+        out_dirpath,
+        num_workers,
+        method_names,
+        in_memory,
+        incremental,
+        packet_filters)
     logging.info("Finished the analysis of the \"{}\" database"
                  "".format(db_filepath))
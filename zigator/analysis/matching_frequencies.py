@@ -14,8 +14,6 @@
 # You should have received a copy of the GNU General Public License
 # along with Zigator. If not, see <https://www.gnu.org/licenses/>.
 
-import logging
-import multiprocessing as mp
 import os
 
 from .. import config
@@ -1253,79 +1251,25 @@ CONDITION_MATCHES = [
 ]
 
 
-def worker(db_filepath, out_dirpath, task_index, task_lock):
-    # Connect to the provided database
-    config.db.connect(db_filepath)
+def aggregate_task(database, condition_match):
+    # Compute the matching frequency for each set of conditions
+    # by grouping the matching packets by their varying values
+    grouped_counts = database.grouped_count(
+        "packets",
+        condition_match[1],
+        True,
+        condition_match[2])
+    return {
+        grouped_count[:-1]: grouped_count[-1]
+        for grouped_count in grouped_counts
+    }
 
-    while True:
-        with task_lock:
-            # Get the next task
-            if task_index.value < len(CONDITION_MATCHES):
-                condition_match = CONDITION_MATCHES[task_index.value]
-                task_index.value += 1
-            else:
-                break
 
-        # Derive the path of the output file, the varying columns,
-        # and the matching conditions
-        out_filepath = os.path.join(out_dirpath, condition_match[0])
-        var_columns = condition_match[1]
-        conditions = condition_match[2]
+def write_task(out_dirpath, condition_match, aggregate):
+    # Derive the path of the output file
+    out_filepath = os.path.join(out_dirpath, condition_match[0])
 
-        # Compute the distinct values of the varying columns
-        var_values = config.db.fetch_values(
-            "packets",
-            var_columns,
-            conditions,
-            True)
-        var_values.sort(key=config.custom_sorter)
-
-        # Compute the matching frequency for each set of conditions
-        results = []
-        for var_value in var_values:
-            var_conditions = list(conditions)
-            for i in range(len(var_value)):
-                var_conditions.append((var_columns[i], var_value[i]))
-            matches = config.db.matching_frequency("packets", var_conditions)
-            results.append((var_value, matches))
-
-        # Write the matching frequencies in the output file
-        config.fs.write_tsv(results, out_filepath)
-
-    # Disconnect from the provided database
-    config.db.disconnect()
-
-
-def matching_frequencies(db_filepath, out_dirpath, num_workers):
-    """Compute the matching frequency of certain conditions."""
-    # Make sure that the output directory exists
-    os.makedirs(out_dirpath, exist_ok=True)
-
-    # Determine the number of processes that will be used
-    if num_workers is None:
-        if hasattr(os, "sched_getaffinity"):
-            num_workers = len(os.sched_getaffinity(0))
-        else:
-            num_workers = mp.cpu_count()
-    if num_workers < 1:
-        num_workers = 1
-    logging.info("Computing the matching frequency "
-                 "of {} conditions using {} workers..."
-                 "".format(len(CONDITION_MATCHES), num_workers))
-
-    # Create variables that will be shared by the processes
-    task_index = mp.Value("L", 0, lock=False)
-    task_lock = mp.Lock()
-
-    # Start the processes
-    processes = []
-    for _ in range(num_workers):
-        p = mp.Process(target=worker,
-                       args=(db_filepath, out_dirpath, task_index, task_lock))
-        p.start()
-        processes.append(p)
-
-    # Make sure that all processes terminated
-    for p in processes:
-        p.join()
-    logging.info("All {} workers completed their tasks".format(num_workers))
+    # Write the matching frequencies in the output file
+    results = list(aggregate.items())
+    results.sort(key=lambda x: config.custom_sorter(x[0]))
+    config.fs.write_tsv(results, out_filepath)
@@ -0,0 +1,686 @@
+# Copyright (C) 2021 Dimitrios-Georgios Akestoridis
+#
+# This file is part of Zigator.
+#
+# Zigator is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 only,
+# as published by the Free Software Foundation.
+#
+# Zigator is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Zigator. If not, see <https://www.gnu.org/licenses/>.
+
+import logging
+import multiprocessing as mp
+import os
+from collections import Counter
+from datetime import datetime
+from datetime import timezone
+from operator import itemgetter
+
+from .. import config
+from .aggregates import get_task_key
+from .aggregates import merge_aggregates
+from .battery_percentages import DEVICE_CONDITIONS as PERCENTAGE_DEVICES
+from .battery_percentages import (
+    extract_measurements as extract_battery_percentages,
+)
+from .battery_statuses import DEVICE_CONDITIONS as STATUS_DEVICES
+from .battery_statuses import (
+    extract_measurements as extract_battery_statuses,
+)
+from .column_engine import ColumnEngine
+from .column_engine import get_required_columns
+from .distinct_matches import COLUMN_MATCHES
+from .distinct_matches import aggregate_task as aggregate_distinct_matches
+from .distinct_matches import write_task as write_distinct_matches
+from .field_values import INSPECTED_COLUMNS as FIELD_INSPECTED_COLUMNS
+from .field_values import PACKET_TYPES as FIELD_PACKET_TYPES
+from .field_values import aggregate_task as aggregate_field_values
+from .field_values import write_task as write_field_values
+from .form_frequencies import INSPECTED_COLUMNS as FORM_INSPECTED_COLUMNS
+from .form_frequencies import PACKET_TYPES as FORM_PACKET_TYPES
+from .form_frequencies import aggregate_task as aggregate_form_frequencies
+from .form_frequencies import write_task as write_form_frequencies
+from .group_frequencies import COLUMN_GROUPS
+from .group_frequencies import aggregate_task as aggregate_group_frequencies
+from .group_frequencies import write_task as write_group_frequencies
+from .matching_frequencies import CONDITION_MATCHES
+from .matching_frequencies import (
+    aggregate_task as aggregate_matching_frequencies,
+)
+from .matching_frequencies import write_task as write_matching_frequencies
+from .selected_frequencies import CONDITION_SELECTIONS
+from .selected_frequencies import (
+    aggregate_task as aggregate_selected_frequencies,
+)
+from .selected_frequencies import write_task as write_selected_frequencies
+from .solo_frequencies import INSPECTED_COLUMNS as SOLO_INSPECTED_COLUMNS
+from .solo_frequencies import aggregate_task as aggregate_solo_frequencies
+from .solo_frequencies import write_task as write_solo_frequencies
+
+
+# Define the number of device ranges that each worker examines on average
+SHARDS_PER_WORKER = 4
+
+# Define the fraction of rows that are assumed to satisfy a condition
+# that compares values or that examines a column without statistics
+DEFAULT_SELECTIVITY = 0.25
+
+# Define the duration of each interval of the time series in seconds
+BUCKET_SIZES = {
+    "minute": 60,
+    "hour": 3600,
+    "day": 86400,
+}
+
+
+def write_battery_percentages(out_dirpath, task, database):
+    extract_battery_percentages(database, out_dirpath, task)
+
+
+def write_battery_statuses(out_dirpath, task, database):
+    extract_battery_statuses(database, out_dirpath, task)
+
+
+# Each analysis method writes its output files in the directory that is
+# named after it. The aggregate of each task maps tuples of values to
+# their counts, so that the aggregates of different rows can be merged,
+# and it is written in the output directory by the second function.
+# Methods without such aggregates write their output files directly
+# while examining the rows of the devices that their tasks select, or all
+# the rows of the database otherwise. Tasks can also use the in-memory
+# columns if indicated.
+METHODS = {
+    "solo-frequencies": (
+        [[column_name] for column_name in SOLO_INSPECTED_COLUMNS],
+        aggregate_solo_frequencies,
+        write_solo_frequencies,
+        False,
+    ),
+    "group-frequencies": (
+        COLUMN_GROUPS,
+        aggregate_group_frequencies,
+        write_group_frequencies,
+        False,
+    ),
+    "distinct-matches": (
+        COLUMN_MATCHES,
+        aggregate_distinct_matches,
+        write_distinct_matches,
+        True,
+    ),
+    "matching-frequencies": (
+        CONDITION_MATCHES,
+        aggregate_matching_frequencies,
+        write_matching_frequencies,
+        True,
+    ),
+    "field-values": (
+        FIELD_PACKET_TYPES,
+        aggregate_field_values,
+        write_field_values,
+        True,
+    ),
+    "form-frequencies": (
+        FORM_PACKET_TYPES,
+        aggregate_form_frequencies,
+        write_form_frequencies,
+        True,
+    ),
+    "selected-frequencies": (
+        CONDITION_SELECTIONS,
+        aggregate_selected_frequencies,
+        write_selected_frequencies,
+        True,
+    ),
+    "battery-percentages": (
+        [None],
+        None,
+        write_battery_percentages,
+        False,
+    ),
+    "battery-statuses": (
+        [None],
+        None,
+        write_battery_statuses,
+        False,
+    ),
+}
+
+# The tasks of these analysis methods examine separate ranges of devices,
+# whose boundaries are derived from the packets that match the conditions
+SHARDED_METHODS = {
+    "battery-percentages": PERCENTAGE_DEVICES,
+    "battery-statuses": STATUS_DEVICES,
+}
+
+
+def estimate_cost(method_name, task, count_rows):
+    """Estimate the number of values that a task will examine."""
+    if method_name == "solo-frequencies":
+        return count_rows(()) * len(task)
+    elif method_name == "group-frequencies":
+        return count_rows(()) * (len(task) - 1)
+    elif method_name == "distinct-matches":
+        # The varying columns are fetched twice
+        return count_rows(task[2]) * (2 * len(task[1]) + len(task) - 3)
+    elif method_name == "matching-frequencies":
+        return count_rows(task[2]) * len(task[1])
+    elif method_name == "field-values":
+        return count_rows(task[1]) * len(FIELD_INSPECTED_COLUMNS)
+    elif method_name == "form-frequencies":
+        return count_rows(task[1]) * len(FORM_INSPECTED_COLUMNS)
+    elif method_name == "selected-frequencies":
+        return sum(count_rows(selection[1:]) for selection in task[1:])
+    elif method_name in SHARDED_METHODS.keys():
+        # The packets of the devices are split among the tasks later
+        return count_rows(SHARDED_METHODS[method_name])
+    else:
+        raise ValueError("Unknown analysis method \"{}\"".format(method_name))
+
+
+def estimate_selectivity(column_stats, condition):
+    """Estimate the fraction of rows that satisfy a condition."""
+    param, value = condition
+
+    # Conditions on several columns are satisfied by any of them, which
+    # are assumed to be satisfied independently
+    if "|" in param:
+        operator = param[:len(param) - len(param.lstrip("!<>="))]
+        unmatched = 1.0
+        for column_name in param[len(operator):].split("|"):
+            unmatched *= 1.0 - estimate_selectivity(
+                column_stats,
+                (operator + column_name, value))
+        return 1.0 - unmatched
+
+    column_name = param.lstrip("!")
+    if param[0] in {"<", ">"} or column_name not in column_stats.keys():
+        return DEFAULT_SELECTIVITY
+    num_rows, null_count, distinct_count, value_counts = (
+        column_stats[column_name])
+    if num_rows == 0:
+        return 0.0
+
+    # Values that are not among the most frequent ones are assumed to
+    # appear equally often in the remaining rows
+    if value is None:
+        matching_rows = null_count
+    elif value in value_counts.keys():
+        matching_rows = value_counts[value]
+    elif distinct_count > len(value_counts):
+        matching_rows = (
+            (num_rows - null_count - sum(value_counts.values()))
+            / (distinct_count - len(value_counts))
+        )
+    else:
+        matching_rows = 0
+
+    # Undefined values never satisfy an inequality
+    if param[0] == "!":
+        matching_rows = num_rows - null_count - (
+            0 if value is None else matching_rows)
+    return max(0.0, matching_rows / num_rows)
+
+
+def get_row_estimator(database):
+    """Return a function that estimates the rows that match conditions."""
+    # The stored statistics of the columns are used even if they do not
+    # cover the most recent rows, since scanning the rows to count them
+    # would cost as much as some of the tasks
+    column_stats = {
+        column_name: stats[:3] + (dict(stats[5]),)
+        for (column_name, stats) in database.load_column_stats(
+            stale=True).items()
+    }
+
+    def estimate_rows(num_rows, conditions):
+        selectivity = 1.0
+        for condition in list(conditions) + database.packet_filters:
+            selectivity *= estimate_selectivity(column_stats, condition)
+        return num_rows * selectivity
+
+    return estimate_rows
+
+
+def shard_devices(database, conditions, num_shards):
+    """Return the conditions that split devices into contiguous ranges."""
+    # Each range contains about the same number of known devices,
+    # while the first and the last ranges are unbounded
+    extendedaddrs = sorted(
+        fetched_tuple[0] for fetched_tuple in database.fetch_values(
+            "packets",
+            ["der_nwk_srcextendedaddr"],
+            conditions + [("!der_nwk_srcextendedaddr", None)],
+            True))
+    num_shards = max(1, min(num_shards, len(extendedaddrs)))
+    boundaries = [
+        extendedaddrs[i * len(extendedaddrs) // num_shards]
+        for i in range(1, num_shards)
+    ]
+
+    # Packets without an extended source address form a separate range
+    shards = [[("der_nwk_srcextendedaddr", None)]]
+    for i in range(num_shards):
+        shard = [("!der_nwk_srcextendedaddr", None)]
+        if i > 0:
+            shard.append((">=der_nwk_srcextendedaddr", boundaries[i - 1]))
+        if i < num_shards - 1:
+            shard.append(("<der_nwk_srcextendedaddr", boundaries[i]))
+        shards.append(shard)
+    return shards
+
+
+def schedule_tasks(database, method_names, stored_aggregates, max_rowid,
+                   num_shards=1):
+    """Return the tasks of the analysis methods, most expensive first."""
+    # Estimate the rows that match each set of conditions with the stored
+    # statistics of the columns, instead of counting them
+    estimate_rows = get_row_estimator(database)
+    if max_rowid is None:
+        last_rowid = database.get_max_rowid("packets")
+    else:
+        last_rowid = max_rowid
+
+    scheduled_tasks = []
+    for method_name in method_names:
+        tasks = METHODS[method_name][0]
+        if method_name in SHARDED_METHODS.keys():
+            database.set_rowid_range(None, max_rowid)
+            tasks = shard_devices(
+                database,
+                SHARDED_METHODS[method_name],
+                num_shards)
+        for task in tasks:
+            # Examine only the rows that were added after the stored
+            # aggregate of the task, if available
+            min_rowid, aggregate = stored_aggregates.get(
+                (method_name, get_task_key(task)),
+                (None, None))
+            num_rows = last_rowid - (0 if min_rowid is None else min_rowid)
+            cost = estimate_cost(
+                method_name,
+                task,
+                lambda conditions: estimate_rows(num_rows, conditions))
+            if method_name in SHARDED_METHODS.keys():
+                cost /= len(tasks)
+            scheduled_tasks.append(
+                (cost, method_name, task, min_rowid, aggregate))
+    database.set_rowid_range()
+
+    # Tasks with equal costs retain the order of their analysis methods
+    scheduled_tasks.sort(key=itemgetter(0), reverse=True)
+    return [scheduled_task[1:] for scheduled_task in scheduled_tasks]
+
+
+def get_bucket_conditions(bucket_start, bucket_size):
+    """Return the conditions that select the packets of an interval."""
+    return [
+        (">=pkt_time", bucket_start),
+        ("<pkt_time", bucket_start + bucket_size),
+    ]
+
+
+def get_bucket_dirpath(out_dirpath, bucket_start):
+    """Return the output directory of an interval of the time series."""
+    if bucket_start is None:
+        return out_dirpath
+    return os.path.join(
+        out_dirpath,
+        datetime.fromtimestamp(bucket_start, timezone.utc).strftime(
+            "%Y%m%dT%H%M%SZ"))
+
+
+def schedule_partial_tasks(db_filepaths, method_names, packet_filters,
+                           bucket_size):
+    """Return the tasks of each database, most expensive first."""
+    scheduled_tasks = []
+    for (db_index, db_filepath) in enumerate(db_filepaths):
+        database = config.db.Database(db_filepath)
+        database.set_packet_filters(packet_filters)
+        estimate_rows = get_row_estimator(database)
+        num_rows = database.get_max_rowid("packets")
+
+        # The tasks of each interval are estimated to cost the same,
+        # since only the intervals that contain packets are examined
+        bucket_starts = [None]
+        if bucket_size is not None:
+            bucket_starts = database.fetch_time_buckets(bucket_size)
+
+        for method_name in method_names:
+            for task in METHODS[method_name][0]:
+                cost = estimate_cost(
+                    method_name,
+                    task,
+                    lambda conditions: estimate_rows(num_rows, conditions))
+                for bucket_start in bucket_starts:
+                    scheduled_tasks.append(
+                        (cost, db_index, bucket_start, method_name, task))
+        database.disconnect()
+
+    # Tasks with equal costs retain the order of their databases
+    scheduled_tasks.sort(key=itemgetter(0), reverse=True)
+    return [scheduled_task[1:] for scheduled_task in scheduled_tasks]
+
+
+def load_stored_aggregates(database, method_names, max_rowid):
+    # Ignore aggregates that cover rows that no longer exist
+    stored_aggregates = {}
+    for (key, (watermark, aggregate)) in database.load_aggregates().items():
+        if (key[0] in method_names
+                and METHODS[key[0]][1] is not None
+                and watermark <= max_rowid):
+            stored_aggregates[key] = (watermark, aggregate)
+    return stored_aggregates
+
+
+def worker(db_filepath, out_dirpath, scheduled_tasks, max_rowid, engine,
+           engine_rowid, incremental, packet_filters, msg_queue, task_index,
+           task_lock):
+    # Connect to the provided database
+    database = config.db.Database(db_filepath)
+    database.set_packet_filters(packet_filters)
+
+    while True:
+        with task_lock:
+            # Get the next task
+            if task_index.value < len(scheduled_tasks):
+                method_name, task, min_rowid, aggregate = (
+                    scheduled_tasks[task_index.value])
+                task_index.value += 1
+            else:
+                break
+
+        # Examine the rows of the task with the in-memory columns,
+        # if they were loaded for the same rows
+        _, aggregate_task, write_task, uses_engine = METHODS[method_name]
+        method_dirpath = os.path.join(out_dirpath, method_name)
+        if (engine is not None and uses_engine
+                and min_rowid == engine_rowid):
+            source = engine
+        else:
+            database.set_rowid_range(min_rowid, max_rowid)
+            source = database
+
+        if aggregate_task is None:
+            write_task(method_dirpath, task, source)
+            continue
+
+        # Merge the aggregate of the examined rows with the stored one
+        new_aggregate = aggregate_task(source, task)
+        if aggregate is not None:
+            new_aggregate = merge_aggregates(aggregate, new_aggregate)
+        write_task(method_dirpath, task, new_aggregate)
+        if incremental:
+            msg_queue.put(
+                (config.AGGREGATE_MSG,
+                 (method_name, get_task_key(task), new_aggregate)))
+
+    # Disconnect from the provided database and the in-memory columns
+    database.disconnect()
+    if engine is not None:
+        engine.close()
+    msg_queue.put((config.RETURN_MSG, os.getpid()))
+
+
+def partial_worker(db_filepaths, scheduled_tasks, packet_filters,
+                   bucket_size, msg_queue, task_index, task_lock):
+    # Connect to each database once it is needed
+    databases = {}
+
+    while True:
+        with task_lock:
+            # Get the next task
+            if task_index.value < len(scheduled_tasks):
+                db_index, bucket_start, method_name, task = (
+                    scheduled_tasks[task_index.value])
+                task_index.value += 1
+            else:
+                break
+
+        # Send the aggregate of the task for the rows of one database
+        # that were captured during one interval, if requested
+        if db_index not in databases.keys():
+            databases[db_index] = config.db.Database(db_filepaths[db_index])
+        database = databases[db_index]
+        if bucket_start is None:
+            database.set_packet_filters(packet_filters)
+        else:
+            database.set_packet_filters(
+                packet_filters
+                + get_bucket_conditions(bucket_start, bucket_size))
+        aggregate = METHODS[method_name][1](database, task)
+        msg_queue.put(
+            (config.AGGREGATE_MSG,
+             (bucket_start, method_name, get_task_key(task), aggregate)))
+
+    # Disconnect from the databases
+    for database in databases.values():
+        database.disconnect()
+    msg_queue.put((config.RETURN_MSG, os.getpid()))
+
+
+def get_num_workers(num_workers):
+    """Return the number of processes that will be used."""
+    if num_workers is None:
+        if hasattr(os, "sched_getaffinity"):
+            num_workers = len(os.sched_getaffinity(0))
+        else:
+            num_workers = mp.cpu_count()
+    if num_workers < 1:
+        num_workers = 1
+    return num_workers
+
+
+def run_tasks(db_filepath, out_dirpath, num_workers, method_names,
+              in_memory=False, incremental=False, packet_filters=None):
+    """Process the tasks of several analysis methods with one pool."""
+    # Sanity check
+    for method_name in method_names:
+        if method_name not in METHODS.keys():
+            raise ValueError("Unknown analysis method \"{}\""
+                             "".format(method_name))
+
+    # Make sure that the output directory of each method exists
+    for method_name in method_names:
+        os.makedirs(os.path.join(out_dirpath, method_name), exist_ok=True)
+
+    # Determine the number of processes that will be used
+    num_workers = get_num_workers(num_workers)
+
+    # Fix the rows that will be examined, so that packets that are
+    # inserted during the analysis are examined by the next execution,
+    # and load the aggregates that were stored by previous executions
+    database = config.db.Database(db_filepath)
+    database.set_packet_filters(packet_filters)
+    if incremental:
+        max_rowid = database.get_max_rowid("packets")
+        stored_aggregates = load_stored_aggregates(
+            database,
+            method_names,
+            max_rowid)
+        logging.info("Loaded the stored aggregates of {} tasks"
+                     "".format(len(stored_aggregates)))
+    else:
+        max_rowid = None
+        stored_aggregates = {}
+
+    # Load the columns that the condition-based analysis methods examine,
+    # so that all of their workers can share a single scan of the rows
+    # that most of their tasks have not aggregated yet
+    engine = None
+    engine_rowid = None
+    if in_memory and any(METHODS[x][3] for x in method_names):
+        engine_rowid = Counter(
+            stored_aggregates.get((method_name, get_task_key(task)),
+                                  (None, None))[0]
+            for method_name in method_names if METHODS[method_name][3]
+            for task in METHODS[method_name][0]).most_common(1)[0][0]
+        column_names = get_required_columns()
+        database.set_rowid_range(engine_rowid, max_rowid)
+        engine = ColumnEngine(database, column_names)
+        engine.share()
+        database.set_rowid_range()
+        logging.info("Loaded {} columns of {} packets in memory"
+                     "".format(len(column_names), engine.num_rows))
+
+    # Start the most expensive tasks first, so that the cheaper ones
+    # can fill the gaps of the other workers at the end
+    scheduled_tasks = schedule_tasks(
+        database,
+        method_names,
+        stored_aggregates,
+        max_rowid,
+        num_workers * SHARDS_PER_WORKER)
+    database.disconnect()
+    logging.info("Processing {} tasks of {} analysis methods "
+                 "using {} workers..."
+                 "".format(len(scheduled_tasks), len(method_names),
+                           num_workers))
+
+    # Create variables that will be shared by the processes
+    msg_queue = mp.Queue()
+    task_index = mp.Value("L", 0, lock=False)
+    task_lock = mp.Lock()
+
+    # Start the processes
+    processes = []
+    for _ in range(num_workers):
+        p = mp.Process(target=worker,
+                       args=(db_filepath, out_dirpath, scheduled_tasks,
+                             max_rowid, engine, engine_rowid, incremental,
+                             packet_filters, msg_queue, task_index,
+                             task_lock))
+        p.start()
+        processes.append(p)
+
+    # Collect the updated aggregates until all the tasks are completed
+    num_terminated_processes = 0
+    updated_aggregates = []
+    while num_terminated_processes < num_workers:
+        msg_type, msg_obj = msg_queue.get()
+        if msg_type is config.RETURN_MSG:
+            num_terminated_processes += 1
+        elif msg_type is config.AGGREGATE_MSG:
+            updated_aggregates.append(msg_obj)
+        else:
+            raise ValueError("Unknown message type \"{}\"".format(msg_type))
+
+    # Make sure that all processes terminated
+    for p in processes:
+        p.join()
+    logging.info("All {} workers completed their tasks".format(num_workers))
+    if engine is not None:
+        engine.unlink()
+
+    # Store the updated aggregates, once the workers no longer read from
+    # the database, along with the last row that they examined
+    if incremental:
+        database = config.db.Database(db_filepath)
+        database.store_aggregates(
+            (method_name, task_key, max_rowid, aggregate)
+            for (method_name, task_key, aggregate) in updated_aggregates)
+        database.commit()
+        database.disconnect()
+        logging.info("Stored the aggregates of {} tasks up to row {}"
+                     "".format(len(updated_aggregates), max_rowid))
+
+
+def run_merged_tasks(db_filepaths, out_dirpath, num_workers, method_names,
+                     packet_filters=None, bucket_size=None):
+    """Merge the aggregates of databases or intervals with one pool."""
+    # Sanity check
+    for method_name in method_names:
+        if method_name not in METHODS.keys():
+            raise ValueError("Unknown analysis method \"{}\""
+                             "".format(method_name))
+        elif METHODS[method_name][1] is None:
+            raise ValueError("The results of the \"{}\" analysis method "
+                             "cannot be merged".format(method_name))
+
+    # Start the most expensive tasks of any database first
+    if packet_filters is None:
+        packet_filters = []
+    num_workers = get_num_workers(num_workers)
+    scheduled_tasks = schedule_partial_tasks(
+        db_filepaths,
+        method_names,
+        packet_filters,
+        bucket_size)
+    bucket_starts = sorted(set(
+        scheduled_task[1] for scheduled_task in scheduled_tasks))
+    logging.info("Processing {} tasks of {} analysis methods "
+                 "in {} databases using {} workers..."
+                 "".format(len(scheduled_tasks), len(method_names),
+                           len(db_filepaths), num_workers))
+
+    # Make sure that the output directory of each method exists
+    # for each interval of the time series, if requested
+    for bucket_start in bucket_starts:
+        for method_name in method_names:
+            os.makedirs(
+                os.path.join(
+                    get_bucket_dirpath(out_dirpath, bucket_start),
+                    method_name),
+                exist_ok=True)
+
+    # Keep track of the aggregates that each task is still waiting for
+    tasks = {}
+    for method_name in method_names:
+        for task in METHODS[method_name][0]:
+            tasks[(method_name, get_task_key(task))] = task
+    pending_aggregates = Counter(
+        (bucket_start, method_name, get_task_key(task))
+        for (_, bucket_start, method_name, task) in scheduled_tasks)
+    merged_aggregates = {}
+
+    # Create variables that will be shared by the processes
+    msg_queue = mp.Queue()
+    task_index = mp.Value("L", 0, lock=False)
+    task_lock = mp.Lock()
+
+    # Start the processes
+    processes = []
+    for _ in range(num_workers):
+        p = mp.Process(target=partial_worker,
+                       args=(db_filepaths, scheduled_tasks, packet_filters,
+                             bucket_size, msg_queue, task_index, task_lock))
+        p.start()
+        processes.append(p)
+
+    # Merge the aggregates of each task and write its output files
+    # as soon as the aggregates of all the databases are received
+    num_terminated_processes = 0
+    while num_terminated_processes < num_workers:
+        msg_type, msg_obj = msg_queue.get()
+        if msg_type is config.RETURN_MSG:
+            num_terminated_processes += 1
+        elif msg_type is config.AGGREGATE_MSG:
+            bucket_start, method_name, task_key, aggregate = msg_obj
+            key = (bucket_start, method_name, task_key)
+            if key in merged_aggregates.keys():
+                aggregate = merge_aggregates(merged_aggregates[key],
+                                             aggregate)
+            pending_aggregates[key] -= 1
+            if pending_aggregates[key] > 0:
+                merged_aggregates[key] = aggregate
+                continue
+            merged_aggregates.pop(key, None)
+            METHODS[method_name][2](
+                os.path.join(
+                    get_bucket_dirpath(out_dirpath, bucket_start),
+                    method_name),
+                tasks[(method_name, task_key)],
+                aggregate)
+        else:
+            raise ValueError("Unknown message type \"{}\"".format(msg_type))
+
+    # Make sure that all processes terminated
+    for p in processes:
+        p.join()
+    logging.info("All {} workers completed their tasks".format(num_workers))
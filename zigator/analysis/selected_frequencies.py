@@ -14,8 +14,6 @@
 # You should have received a copy of the GNU General Public License
 # along with Zigator. If not, see <https://www.gnu.org/licenses/>.
 
-import logging
-import multiprocessing as mp
 import os
 
 from .. import config
@@ -172,68 +170,23 @@ CONDITION_SELECTIONS = [
 ]
 
 
-def worker(db_filepath, out_dirpath, task_index, task_lock):
-    # Connect to the provided database
-    config.db.connect(db_filepath)
+def aggregate_task(database, condition_selection):
+    # Compute the matching frequency of each selection
+    aggregate = {}
+    for selection in condition_selection[1:]:
+        aggregate[(selection[0],)] = database.matching_frequency(
+            "packets",
+            selection[1:])
+    return aggregate
 
-    while True:
-        with task_lock:
-            # Get the next task
-            if task_index.value < len(CONDITION_SELECTIONS):
-                condition_selection = CONDITION_SELECTIONS[task_index.value]
-                task_index.value += 1
-            else:
-                break
 
-        # Derive the path of the output file and the selected conditions
-        out_filepath = os.path.join(out_dirpath, condition_selection[0])
-        selections = condition_selection[1:]
+def write_task(out_dirpath, condition_selection, aggregate):
+    # Derive the path of the output file
+    out_filepath = os.path.join(out_dirpath, condition_selection[0])
 
-        # Compute the matching frequency of each selection
-        results = []
-        for selection in selections:
-            name = selection[0]
-            conditions = selection[1:]
-            matches = config.db.matching_frequency("packets", conditions)
-            results.append((name, matches))
-
-        # Write the matching frequencies in the output file
-        config.fs.write_tsv(results, out_filepath)
-
-    # Disconnect from the provided database
-    config.db.disconnect()
-
-
-def selected_frequencies(db_filepath, out_dirpath, num_workers):
-    """Compute the frequency of selected conditions."""
-    # Make sure that the output directory exists
-    os.makedirs(out_dirpath, exist_ok=True)
-
-    # Determine the number of processes that will be used
-    if num_workers is None:
-        if hasattr(os, "sched_getaffinity"):
-            num_workers = len(os.sched_getaffinity(0))
-        else:
-            num_workers = mp.cpu_count()
-    if num_workers < 1:
-        num_workers = 1
-    logging.info("Computing the frequency of "
-                 "{} condition selections using {} workers..."
-                 "".format(len(CONDITION_SELECTIONS), num_workers))
-
-    # Create variables that will be shared by the processes
-    task_index = mp.Value("L", 0, lock=False)
-    task_lock = mp.Lock()
-
-    # Start the processes
-    processes = []
-    for _ in range(num_workers):
-        p = mp.Process(target=worker,
-                       args=(db_filepath, out_dirpath, task_index, task_lock))
-        p.start()
-        processes.append(p)
-
-    # Make sure that all processes terminated
-    for p in processes:
-        p.join()
-    logging.info("All {} workers completed their tasks".format(num_workers))
+    # Write the matching frequencies in the output file
+    results = [
+        (selection[0], aggregate.get((selection[0],), 0))
+        for selection in condition_selection[1:]
+    ]
+    config.fs.write_tsv(results, out_filepath)
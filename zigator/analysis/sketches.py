@@ -0,0 +1,460 @@
+# Copyright (C) 2021 Dimitrios-Georgios Akestoridis
+#
+# This file is part of Zigator.
+#
+# Zigator is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 only,
+# as published by the Free Software Foundation.
+#
+# Zigator is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Zigator. If not, see <https://www.gnu.org/licenses/>.
+import hashlib
+import logging
+import math
+import os
+import time
+
+import numpy as np
+
+from .. import config
+from .scheduler import METHODS
+
+
+# Define the number of rows that are sketched at a time
+CHUNK_SIZE = 50000
+
+# Define the analysis methods whose results can be approximated
+APPROX_METHODS = [
+    "solo-frequencies",
+    "group-frequencies",
+    "distinct-matches",
+    "matching-frequencies",
+]
+
+
+def hash_values(values):
+    """Return a 64-bit hash of values that is stable across executions."""
+    return int.from_bytes(
+        hashlib.blake2b(repr(values).encode("utf-8"), digest_size=8).digest(),
+        "big")
+
+
+def mix_hashes(hashes):
+    """Return the 64-bit finalizer of SplitMix64 for an array of hashes."""
+    hashes = (hashes ^ (hashes >> np.uint64(30))) * np.uint64(
+        0xbf58476d1ce4e5b9)
+    hashes = (hashes ^ (hashes >> np.uint64(27))) * np.uint64(
+        0x94d049bb133111eb)
+    return hashes ^ (hashes >> np.uint64(31))
+
+
+def combine_hashes(column_hashes):
+    """Return the hash of the tuple of values of each row."""
+    combined = mix_hashes(column_hashes[0])
+    for hashes in column_hashes[1:]:
+        combined = mix_hashes(combined ^ hashes)
+    return combined
+
+
+def get_bit_lengths(values):
+    """Return the number of bits that each unsigned integer requires."""
+    values = values.copy()
+    bit_lengths = np.zeros(len(values), dtype=np.int64)
+    for shift in [32, 16, 8, 4, 2, 1]:
+        shifted = values >> np.uint64(shift)
+        nonzero = shifted > 0
+        bit_lengths[nonzero] += shift
+        values[nonzero] = shifted[nonzero]
+    return bit_lengths + (values > 0)
+
+
+def encode_values(values):
+    """Return the distinct values of a column and the code of each row."""
+    # Equal values of different types, such as 1 and 1.0, are kept apart
+    lookup = {}
+    codes = np.fromiter(
+        (lookup.setdefault((type(value), value), len(lookup))
+         for value in values),
+        dtype=np.int64,
+        count=len(values))
+    return [key[1] for key in lookup.keys()], codes
+
+
+def hash_column(distinct_values, codes):
+    """Return the hash of the value of each row, hashing each value once."""
+    value_hashes = np.array(
+        [hash_values(value) for value in distinct_values],
+        dtype=np.uint64)
+    return value_hashes[codes]
+
+
+class CountMinSketch(object):
+    """Approximate counts of hashed keys in sublinear space.
+
+    The estimated count of a key is never lower than its actual count
+    and exceeds it by at most epsilon times the total count of all keys
+    with a probability of at least 1 - delta.
+    """
+
+    def __init__(self, epsilon, delta):
+        # Sanity checks
+        if epsilon <= 0 or epsilon >= 1:
+            raise ValueError("The error of the count-min sketch "
+                             "should be between 0 and 1")
+        if delta <= 0 or delta >= 1:
+            raise ValueError("The failure probability of the count-min "
+                             "sketch should be between 0 and 1")
+
+        self.epsilon = epsilon
+        self.width = int(math.ceil(math.e / epsilon))
+        self.depth = int(math.ceil(math.log(1.0 / delta)))
+        self.rows = np.arange(self.depth)
+        self.table = np.zeros((self.depth, self.width), dtype=np.int64)
+        self.total = 0
+
+    def get_columns(self, hashed):
+        # Derive one hash function per row from the two halves of the hash
+        h1 = hashed & 0xffffffff
+        h2 = (hashed >> 32) | 1
+        return [(h1 + i * h2) % self.width for i in range(self.depth)]
+
+    def get_column_arrays(self, hashes):
+        # Derive the same columns as above for an array of hashes
+        h1 = hashes & np.uint64(0xffffffff)
+        h2 = (hashes >> np.uint64(32)) | np.uint64(1)
+        return [
+            ((h1 + np.uint64(i) * h2) % np.uint64(self.width)).astype(
+                np.int64)
+            for i in range(self.depth)
+        ]
+
+    def update(self, hashed, count):
+        self.table[self.rows, self.get_columns(hashed)] += count
+        self.total += count
+
+    def update_many(self, hashes, counts):
+        # Hashes that share a column accumulate their counts
+        for (i, columns) in enumerate(self.get_column_arrays(hashes)):
+            np.add.at(self.table[i], columns, counts)
+        self.total += int(np.sum(counts))
+
+    def estimate(self, hashed):
+        return int(self.table[self.rows, self.get_columns(hashed)].min())
+
+    def estimate_many(self, hashes):
+        return np.min(
+            [
+                self.table[i][columns]
+                for (i, columns) in enumerate(self.get_column_arrays(hashes))
+            ],
+            axis=0)
+
+    def get_error(self):
+        return int(math.ceil(self.epsilon * self.total))
+
+
+class HyperLogLog(object):
+    """Approximate number of distinct hashed keys in constant space."""
+
+    def __init__(self, relative_error):
+        # Sanity check
+        if relative_error <= 0 or relative_error >= 1:
+            raise ValueError("The error of the HyperLogLog sketch "
+                             "should be between 0 and 1")
+
+        # Use enough registers for the requested standard error
+        self.precision = min(
+            max(int(math.ceil(math.log2((1.04 / relative_error)**2))), 4),
+            16)
+        self.num_registers = 1 << self.precision
+        self.registers = np.zeros(self.num_registers, dtype=np.uint8)
+        self.relative_error = 1.04 / math.sqrt(self.num_registers)
+
+    def add(self, hashed):
+        # The first bits select a register and the position of the first
+        # set bit in the remaining ones updates its value
+        num_bits = 64 - self.precision
+        index = hashed >> num_bits
+        rank = num_bits - (hashed & ((1 << num_bits) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def add_many(self, hashes):
+        num_bits = 64 - self.precision
+        indices = (hashes >> np.uint64(num_bits)).astype(np.int64)
+        ranks = num_bits + 1 - get_bit_lengths(
+            hashes & np.uint64((1 << num_bits) - 1))
+        np.maximum.at(self.registers, indices, ranks.astype(np.uint8))
+
+    def count(self):
+        m = self.num_registers
+        if m >= 128:
+            alpha = 0.7213 / (1 + 1.079 / m)
+        elif m == 64:
+            alpha = 0.709
+        elif m == 32:
+            alpha = 0.697
+        else:
+            alpha = 0.673
+        estimate = alpha * m * m / float(
+            np.sum(np.power(2.0, -self.registers.astype(np.float64))))
+
+        # Use linear counting for small cardinalities
+        num_zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and num_zeros > 0:
+            estimate = m * math.log(m / num_zeros)
+        return int(round(estimate))
+
+    def get_error(self):
+        return int(math.ceil(self.relative_error * self.count()))
+
+
+class TaskSketch(object):
+    """Sketches of the rows that a task of an analysis method examines.
+
+    The frequency of each tuple of values of the varying columns is
+    approximated with a count-min sketch, while the tuples with the
+    highest estimated frequencies are kept as candidates for the output.
+    The distinct tuples of values of the matching columns are counted
+    with a HyperLogLog sketch for each tuple of values of the varying
+    columns, if any, which is kept even if that tuple stops being a
+    candidate, since it may become one again later.
+    """
+
+    def __init__(self, var_columns, mat_columns, conditions, epsilon, delta,
+                 relative_error):
+        self.var_columns = var_columns
+        self.mat_columns = mat_columns
+        self.conditions = conditions
+        self.relative_error = relative_error
+        self.frequencies = CountMinSketch(epsilon, delta)
+        self.capacity = int(math.ceil(1.0 / epsilon))
+        self.candidates = {}
+        self.distinct_matches = {}
+
+    def update(self, columns, hashes, mask):
+        # Count the hashed tuples of values of each chunk exactly
+        # before sketching them
+        rows = np.flatnonzero(mask)
+        var_hashes = combine_hashes(
+            [hashes[column_name][rows] for column_name in self.var_columns])
+        unique_hashes, first_rows, inverse, counts = np.unique(
+            var_hashes,
+            return_index=True,
+            return_inverse=True,
+            return_counts=True)
+        self.frequencies.update_many(unique_hashes, counts)
+        for (hashed, row) in zip(unique_hashes.tolist(),
+                                 rows[first_rows].tolist()):
+            if hashed not in self.candidates.keys():
+                self.candidates[hashed] = tuple(
+                    columns[column_name][0][columns[column_name][1][row]]
+                    for column_name in self.var_columns)
+
+        # Add the hashed tuples of values of the matching columns to the
+        # sketch of their tuple of values of the varying columns
+        if len(self.mat_columns) > 0:
+            mat_hashes = combine_hashes(
+                [hashes[column_name][rows]
+                 for column_name in self.mat_columns])
+            groups = np.split(
+                mat_hashes[np.argsort(inverse.ravel(), kind="stable")],
+                np.cumsum(counts)[:-1])
+            for (hashed, group) in zip(unique_hashes.tolist(), groups):
+                if hashed not in self.distinct_matches.keys():
+                    self.distinct_matches[hashed] = HyperLogLog(
+                        self.relative_error)
+                self.distinct_matches[hashed].add_many(group)
+
+        # Keep only the candidates with the highest estimated frequencies
+        if len(self.candidates) > 2 * self.capacity:
+            candidate_hashes = np.array(list(self.candidates.keys()),
+                                        dtype=np.uint64)
+            estimates = self.frequencies.estimate_many(candidate_hashes)
+            for index in np.argsort(-estimates, kind="stable")[
+                    self.capacity:]:
+                del self.candidates[int(candidate_hashes[index])]
+
+    def get_frequencies(self):
+        # Annotate each estimated frequency with its additive error
+        error = self.frequencies.get_error()
+        return {
+            var_value: "{} (+/- {})".format(
+                self.frequencies.estimate(hashed),
+                error)
+            for (hashed, var_value) in self.candidates.items()
+        }
+
+    def get_distinct_matches(self):
+        # Annotate each estimated number of distinct matches with its error
+        return {
+            var_value: "{} (+/- {})".format(
+                self.distinct_matches[hashed].count(),
+                self.distinct_matches[hashed].get_error())
+            for (hashed, var_value) in self.candidates.items()
+        }
+
+
+def get_sketched_columns(method_name, task):
+    """Return the columns and conditions that a task examines."""
+    # The frequencies of each inspected column of the solo frequencies
+    # are sketched separately and prefixed with the name of the column
+    if method_name == "solo-frequencies":
+        return [
+            ((column_name,),) + get_frequency_columns([column_name])
+            for column_name in task
+        ]
+    elif method_name == "group-frequencies":
+        return [((),) + get_frequency_columns(list(task[1:]))]
+    elif method_name == "distinct-matches":
+        return [((), list(task[1]), list(task[3:]), list(task[2]))]
+    elif method_name == "matching-frequencies":
+        return [((), list(task[1]), [], list(task[2]))]
+    else:
+        raise ValueError("The results of the \"{}\" analysis method "
+                         "cannot be approximated".format(method_name))
+
+
+def get_frequency_columns(var_columns):
+    # Do not count entries with errors,
+    # except when we want to count the errors themselves
+    if "error_msg" in var_columns:
+        return var_columns, [], []
+    else:
+        return var_columns, [], [("error_msg", None)]
+
+
+def get_condition_mask(columns, condition):
+    # Evaluate the condition once for each distinct value of the column
+    param = condition[0]
+    value = condition[1]
+    if param[0] == "!":
+        # Undefined values never satisfy an inequality
+        distinct_values, codes = columns[param[1:]]
+        matches = [
+            x is not None and (value is None or x != value)
+            for x in distinct_values
+        ]
+    elif param[0] in {"<", ">"}:
+        raise ValueError("The \"{}\" condition cannot be approximated"
+                         "".format(param))
+    else:
+        distinct_values, codes = columns[param]
+        if value is None:
+            matches = [x is None for x in distinct_values]
+        else:
+            matches = [x == value for x in distinct_values]
+    return np.array(matches, dtype=bool)[codes]
+
+
+def write_distinct_matches(out_dirpath, column_match, distinct_matches):
+    out_filepath = os.path.join(out_dirpath, column_match[0])
+    var_values = list(distinct_matches.keys())
+    var_values.sort(key=config.custom_sorter)
+    results = [
+        (var_value, distinct_matches[var_value]) for var_value in var_values
+    ]
+    config.fs.write_tsv(results, out_filepath)
+
+
+def run_sketches(db_filepath, out_dirpath, method_names, epsilon, delta,
+                 relative_error, packet_filters=None):
+    """Approximate the results of analysis methods with a single pass."""
+    # Sanity check
+    for method_name in method_names:
+        if method_name not in APPROX_METHODS:
+            raise ValueError("The results of the \"{}\" analysis method "
+                             "cannot be approximated".format(method_name))
+
+    # Make sure that the output directory of each method exists
+    for method_name in method_names:
+        os.makedirs(os.path.join(out_dirpath, method_name), exist_ok=True)
+
+    # Initialize the sketches of every task
+    sketches = []
+    column_names = set()
+    hashed_columns = set()
+    for method_name in method_names:
+        for task in METHODS[method_name][0]:
+            task_sketches = []
+            for (prefix, var_columns, mat_columns, conditions) in (
+                    get_sketched_columns(method_name, task)):
+                for column_name in (var_columns + mat_columns
+                                    + [x[0].lstrip("!") for x in conditions]):
+                    if column_name not in config.db.PKT_COLUMN_NAMES:
+                        raise ValueError("Unknown column name \"{}\""
+                                         "".format(column_name))
+                    column_names.add(column_name)
+                hashed_columns.update(var_columns + mat_columns)
+                task_sketches.append(
+                    (prefix,
+                     TaskSketch(var_columns, mat_columns, conditions,
+                                epsilon, delta, relative_error)))
+            sketches.append((method_name, task, task_sketches))
+    column_names = [
+        column_name for column_name in config.db.PKT_COLUMN_NAMES
+        if column_name in column_names
+    ]
+    part_sketches = [x[1] for y in sketches for x in y[2]]
+    logging.info("Approximating the results of {} tasks "
+                 "of {} analysis methods..."
+                 "".format(len(sketches), len(method_names)))
+
+    # Update the sketches of all the tasks with each chunk of rows,
+    # evaluating each set of conditions only once per chunk
+    start_time = time.time()
+    database = config.db.Database(db_filepath)
+    database.set_packet_filters(packet_filters)
+    num_rows = 0
+    rows = database.iter_values("packets", column_names, None, False)
+    while True:
+        chunk = [row for (_, row) in zip(range(CHUNK_SIZE), rows)]
+        if len(chunk) == 0:
+            break
+        num_rows += len(chunk)
+        columns = {
+            column_name: encode_values(column_values)
+            for (column_name, column_values) in zip(column_names,
+                                                    zip(*chunk))
+        }
+        hashes = {
+            column_name: hash_column(*columns[column_name])
+            for column_name in hashed_columns
+        }
+        condition_masks = {}
+        masks = {}
+        for sketch in part_sketches:
+            conditions_key = tuple(sketch.conditions)
+            if conditions_key not in masks.keys():
+                mask = np.ones(len(chunk), dtype=bool)
+                for condition in sketch.conditions:
+                    if condition not in condition_masks.keys():
+                        condition_masks[condition] = get_condition_mask(
+                            columns,
+                            condition)
+                    mask &= condition_masks[condition]
+                masks[conditions_key] = mask
+            sketch.update(columns, hashes, masks[conditions_key])
+    database.disconnect()
+    logging.info("Sketched {} packets in {:.3f} seconds"
+                 "".format(num_rows, time.time() - start_time))
+
+    # Write the approximate results in the layout of the exact ones
+    for (method_name, task, task_sketches) in sketches:
+        method_dirpath = os.path.join(out_dirpath, method_name)
+        if method_name == "distinct-matches":
+            write_distinct_matches(
+                method_dirpath,
+                task,
+                task_sketches[0][1].get_distinct_matches())
+            continue
+        frequencies = {}
+        for (prefix, sketch) in task_sketches:
+            for (var_value, frequency) in sketch.get_frequencies().items():
+                frequencies[prefix + var_value] = frequency
+        METHODS[method_name][2](method_dirpath, task, frequencies)
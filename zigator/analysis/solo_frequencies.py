@@ -14,11 +14,10 @@
 # You should have received a copy of the GNU General Public License
 # along with Zigator. If not, see <https://www.gnu.org/licenses/>.
 
-import logging
-import multiprocessing as mp
 import os
 
 from .. import config
+from .aggregates import sqlite_sorter
 
 
 IGNORED_COLUMNS = set([
@@ -45,19 +44,44 @@ INSPECTED_COLUMNS = [column_name for column_name in config.db.PKT_COLUMN_NAMES
                      if column_name not in IGNORED_COLUMNS]
 
 
-def worker(db_filepath, out_dirpath, task_index, task_lock):
-    # Connect to the provided database
-    config.db.connect(db_filepath)
+def aggregate_task(database, column_names):
+    # Use the stored statistics of the columns whose values were all
+    # counted exactly, if they cover the examined rows
+    column_stats = database.load_column_stats()
+    aggregate = {}
+    counted_columns = []
+    for column_name in column_names:
+        if (column_name not in column_stats.keys()
+                or column_stats[column_name][6] > 0):
+            counted_columns.append(column_name)
+            continue
+        _, null_count, _, _, _, top_values, _ = column_stats[column_name]
+        if null_count > 0:
+            aggregate[(column_name, None)] = null_count
+        for (var_value, count) in top_values:
+            aggregate[(column_name, var_value)] = count
+
+    # Count the values of the other columns with a GROUP BY query each
+    for column_name in counted_columns:
+        # Do not count entries with errors,
+        # except when we want to count the errors themselves
+        grouped_counts = database.grouped_count(
+            "packets",
+            [column_name],
+            column_name == "error_msg")
+        for (var_value, count) in grouped_counts:
+            aggregate[(column_name, var_value)] = count
+    return aggregate
+
 
-    while True:
-        with task_lock:
-            # Get the next task
-            if task_index.value < len(INSPECTED_COLUMNS):
-                column_name = INSPECTED_COLUMNS[task_index.value]
-                task_index.value += 1
-            else:
-                break
+def write_task(out_dirpath, column_names, aggregate):
+    # Group the computed frequencies by column
+    column_frequencies = {column_name: {} for column_name in column_names}
+    for (column_name, var_value) in aggregate.keys():
+        column_frequencies[column_name][(var_value,)] = aggregate[
+            (column_name, var_value)]
 
+    for column_name in column_names:
         # Derive the path of the output file
         global_index = config.db.PKT_COLUMN_NAMES.index(column_name)
         out_filepath = os.path.join(
@@ -66,54 +90,10 @@ def worker(db_filepath, out_dirpath, task_index, task_lock):
                 str(global_index).zfill(3),
                 column_name))
 
-        # Do not count entries with errors,
-        # except when we want to count the errors themselves
-        if column_name == "error_msg":
-            count_errors = True
-        else:
-            count_errors = False
-        results = config.db.grouped_count(
-            "packets",
-            [column_name],
-            count_errors)
-
         # Write the computed frequencies in the output file
+        frequencies = column_frequencies[column_name]
+        results = [
+            var_value + (frequencies[var_value],)
+            for var_value in sorted(frequencies.keys(), key=sqlite_sorter)
+        ]
         config.fs.write_tsv(results, out_filepath)
-
-    # Disconnect from the provided database
-    config.db.disconnect()
-
-
-def solo_frequencies(db_filepath, out_dirpath, num_workers):
-    """Compute the frequency of values for certain columns."""
-    # Make sure that the output directory exists
-    os.makedirs(out_dirpath, exist_ok=True)
-
-    # Determine the number of processes that will be used
-    if num_workers is None:
-        if hasattr(os, "sched_getaffinity"):
-            num_workers = len(os.sched_getaffinity(0))
-        else:
-            num_workers = mp.cpu_count()
-    if num_workers < 1:
-        num_workers = 1
-    logging.info("Computing the frequency of values "
-                 "for {} columns using {} workers..."
-                 "".format(len(INSPECTED_COLUMNS), num_workers))
-
-    # Create variables that will be shared by the processes
-    task_index = mp.Value("L", 0, lock=False)
-    task_lock = mp.Lock()
-
-    # Start the processes
-    processes = []
-    for _ in range(num_workers):
-        p = mp.Process(target=worker,
-                       args=(db_filepath, out_dirpath, task_index, task_lock))
-        p.start()
-        processes.append(p)
-
-    # Make sure that all processes terminated
-    for p in processes:
-        p.join()
-    logging.info("All {} workers completed their tasks".format(num_workers))
@@ -107,6 +107,75 @@ parse_parser.add_argument(
     help="the number of workers that will parse pcap files",
     default=argparse.SUPPRESS,
 )
+parse_parser.add_argument(
+    "--resume",
+    action="store_true",
+    help="skip pcap files that were already parsed into the database",
+)
+parse_parser.add_argument(
+    "--watch",
+    action="store_true",
+    help="keep parsing pcap files as soon as they are closed",
+)
+parse_parser.add_argument(
+    "--watch_delay",
+    type=float,
+    action="store",
+    help="the number of seconds between two scans of the watched directory",
+    default=60.0,
+)
+parse_parser.add_argument(
+    "--dedup_tolerance",
+    type=float,
+    action="store",
+    help="the number of seconds within which duplicate packets are skipped",
+    default=argparse.SUPPRESS,
+)
+parse_parser.add_argument(
+    "--partitioned",
+    action="store_true",
+    help="store the packets in one table per protocol layer",
+)
+parse_parser.add_argument(
+    "--compressed",
+    action="store_true",
+    help="compress the large columns of the partitioned packets table",
+)
+parse_parser.add_argument(
+    "--lazy",
+    action="store_true",
+    help="dissect the frames of the partitioned packets table on demand",
+)
+
+merge_pcaps_parser = zigator_subparsers.add_parser(
+    "merge-pcaps",
+    formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    help="merge pcap files in chronological order",
+)
+merge_pcaps_parser.add_argument(
+    "PCAP_DIRECTORY",
+    type=str,
+    action="store",
+    help="directory with a subdirectory of pcap files for each sensor",
+)
+merge_pcaps_parser.add_argument(
+    "OUTPUT_FILEPATH",
+    type=str,
+    action="store",
+    help="path for the merged pcap file",
+)
+merge_pcaps_parser.add_argument(
+    "--correct_clocks",
+    action="store_true",
+    help="correct the clock offsets of the sensors using common frames",
+)
+merge_pcaps_parser.add_argument(
+    "--max_clock_offset",
+    type=float,
+    action="store",
+    help="the maximum number of seconds between the clocks of two sensors",
+    default=10.0,
+)
 
 analyze_parser = zigator_subparsers.add_parser(
     "analyze",
@@ -134,6 +203,107 @@ analyze_parser.add_argument(
     help="the number of workers that will analyze the database",
     default=argparse.SUPPRESS,
 )
+analyze_parser.add_argument(
+    "--in_memory",
+    action="store_true",
+    help="load the examined columns in memory and share them with workers",
+)
+analyze_parser.add_argument(
+    "--methods",
+    type=str.lower,
+    choices=[
+        "solo-frequencies",
+        "group-frequencies",
+        "distinct-matches",
+        "matching-frequencies",
+        "field-values",
+        "form-frequencies",
+        "selected-frequencies",
+        "battery-percentages",
+        "battery-statuses",
+    ],
+    action="store",
+    help="the analysis methods that will be executed",
+    nargs="+",
+    default=argparse.SUPPRESS,
+)
+analyze_parser.add_argument(
+    "--incremental",
+    action="store_true",
+    help="update the aggregates in the database with the new packets",
+)
+analyze_parser.add_argument(
+    "--approx",
+    action="store_true",
+    help="approximate the results with sketches in a single pass",
+)
+analyze_parser.add_argument(
+    "--approx_epsilon",
+    type=float,
+    action="store",
+    help="the error of approximate frequencies per examined packet",
+    default=0.001,
+)
+analyze_parser.add_argument(
+    "--approx_delta",
+    type=float,
+    action="store",
+    help="the probability of exceeding the error of a frequency",
+    default=0.01,
+)
+analyze_parser.add_argument(
+    "--approx_error",
+    type=float,
+    action="store",
+    help="the relative error of approximate distinct matches",
+    default=0.05,
+)
+analyze_parser.add_argument(
+    "--query_cache",
+    action="store_true",
+    help="reuse the results of queries until the database is modified",
+)
+analyze_parser.add_argument(
+    "--other_databases",
+    type=str,
+    action="store",
+    help="other database files whose results will be merged",
+    nargs="+",
+    default=argparse.SUPPRESS,
+)
+analyze_parser.add_argument(
+    "--since",
+    type=str,
+    action="store",
+    help="examine packets captured at or after this UNIX or ISO 8601 time",
+    default=argparse.SUPPRESS,
+)
+analyze_parser.add_argument(
+    "--until",
+    type=str,
+    action="store",
+    help="examine packets captured before this UNIX or ISO 8601 time",
+    default=argparse.SUPPRESS,
+)
+analyze_parser.add_argument(
+    "--panid",
+    type=str,
+    action="store",
+    help="examine packets whose source or destination PAN ID matches this one",
+    default=argparse.SUPPRESS,
+)
+analyze_parser.add_argument(
+    "--bucket",
+    type=str.lower,
+    choices=[
+        "minute",
+        "hour",
+        "day",
+    ],
+    action="store",
+    help="write the results of each interval in separate directories",
+    default=argparse.SUPPRESS,
+)
 
 visualize_parser = zigator_subparsers.add_parser(
     "visualize",
@@ -154,6 +324,11 @@ visualize_parser.add_argument(
     nargs="?",
     default=os.getcwd(),
 )
+visualize_parser.add_argument(
+    "--query_cache",
+    action="store_true",
+    help="reuse the results of queries until the database is modified",
+)
 
 train_parser = zigator_subparsers.add_parser(
     "train",
@@ -26,6 +26,7 @@ from scapy.all import conf
 
 from . import db
 from . import fs
+from . import registry
 
 
 # Define the path of the configuration directory
@@ -51,6 +52,7 @@ NETWORKS_MSG = 10
 SHORT_ADDRESSES_MSG = 11
 EXTENDED_ADDRESSES_MSG = 12
 PAIRS_MSG = 13
+AGGREGATE_MSG = 14
 
 # Initialize the global variables
 version = "0+unknown"
@@ -63,6 +65,16 @@ extended_addresses = {}
 pairs = {}
 entry = {column_name: None for column_name in db.PKT_COLUMN_NAMES}
 
+# Keep track of the dictionary keys that were touched since the last reset
+touched_entries = {
+    "network_keys": set(),
+    "link_keys": set(),
+    "networks": set(),
+    "short_addresses": set(),
+    "extended_addresses": set(),
+    "pairs": set(),
+}
+
 
 def init(derived_version):
     global version
@@ -150,6 +162,51 @@ def set_entry(pkt_column_name, value_index, known_values):
         return False
 
 
+def reset_touched_entries():
+    for touched_keys in touched_entries.values():
+        touched_keys.clear()
+
+
+def get_touched_entries_msgs():
+    # Collect only the touched entries of each dictionary
+    msgs = []
+    if len(touched_entries["network_keys"]) > 0:
+        msgs.append(
+            (NETWORK_KEYS_MSG,
+             {key_name: network_keys[key_name]
+              for key_name in touched_entries["network_keys"]}))
+    if len(touched_entries["link_keys"]) > 0:
+        msgs.append(
+            (LINK_KEYS_MSG,
+             {key_name: link_keys[key_name]
+              for key_name in touched_entries["link_keys"]}))
+    if len(touched_entries["networks"]) > 0:
+        msgs.append(
+            (NETWORKS_MSG,
+             registry.export_records(
+                 networks,
+                 touched_entries["networks"])))
+    if len(touched_entries["short_addresses"]) > 0:
+        msgs.append(
+            (SHORT_ADDRESSES_MSG,
+             registry.export_records(
+                 short_addresses,
+                 touched_entries["short_addresses"])))
+    if len(touched_entries["extended_addresses"]) > 0:
+        msgs.append(
+            (EXTENDED_ADDRESSES_MSG,
+             registry.export_records(
+                 extended_addresses,
+                 touched_entries["extended_addresses"])))
+    if len(touched_entries["pairs"]) > 0:
+        msgs.append(
+            (PAIRS_MSG,
+             registry.export_records(
+                 pairs,
+                 touched_entries["pairs"])))
+    return msgs
+
+
 def custom_sorter(var_value):
     str_repr = []
     for i in range(len(var_value)):
@@ -165,132 +222,65 @@ def custom_sorter(var_value):
 
 
 def update_networks(panid, epidset, earliest, latest):
-    global networks
-
     # Sanity checks
     if panid is None:
         raise ValueError("The PAN ID is required")
-    elif int(panid, 16) < 0 or int(panid, 16) > 65534:
+    panid = int(panid, 16)
+    if panid < 0 or panid > 65534:
         # Ignore invalid PAN IDs
         return
 
     # Update the dictionary of networks
+    epidset = [int(epid, 16) for epid in epidset]
     if panid in networks.keys():
-        networks[panid]["epidset"] = (
-            networks[panid]["epidset"].union(epidset)
-        )
-
-        if earliest is not None:
-            if networks[panid]["earliest"] is None:
-                networks[panid]["earliest"] = earliest
-            elif earliest < networks[panid]["earliest"]:
-                networks[panid]["earliest"] = earliest
-
-        if latest is not None:
-            if networks[panid]["latest"] is None:
-                networks[panid]["latest"] = latest
-            elif latest > networks[panid]["latest"]:
-                networks[panid]["latest"] = latest
+        networks[panid].update(epidset, earliest, latest)
     else:
-        networks[panid] = {
-            "epidset": epidset,
-            "earliest": earliest,
-            "latest": latest,
-        }
+        networks[panid] = registry.NetworkRecord(epidset, earliest, latest)
+    touched_entries["networks"].add(panid)
 
 
 def update_short_addresses(panid, shortaddr, altset, macset, nwkset, earliest,
                            latest):
-    global short_addresses
-
     # Sanity checks
     if panid is None:
         raise ValueError("The PAN ID is required")
     elif shortaddr is None:
         raise ValueError("The short address is required")
-    elif int(panid, 16) < 0 or int(panid, 16) > 65534:
+    key = (int(panid, 16), int(shortaddr, 16))
+    if key[0] < 0 or key[0] > 65534:
         # Ignore invalid PAN IDs
         return
-    elif int(shortaddr, 16) < 0 or int(shortaddr, 16) > 65527:
+    elif key[1] < 0 or key[1] > 65527:
         # Ignore invalid device short addresses
         return
 
     # Update the dictionary of short addresses
-    if (panid, shortaddr) in short_addresses.keys():
-        short_addresses[(panid, shortaddr)]["altset"] = (
-            short_addresses[(panid, shortaddr)]["altset"].union(altset)
-        )
-
-        short_addresses[(panid, shortaddr)]["macset"] = (
-            short_addresses[(panid, shortaddr)]["macset"].union(macset)
-        )
-
-        short_addresses[(panid, shortaddr)]["nwkset"] = (
-            short_addresses[(panid, shortaddr)]["nwkset"].union(nwkset)
-        )
-
-        if earliest is not None:
-            if short_addresses[(panid, shortaddr)]["earliest"] is None:
-                short_addresses[(panid, shortaddr)]["earliest"] = earliest
-            elif earliest < short_addresses[(panid, shortaddr)]["earliest"]:
-                short_addresses[(panid, shortaddr)]["earliest"] = earliest
-
-        if latest is not None:
-            if short_addresses[(panid, shortaddr)]["latest"] is None:
-                short_addresses[(panid, shortaddr)]["latest"] = latest
-            elif latest > short_addresses[(panid, shortaddr)]["latest"]:
-                short_addresses[(panid, shortaddr)]["latest"] = latest
+    altset = [int(extendedaddr, 16) for extendedaddr in altset]
+    if key in short_addresses.keys():
+        short_addresses[key].update(altset, macset, nwkset, earliest, latest)
     else:
-        short_addresses[(panid, shortaddr)] = {
-            "altset": altset,
-            "macset": macset,
-            "nwkset": nwkset,
-            "earliest": earliest,
-            "latest": latest,
-        }
+        short_addresses[key] = registry.AddressRecord(
+            altset, macset, nwkset, earliest, latest)
+    touched_entries["short_addresses"].add(key)
 
 
 def update_extended_addresses(extendedaddr, altset, macset, nwkset, earliest,
                               latest):
-    global extended_addresses
-
     # Sanity check
     if extendedaddr is None:
         raise ValueError("The extended address is required")
+    key = int(extendedaddr, 16)
 
     # Update the dictionary of extended addresses
-    if extendedaddr in extended_addresses.keys():
-        extended_addresses[extendedaddr]["altset"] = (
-            extended_addresses[extendedaddr]["altset"].union(altset)
-        )
-
-        extended_addresses[extendedaddr]["macset"] = (
-            extended_addresses[extendedaddr]["macset"].union(macset)
-        )
-
-        extended_addresses[extendedaddr]["nwkset"] = (
-            extended_addresses[extendedaddr]["nwkset"].union(nwkset)
-        )
-
-        if earliest is not None:
-            if extended_addresses[extendedaddr]["earliest"] is None:
-                extended_addresses[extendedaddr]["earliest"] = earliest
-            elif earliest < extended_addresses[extendedaddr]["earliest"]:
-                extended_addresses[extendedaddr]["earliest"] = earliest
-
-        if latest is not None:
-            if extended_addresses[extendedaddr]["latest"] is None:
-                extended_addresses[extendedaddr]["latest"] = latest
-            elif latest > extended_addresses[extendedaddr]["latest"]:
-                extended_addresses[extendedaddr]["latest"] = latest
+    altset = [(int(panid, 16), int(shortaddr, 16))
+              for (panid, shortaddr) in altset]
+    if key in extended_addresses.keys():
+        extended_addresses[key].update(altset, macset, nwkset, earliest,
+                                       latest)
     else:
-        extended_addresses[extendedaddr] = {
-            "altset": altset,
-            "macset": macset,
-            "nwkset": nwkset,
-            "earliest": earliest,
-            "latest": latest,
-        }
+        extended_addresses[key] = registry.AddressRecord(
+            altset, macset, nwkset, earliest, latest)
+    touched_entries["extended_addresses"].add(key)
 
 
 def update_alternative_addresses(panid, shortaddr, extendedaddr):
@@ -298,43 +288,43 @@ def update_alternative_addresses(panid, shortaddr, extendedaddr):
         update_short_addresses(
             panid,
             shortaddr,
-            set([extendedaddr]),
-            set(),
-            set(),
+            [extendedaddr],
+            (),
+            (),
             None,
             None)
         update_extended_addresses(
             extendedaddr,
-            set([(panid, shortaddr)]),
-            set(),
-            set(),
+            [(panid, shortaddr)],
+            (),
+            (),
             None,
             None)
 
 
 def update_devtypes(panid, shortaddr, extendedaddr, macdevtype, nwkdevtype):
+    macset = [macdevtype] if macdevtype is not None else ()
+    nwkset = [nwkdevtype] if nwkdevtype is not None else ()
     if panid is not None and shortaddr is not None:
         update_short_addresses(
             panid,
             shortaddr,
-            set(),
-            set([macdevtype]) if macdevtype is not None else set(),
-            set([nwkdevtype]) if nwkdevtype is not None else set(),
+            (),
+            macset,
+            nwkset,
             None,
             None)
     if extendedaddr is not None:
         update_extended_addresses(
             extendedaddr,
-            set(),
-            set([macdevtype]) if macdevtype is not None else set(),
-            set([nwkdevtype]) if nwkdevtype is not None else set(),
+            (),
+            macset,
+            nwkset,
             None,
             None)
 
 
 def update_pairs(panid, srcaddr, dstaddr, earliest, latest):
-    global pairs
-
     # Sanity checks
     if panid is None:
         raise ValueError("The PAN ID is required")
@@ -346,44 +336,46 @@ def update_pairs(panid, srcaddr, dstaddr, earliest, latest):
         raise ValueError("The earliest time is required")
     elif latest is None:
         raise ValueError("The latest time is required")
-    elif int(panid, 16) < 0 or int(panid, 16) > 65534:
+    key = (int(panid, 16), int(srcaddr, 16), int(dstaddr, 16))
+    if key[0] < 0 or key[0] > 65534:
         # Ignore invalid PAN IDs
         return
-    elif int(srcaddr, 16) < 0 or int(srcaddr, 16) > 65527:
+    elif key[1] < 0 or key[1] > 65527:
         # Ignore invalid source short addresses
         return
-    elif int(dstaddr, 16) < 0 or int(dstaddr, 16) > 65527:
+    elif key[2] < 0 or key[2] > 65527:
         # Ignore invalid destination short addresses
         return
 
     # Update the dictionary of pairs
-    if (panid, srcaddr, dstaddr) in pairs.keys():
-        if latest > pairs[(panid, srcaddr, dstaddr)]["latest"]:
-            pairs[(panid, srcaddr, dstaddr)]["latest"] = latest
-
-        if earliest < pairs[(panid, srcaddr, dstaddr)]["earliest"]:
-            pairs[(panid, srcaddr, dstaddr)]["earliest"] = earliest
+    if key in pairs.keys():
+        pairs[key].update(earliest, latest)
     else:
-        pairs[(panid, srcaddr, dstaddr)] = {
-            "earliest": earliest,
-            "latest": latest,
-        }
+        pairs[key] = registry.PairRecord(earliest, latest)
+    touched_entries["pairs"].add(key)
+
+
+def get_short_record(panid, shortaddr):
+    if panid is None or shortaddr is None:
+        return None
+    return short_addresses.get((int(panid, 16), int(shortaddr, 16)))
 
 
 def get_alternative_addresses(panid, shortaddr):
-    if (panid, shortaddr) in short_addresses.keys():
-        return set([int(extendedaddr, 16) for extendedaddr
-                   in short_addresses[(panid, shortaddr)]["altset"]])
+    record = get_short_record(panid, shortaddr)
+    if record is not None:
+        return set(record.altset)
     else:
         return set()
 
 
 def get_extendedaddr(panid, shortaddr):
-    if (panid, shortaddr) in short_addresses.keys():
-        if len(short_addresses[(panid, shortaddr)]["altset"]) == 0:
+    record = get_short_record(panid, shortaddr)
+    if record is not None:
+        if len(record.altset) == 0:
             return None
-        elif len(short_addresses[(panid, shortaddr)]["altset"]) == 1:
-            return list(short_addresses[(panid, shortaddr)]["altset"])[0]
+        elif len(record.altset) == 1:
+            return registry.format_extendedaddr(next(iter(record.altset)))
         else:
             return "Conflicting Data"
     else:
@@ -393,26 +385,50 @@ def get_extendedaddr(panid, shortaddr):
 def get_nwkdevtype(panid, shortaddr, extendedaddr):
     nwkset = set()
 
-    if (panid, shortaddr) in short_addresses.keys():
-        nwkset = nwkset.union(short_addresses[(panid, shortaddr)]["nwkset"])
+    record = get_short_record(panid, shortaddr)
+    if record is not None:
+        nwkset.update(record.nwkset)
         if len(nwkset) > 1:
             return "Conflicting Data"
 
-    if extendedaddr in extended_addresses.keys():
-        nwkset = nwkset.union(extended_addresses[extendedaddr]["nwkset"])
+    if extendedaddr is not None and extendedaddr != "Conflicting Data":
+        record = extended_addresses.get(int(extendedaddr, 16))
+        if record is not None:
+            nwkset.update(record.nwkset)
 
     if len(nwkset) == 0:
         return None
     elif len(nwkset) == 1:
-        return list(nwkset)[0]
+        return next(iter(nwkset))
     else:
         return "Conflicting Data"
 
 
-def update_derived_entries():
+def fetch_derived_values(role, selected_columns, conditions, scopes):
+    # Examine all the packets, unless the scopes of the update were provided
+    if scopes is None:
+        return db.fetch_values("packets", selected_columns, conditions, True)
+
+    # Merge the distinct values that were fetched from each scope
+    fetched_tuples = set()
+    for scope in scopes:
+        fetched_tuples.update(db.fetch_values(
+            "packets",
+            selected_columns,
+            conditions + [(param.format(role), value)
+                          for (param, value) in scope],
+            True))
+    return list(fetched_tuples)
+
+
+def update_derived_entries(scopes=None):
+    # Each scope is a list of conditions, in which the column names may
+    # include a placeholder for the address role (e.g., "der_{}panid"),
+    # that restricts the packets whose derived entries may be outdated
+
     # Update previously unknown MAC Destination extended addresses
-    fetched_tuples = db.fetch_values(
-        "packets",
+    fetched_tuples = fetch_derived_values(
+        "mac_dst",
         [
             "der_mac_dstpanid",
             "der_mac_dstshortaddr",
@@ -424,7 +440,7 @@ def update_derived_entries():
             ("!der_mac_dstshortaddr", "0xffff"),
             ("der_mac_dstextendedaddr", None),
         ],
-        True)
+        scopes)
     for (panid, shortaddr) in fetched_tuples:
         extendedaddr = get_extendedaddr(panid, shortaddr)
         if extendedaddr is not None:
@@ -443,8 +459,8 @@ def update_derived_entries():
                 ])
 
     # Update previously unknown MAC Source extended addresses
-    fetched_tuples = db.fetch_values(
-        "packets",
+    fetched_tuples = fetch_derived_values(
+        "mac_src",
         [
             "der_mac_srcpanid",
             "der_mac_srcshortaddr",
@@ -455,7 +471,7 @@ def update_derived_entries():
             ("!der_mac_srcshortaddr", None),
             ("der_mac_srcextendedaddr", None),
         ],
-        True)
+        scopes)
     for (panid, shortaddr) in fetched_tuples:
         extendedaddr = get_extendedaddr(panid, shortaddr)
         if extendedaddr is not None:
@@ -474,8 +490,8 @@ def update_derived_entries():
                 ])
 
     # Update previously unknown NWK Destination extended addresses
-    fetched_tuples = db.fetch_values(
-        "packets",
+    fetched_tuples = fetch_derived_values(
+        "nwk_dst",
         [
             "der_nwk_dstpanid",
             "der_nwk_dstshortaddr",
@@ -490,7 +506,7 @@ def update_derived_entries():
             ("!der_nwk_dstshortaddr", "0xfffb"),
             ("der_nwk_dstextendedaddr", None),
         ],
-        True)
+        scopes)
     for (panid, shortaddr) in fetched_tuples:
         extendedaddr = get_extendedaddr(panid, shortaddr)
         if extendedaddr is not None:
@@ -509,8 +525,8 @@ def update_derived_entries():
                 ])
 
     # Update previously unknown NWK Source extended addresses
-    fetched_tuples = db.fetch_values(
-        "packets",
+    fetched_tuples = fetch_derived_values(
+        "nwk_src",
         [
             "der_nwk_srcpanid",
             "der_nwk_srcshortaddr",
@@ -521,7 +537,7 @@ def update_derived_entries():
             ("!der_nwk_srcshortaddr", None),
             ("der_nwk_srcextendedaddr", None),
         ],
-        True)
+        scopes)
     for (panid, shortaddr) in fetched_tuples:
         extendedaddr = get_extendedaddr(panid, shortaddr)
         if extendedaddr is not None:
@@ -540,8 +556,8 @@ def update_derived_entries():
                 ])
 
     # Update previously unknown MAC Destination types
-    fetched_tuples = db.fetch_values(
-        "packets",
+    fetched_tuples = fetch_derived_values(
+        "mac_dst",
         [
             "der_mac_dstpanid",
             "der_mac_dstshortaddr",
@@ -551,7 +567,7 @@ def update_derived_entries():
             ("error_msg", None),
             ("der_mac_dsttype", "MAC Dst Type: None"),
         ],
-        True)
+        scopes)
     for (panid, shortaddr, extendedaddr) in fetched_tuples:
         nwkdevtype = get_nwkdevtype(panid, shortaddr, extendedaddr)
         if nwkdevtype is not None:
@@ -570,8 +586,8 @@ def update_derived_entries():
                 ])
 
     # Update previously unknown MAC Source types
-    fetched_tuples = db.fetch_values(
-        "packets",
+    fetched_tuples = fetch_derived_values(
+        "mac_src",
         [
             "der_mac_srcpanid",
             "der_mac_srcshortaddr",
@@ -581,7 +597,7 @@ def update_derived_entries():
             ("error_msg", None),
             ("der_mac_srctype", "MAC Src Type: None"),
         ],
-        True)
+        scopes)
     for (panid, shortaddr, extendedaddr) in fetched_tuples:
         nwkdevtype = get_nwkdevtype(panid, shortaddr, extendedaddr)
         if nwkdevtype is not None:
@@ -600,8 +616,8 @@ def update_derived_entries():
                 ])
 
     # Update previously unknown NWK Destination types
-    fetched_tuples = db.fetch_values(
-        "packets",
+    fetched_tuples = fetch_derived_values(
+        "nwk_dst",
         [
             "der_nwk_dstpanid",
             "der_nwk_dstshortaddr",
@@ -611,7 +627,7 @@ def update_derived_entries():
             ("error_msg", None),
             ("der_nwk_dsttype", "NWK Dst Type: None"),
         ],
-        True)
+        scopes)
     for (panid, shortaddr, extendedaddr) in fetched_tuples:
         nwkdevtype = get_nwkdevtype(panid, shortaddr, extendedaddr)
         if nwkdevtype is not None:
@@ -630,8 +646,8 @@ def update_derived_entries():
                 ])
 
     # Update previously unknown NWK Source types
-    fetched_tuples = db.fetch_values(
-        "packets",
+    fetched_tuples = fetch_derived_values(
+        "nwk_src",
         [
             "der_nwk_srcpanid",
             "der_nwk_srcshortaddr",
@@ -641,7 +657,7 @@ def update_derived_entries():
             ("error_msg", None),
             ("der_nwk_srctype", "NWK Src Type: None"),
         ],
-        True)
+        scopes)
     for (panid, shortaddr, extendedaddr) in fetched_tuples:
         nwkdevtype = get_nwkdevtype(panid, shortaddr, extendedaddr)
         if nwkdevtype is not None:
@@ -660,8 +676,29 @@ def update_derived_entries():
                 ])
 
     # Check for conflicting extended addresses
-    for (panid, shortaddr) in short_addresses.keys():
-        if len(short_addresses[(panid, shortaddr)]["altset"]) > 1:
+    if scopes is None:
+        fetched_tuples = [
+            (registry.format_shortaddr(panid),
+             registry.format_shortaddr(shortaddr))
+            for (panid, shortaddr) in short_addresses.keys()
+        ]
+    else:
+        fetched_tuples = set()
+        for role in ["mac_dst", "mac_src", "nwk_dst", "nwk_src"]:
+            fetched_tuples.update(fetch_derived_values(
+                role,
+                [
+                    "der_{}panid".format(role),
+                    "der_{}shortaddr".format(role),
+                ],
+                [
+                    ("error_msg", None),
+                    ("!der_{}panid".format(role), None),
+                    ("!der_{}shortaddr".format(role), None),
+                ],
+                scopes))
+    for (panid, shortaddr) in fetched_tuples:
+        if get_extendedaddr(panid, shortaddr) == "Conflicting Data":
             db.update_packets(
                 [
                     "der_mac_dstextendedaddr",
@@ -712,8 +749,8 @@ def update_derived_entries():
                 ])
 
     # Check for conflicting MAC Destination types
-    fetched_tuples = db.fetch_values(
-        "packets",
+    fetched_tuples = fetch_derived_values(
+        "mac_dst",
         [
             "der_mac_dstpanid",
             "der_mac_dstshortaddr",
@@ -723,7 +760,7 @@ def update_derived_entries():
             ("error_msg", None),
             ("!der_mac_dstshortaddr", "0xffff"),
         ],
-        True)
+        scopes)
     for (panid, shortaddr, extendedaddr) in fetched_tuples:
         nwkdevtype = get_nwkdevtype(panid, shortaddr, extendedaddr)
         if nwkdevtype == "Conflicting Data":
@@ -742,8 +779,8 @@ def update_derived_entries():
                 ])
 
     # Check for conflicting MAC Source types
-    fetched_tuples = db.fetch_values(
-        "packets",
+    fetched_tuples = fetch_derived_values(
+        "mac_src",
         [
             "der_mac_srcpanid",
             "der_mac_srcshortaddr",
@@ -752,7 +789,7 @@ def update_derived_entries():
         [
             ("error_msg", None),
         ],
-        True)
+        scopes)
     for (panid, shortaddr, extendedaddr) in fetched_tuples:
         nwkdevtype = get_nwkdevtype(panid, shortaddr, extendedaddr)
         if nwkdevtype == "Conflicting Data":
@@ -771,8 +808,8 @@ def update_derived_entries():
                 ])
 
     # Check for conflicting NWK Destination types
-    fetched_tuples = db.fetch_values(
-        "packets",
+    fetched_tuples = fetch_derived_values(
+        "nwk_dst",
         [
             "der_nwk_dstpanid",
             "der_nwk_dstshortaddr",
@@ -785,7 +822,7 @@ def update_derived_entries():
             ("!der_nwk_dstshortaddr", "0xfffc"),
             ("!der_nwk_dstshortaddr", "0xfffb"),
         ],
-        True)
+        scopes)
     for (panid, shortaddr, extendedaddr) in fetched_tuples:
         nwkdevtype = get_nwkdevtype(panid, shortaddr, extendedaddr)
         if nwkdevtype == "Conflicting Data":
@@ -804,8 +841,8 @@ def update_derived_entries():
                 ])
 
     # Check for conflicting NWK Source types
-    fetched_tuples = db.fetch_values(
-        "packets",
+    fetched_tuples = fetch_derived_values(
+        "nwk_src",
         [
             "der_nwk_srcpanid",
             "der_nwk_srcshortaddr",
@@ -814,7 +851,7 @@ def update_derived_entries():
         [
             ("error_msg", None),
         ],
-        True)
+        scopes)
     for (panid, shortaddr, extendedaddr) in fetched_tuples:
         nwkdevtype = get_nwkdevtype(panid, shortaddr, extendedaddr)
         if nwkdevtype == "Conflicting Data":
@@ -857,6 +894,7 @@ def add_new_key(key_bytes, key_type, key_name):
                               loaded_keys[key_name].hex()))
         else:
             loaded_keys[key_name] = key_bytes
+            touched_entries["{}_keys".format(key_type.lower())].add(key_name)
     return None
 
 
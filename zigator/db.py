@@ -18,8 +18,18 @@
 Database module for the zigator package
 """
 
+import functools
+import logging
 import sqlite3
 import string
+import sys
+import zlib
+
+from . import registry
+from . import serialization
+from .query_cache import CACHE_SUFFIX
+from .query_cache import MAX_CACHE_SIZE
+from .query_cache import QueryCache
 
 
 # Define the columns of the packets table in the database
@@ -331,11 +341,33 @@ EVENTS_COLUMNS = [
     ("description", "TEXT"),
 ]
 
+# Define the columns of the duplicates table in the database
+DUPLICATES_COLUMNS = [
+    ("pcap_directory", "TEXT"),
+    ("pcap_filename", "TEXT"),
+    ("pkt_num", "INTEGER"),
+    ("pkt_time", "REAL"),
+    ("orig_pcap_directory", "TEXT"),
+    ("orig_pcap_filename", "TEXT"),
+    ("orig_pkt_num", "INTEGER"),
+]
+
+# Define the columns of the zcl_attributes table in the database
+ZCL_ATTR_COLUMNS = [
+    ("pkt_rowid", "INTEGER"),
+    ("cluster_id", "TEXT"),
+    ("attribute_id", "TEXT"),
+    ("datatype", "TEXT"),
+    ("value", "TEXT"),
+]
+
 # Define a list that contains only the column names for each table
 PKT_COLUMN_NAMES = [column[0] for column in PKT_COLUMNS]
 BASIC_INFO_COLUMN_NAMES = [column[0] for column in BASIC_INFO_COLUMNS]
 BTRY_PERC_COLUMN_NAMES = [column[0] for column in BTRY_PERC_COLUMNS]
 EVENTS_COLUMN_NAMES = [column[0] for column in EVENTS_COLUMNS]
+DUPLICATES_COLUMN_NAMES = [column[0] for column in DUPLICATES_COLUMNS]
+ZCL_ATTR_COLUMN_NAMES = [column[0] for column in ZCL_ATTR_COLUMNS]
 
 # Define sets that will be used to construct valid column definitions
 ALLOWED_CHARACTERS = set(string.ascii_letters + string.digits + "_")
@@ -359,46 +391,1520 @@ CONSTRAINED_EVENTS_COLUMNS = set([
     "pkt_time",
     "description",
 ])
+CONSTRAINED_DUPLICATES_COLUMNS = set(DUPLICATES_COLUMN_NAMES)
+CONSTRAINED_ZCL_ATTR_COLUMNS = set(ZCL_ATTR_COLUMN_NAMES)
+
+# Define the columns and the constrained columns of each known table
+TABLES = {
+    "packets": (
+        PKT_COLUMNS,
+        PKT_COLUMN_NAMES,
+        CONSTRAINED_PKT_COLUMNS,
+    ),
+    "basic_information": (
+        BASIC_INFO_COLUMNS,
+        BASIC_INFO_COLUMN_NAMES,
+        CONSTRAINED_BASIC_INFO_COLUMNS,
+    ),
+    "battery_percentages": (
+        BTRY_PERC_COLUMNS,
+        BTRY_PERC_COLUMN_NAMES,
+        CONSTRAINED_BTRY_PERC_COLUMNS,
+    ),
+    "events": (
+        EVENTS_COLUMNS,
+        EVENTS_COLUMN_NAMES,
+        CONSTRAINED_EVENTS_COLUMNS,
+    ),
+    "duplicates": (
+        DUPLICATES_COLUMNS,
+        DUPLICATES_COLUMN_NAMES,
+        CONSTRAINED_DUPLICATES_COLUMNS,
+    ),
+    "zcl_attributes": (
+        ZCL_ATTR_COLUMNS,
+        ZCL_ATTR_COLUMN_NAMES,
+        CONSTRAINED_ZCL_ATTR_COLUMNS,
+    ),
+}
+
+# Define the packet columns with the attribute lists of each ZCL command,
+# i.e., their identifiers, data types, values, and optionally statuses
+ZCL_ATTR_LISTS = {
+    "0x01: Read Attributes Response": (
+        "zcl_readattributesresponse_identifiers",
+        "zcl_readattributesresponse_datatypes",
+        "zcl_readattributesresponse_values",
+        "zcl_readattributesresponse_statuses",
+    ),
+    "0x0a: Report Attributes": (
+        "zcl_reportattributes_identifiers",
+        "zcl_reportattributes_datatypes",
+        "zcl_reportattributes_data",
+    ),
+}
+
+# Define the core columns of the partitioned layout of the packets table,
+# which hold the identifiers, the capture headers, the frame types,
+# the derived addresses, and the errors of each packet
+CORE_PKT_COLUMNS = set([
+    "pcap_directory",
+    "pcap_filename",
+    "pkt_num",
+    "pkt_time",
+    "phy_length",
+    "aps_profile_id",
+    "aps_cluster_id",
+    "warning_msg",
+    "error_msg",
+])
+CORE_PKT_PREFIXES = ("der_", "sll_")
+CORE_PKT_SUFFIXES = ("_frametype", "_cmd_id", "_security")
+
+# Define the side tables of the partitioned layout of the packets table,
+# which hold the other columns of each protocol layer, along with the
+# prefixes of the names of their columns
+PKT_PARTITION_PREFIXES = [
+    ("packets_security", ("nwk_aux_", "aps_aux_")),
+    ("packets_mac", ("sll_", "phy_", "mac_")),
+    ("packets_nwk", ("nwk_",)),
+    ("packets_aps", ("aps_",)),
+    ("packets_zdp", ("zdp_",)),
+    ("packets_zcl", ("zcl_",)),
+]
+
+# Define the large columns of the packets table, which the partitioned
+# layout stores in their own side table, either as text or compressed
+HEX_PKT_COLUMNS = set([
+    "phy_payload",
+    "nwk_aux_decpayload",
+    "aps_aux_decpayload",
+])
+SHOW_PKT_COLUMNS = set([
+    "mac_show",
+    "nwk_aux_decshow",
+    "aps_aux_decshow",
+])
 
-# Initialize global variables for interacting with the database
-connection = None
-cursor = None
+# Define the SQL functions that decode the values of the large columns
+BLOB_FUNCTIONS = {
+    "hex": "zigator_blob_hex",
+    "show": "zigator_blob_text",
+    "frame": "zigator_frame_field",
+}
 
+# Functions can be marked as deterministic only with Python 3.8 or later
+# and SQLite 3.8.3 or later, which lets SQLite optimize their invocations
+if sys.version_info >= (3, 8) and sqlite3.sqlite_version_info >= (3, 8, 3):
+    DETERMINISTIC_OPTIONS = {"deterministic": True}
+else:
+    DETERMINISTIC_OPTIONS = {}
 
-def connect(db_filepath):
-    global connection
-    global cursor
+# Define the number of rows that are fetched at a time by iterators
+FETCH_SIZE = 1000
 
-    # Open a connection with the database
-    connection = sqlite3.connect(db_filepath)
-    connection.text_factory = str
-    cursor = connection.cursor()
+# Define the number of prepared statements that each connection caches
+CACHED_STATEMENTS = 256
 
 
-def create_table(tablename):
+def get_table(tablename):
     # Use the variables of the corresponding table
-    if tablename == "packets":
-        table_columns = PKT_COLUMNS
-        constrained_table_columns = CONSTRAINED_PKT_COLUMNS
-    elif tablename == "basic_information":
-        table_columns = BASIC_INFO_COLUMNS
-        constrained_table_columns = CONSTRAINED_BASIC_INFO_COLUMNS
-    elif tablename == "battery_percentages":
-        table_columns = BTRY_PERC_COLUMNS
-        constrained_table_columns = CONSTRAINED_BTRY_PERC_COLUMNS
-    elif tablename == "events":
-        table_columns = EVENTS_COLUMNS
-        constrained_table_columns = CONSTRAINED_EVENTS_COLUMNS
-    else:
+    if tablename not in TABLES.keys():
         raise ValueError("Unknown table name \"{}\"".format(tablename))
+    return TABLES[tablename]
+
+
+def get_pkt_partition(column_name):
+    """Return the table of the partitioned layout that holds a column."""
+    if column_name == "rowid":
+        return "packets_core"
+    elif column_name not in PKT_COLUMN_NAMES:
+        raise ValueError("Unknown column name \"{}\"".format(column_name))
+    elif column_name in HEX_PKT_COLUMNS or column_name in SHOW_PKT_COLUMNS:
+        return "packets_blobs"
+    elif (column_name in CORE_PKT_COLUMNS
+            or column_name.startswith(CORE_PKT_PREFIXES)
+            or column_name.endswith(CORE_PKT_SUFFIXES)):
+        return "packets_core"
+    for (partition, prefixes) in PKT_PARTITION_PREFIXES:
+        if column_name.startswith(prefixes):
+            return partition
+    raise ValueError("The column \"{}\" does not belong to any partition"
+                     "".format(column_name))
+
+
+# Define the columns of each table of the partitioned layout
+PKT_PARTITIONS = {
+    partition: [
+        column for column in PKT_COLUMNS
+        if get_pkt_partition(column[0]) == partition
+    ]
+    for partition in (["packets_core"]
+                      + [x[0] for x in PKT_PARTITION_PREFIXES]
+                      + ["packets_blobs"])
+}
+
+
+# Define the tables of the lazy layout of the packets table, which stores
+# only the core columns and the raw frames, while its side tables are
+# views that dissect the frames again whenever they are queried
+LAZY_PKT_PARTITIONS = {
+    "packets_core": PKT_PARTITIONS["packets_core"],
+    "packets_frames": [("phy_payload", "BLOB")],
+}
+LAZY_PKT_COLUMNS = set(
+    column[0]
+    for partition in PKT_PARTITIONS.keys()
+    if partition != "packets_core"
+    for column in PKT_PARTITIONS[partition]
+    if column[0] != "phy_payload"
+)
+
+# The maximum size of the query cache of each subsequent connection,
+# unless the results of queries should not be cached
+query_cache_size = None
+
+
+def enable_query_caches(max_size=MAX_CACHE_SIZE):
+    """Cache the results of queries for each subsequent connection."""
+    global query_cache_size
+    query_cache_size = max_size
+
+
+# Define the maximum number of dissected frames that are memoized
+FRAME_CACHE_SIZE = 1024
+
+# The function that dissects the frames of the lazy layout is provided by
+# the parsing modules, which depend on this module
+frame_dissector = None
+
+
+def set_frame_dissector(dissector):
+    """Set the function that dissects the frames of the lazy layout."""
+    global frame_dissector
+    frame_dissector = dissector
+    dissect_frame.cache_clear()
+
+
+@functools.lru_cache(maxsize=FRAME_CACHE_SIZE)
+def dissect_frame(frame, learned_keys):
+    # Each frame is dissected with the keys that were learned while
+    # parsing the database that stores it
+    if frame_dissector is None:
+        raise ValueError("There is no function that dissects frames")
+    return frame_dissector(frame, dict(learned_keys[0]),
+                           dict(learned_keys[1]))
+
+
+def get_blob_function(column_name):
+    """Return the SQL function that decodes a large column, if any."""
+    if column_name in HEX_PKT_COLUMNS:
+        return BLOB_FUNCTIONS["hex"]
+    elif column_name in SHOW_PKT_COLUMNS:
+        return BLOB_FUNCTIONS["show"]
+    return None
+
+
+def encode_blob(column_name, value):
+    """Return the compressed value of a large column."""
+    if value is None:
+        return None
+    elif column_name in HEX_PKT_COLUMNS:
+        return bytes.fromhex(value)
+    elif column_name in SHOW_PKT_COLUMNS:
+        return zlib.compress(value.encode())
+    return value
+
+
+def decode_blob_hex(value):
+    # Plain text values were stored without compression
+    if isinstance(value, bytes):
+        return value.hex()
+    return value
+
+
+def decode_blob_text(value):
+    # Plain text values were stored without compression
+    if isinstance(value, bytes):
+        return zlib.decompress(value).decode()
+    return value
+
+
+def get_index_partition(column_names):
+    """Return the only table of the partitioned layout that holds columns."""
+    partitions = set(get_pkt_partition(x) for x in column_names)
+    if len(partitions) != 1:
+        raise ValueError("The columns {} are not stored in a single "
+                         "partition".format(column_names))
+    return partitions.pop()
+
+
+def check_name(name):
+    for i in range(len(name)):
+        if name[i] not in ALLOWED_CHARACTERS:
+            raise ValueError("The character \"{}\" in the name \"{}\" "
+                             "is not allowed".format(name[i], name))
+
+
+class Database(object):
+    """Connection with a database file and the operations that it supports.
+
+    Each instance uses its own connection, so that multiple processes and
+    threads can interact with the same database file concurrently.
+    """
+
+    def __init__(self, db_filepath=None, pragmas=None):
+        self.connection = None
+        self.cursor = None
+        self.commands = {}
+        self.rowid_range = (None, None)
+        self.packet_filters = []
+        self.partitioned = False
+        self.compressed = False
+        self.lazy = False
+        self.learned_keys = ((), ())
+        self.query_cache = None
+        self.fingerprint = None
+        self.modification_state = None
+        if db_filepath is not None:
+            self.connect(db_filepath, pragmas)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.connection is not None:
+            if exc_type is None:
+                self.connection.commit()
+            self.disconnect()
+
+    def connect(self, db_filepath, pragmas=None):
+        # Open a connection with the database
+        self.connection = sqlite3.connect(
+            db_filepath,
+            cached_statements=CACHED_STATEMENTS)
+        self.connection.text_factory = str
+        self.cursor = self.connection.cursor()
+
+        # Register the functions that decode the large columns
+        self.connection.create_function(
+            BLOB_FUNCTIONS["hex"], 1, decode_blob_hex,
+            **DETERMINISTIC_OPTIONS)
+        self.connection.create_function(
+            BLOB_FUNCTIONS["show"], 1, decode_blob_text,
+            **DETERMINISTIC_OPTIONS)
+        self.connection.create_function(
+            BLOB_FUNCTIONS["frame"], 2, self.get_frame_field)
+
+        # Determine the layout of the packets table
+        self.cursor.execute("SELECT COUNT(*) FROM sqlite_master "
+                            "WHERE type=\"view\" AND name=\"packets\"")
+        self.partitioned = self.cursor.fetchall()[0][0] > 0
+        self.cursor.execute("SELECT type FROM pragma_table_info"
+                            "(\"packets_blobs\") WHERE name=\"mac_show\"")
+        self.compressed = self.cursor.fetchall() == [("BLOB",)]
+        self.lazy = self.partitioned and self.table_exists("packets_frames")
+        self.commands = {}
+
+        # Load the keys with which the frames of the lazy layout are dissected
+        self.learned_keys = ((), ())
+        if self.lazy and self.table_exists("parsing_state"):
+            _, state = self.load_progress()
+            if len(state) > 0:
+                self.learned_keys = (
+                    tuple(sorted(state["network_keys"].items())),
+                    tuple(sorted(state["link_keys"].items())),
+                )
+
+        # Reuse the results of queries on the same contents, if enabled
+        self.query_cache = None
+        self.modification_state = None
+        if query_cache_size is not None and self.table_exists("packets"):
+            self.query_cache = QueryCache(
+                db_filepath + CACHE_SUFFIX,
+                self.get_fingerprint,
+                query_cache_size)
+
+        # Configure the connection with the provided pragmas
+        if pragmas is not None:
+            for name in pragmas.keys():
+                self.set_pragma(name, pragmas[name])
+
+    def set_pragma(self, name, value):
+        # Sanity checks
+        check_name(name)
+        if isinstance(value, bool) or not isinstance(value, (int, str)):
+            raise ValueError("Unsupported value for the pragma \"{}\": {}"
+                             "".format(name, value))
+        elif isinstance(value, str):
+            check_name(value)
+
+        self.cursor.execute("PRAGMA {}={}".format(name, value))
+
+    def set_rowid_range(self, min_rowid=None, max_rowid=None):
+        # Restrict the rows that are examined by the read operations to
+        # those whose row ID is greater than the minimum row ID and not
+        # greater than the maximum row ID, unless they are undefined
+        self.rowid_range = (min_rowid, max_rowid)
+
+    def set_packet_filters(self, conditions=None):
+        # Restrict the rows that are examined by the read operations to
+        # those that also match the provided conditions on their packets
+        self.packet_filters = [] if conditions is None else list(conditions)
+
+    def restrict_conditions(self, conditions):
+        min_rowid, max_rowid = self.rowid_range
+        if (min_rowid is None and max_rowid is None
+                and len(self.packet_filters) == 0):
+            return conditions
+        conditions = [] if conditions is None else list(conditions)
+        if min_rowid is not None:
+            conditions.append((">rowid", min_rowid))
+        if max_rowid is not None:
+            conditions.append(("<=rowid", max_rowid))
+        conditions.extend(self.packet_filters)
+        return conditions
+
+    def get_command(self, key, builder, *args):
+        # Construct each command only once and validate it along the way
+        if key not in self.commands.keys():
+            self.commands[key] = builder(*args)
+        return self.commands[key]
+
+    def get_pkt_partitions(self):
+        # Return the tables that store the columns of the packets
+        if self.lazy:
+            return LAZY_PKT_PARTITIONS
+        return PKT_PARTITIONS
+
+    def get_fingerprint(self):
+        # The fingerprint is recomputed only if the database was modified
+        # since it was last computed, either by another connection, which
+        # changes the data version, or by this connection
+        self.cursor.execute("PRAGMA data_version")
+        modification_state = (self.cursor.fetchall()[0][0],
+                              self.connection.total_changes)
+        if modification_state == self.modification_state:
+            return self.fingerprint
+
+        # The largest row ID of the packets and the number of
+        # modifications that preserved it identify the stored packets
+        self.cursor.execute("SELECT MAX(rowid) FROM {}".format(
+            "packets_core" if self.partitioned else "packets"))
+        max_rowid = self.cursor.fetchall()[0][0]
+        self.cursor.execute("PRAGMA user_version")
+        num_modifications = self.cursor.fetchall()[0][0]
+        self.fingerprint = (max_rowid, num_modifications)
+        self.modification_state = modification_state
+        return self.fingerprint
+
+    def count_modification(self):
+        # The user version of the database file counts the modifications
+        self.modification_state = None
+        self.cursor.execute("PRAGMA user_version")
+        num_modifications = self.cursor.fetchall()[0][0]
+        self.cursor.execute("PRAGMA user_version={}".format(
+            (num_modifications + 1) % 2**31))
+
+    def get_query_cache(self, tablename):
+        # Only the results of queries on the packets and their reported
+        # attributes are cached, since the fingerprint covers only them
+        if tablename not in {"packets", "zcl_attributes"}:
+            return None
+        return self.query_cache
+
+    def fetch_results(self, tablename, command, params):
+        # Reuse the results of a previous execution of the same query
+        query_cache = self.get_query_cache(tablename)
+        if query_cache is not None:
+            results = query_cache.get(command, params)
+            if results is not None:
+                return results
+        self.cursor.execute(command, params)
+        results = self.cursor.fetchall()
+        if query_cache is not None:
+            query_cache.put(command, params, results)
+        return results
+
+    def get_frame_field(self, frame, column_name):
+        if frame is None:
+            return None
+        return dissect_frame(frame, self.learned_keys)[column_name]
+
+    def create_table(self, tablename, partitioned=False, compressed=False,
+                     lazy=False):
+        table_columns, _, constrained_table_columns = get_table(tablename)
+
+        # Sanity checks
+        if partitioned and tablename != "packets":
+            raise ValueError("Only the packets table can be partitioned")
+        elif (compressed or lazy) and not partitioned:
+            raise ValueError("Only the partitioned packets table "
+                             "can be compressed or lazy")
+        elif compressed and lazy:
+            raise ValueError("The lazy packets table stores only "
+                             "the raw frames, which cannot be compressed")
+
+        # The analysis aggregates are invalidated along with the packets
+        if tablename == "packets":
+            self.discard_aggregates()
+            self.count_modification()
+
+            # Drop the tables and the views of any layout if they exist
+            pkt_tablenames = (["packets"] + list(PKT_PARTITIONS.keys())
+                              + list(LAZY_PKT_PARTITIONS.keys()))
+            self.cursor.execute(
+                "SELECT type, name FROM sqlite_master WHERE name IN ({})"
+                "".format(", ".join("?"*len(pkt_tablenames))),
+                tuple(pkt_tablenames))
+            for (object_type, object_name) in self.cursor.fetchall():
+                self.cursor.execute("DROP {} IF EXISTS {}".format(
+                    object_type.upper(), object_name))
+            self.partitioned = partitioned
+            self.compressed = compressed
+            self.lazy = lazy
+            self.learned_keys = ((), ())
+            self.commands = {}
+        else:
+            # Drop the table if it already exists
+            table_drop_command = "DROP TABLE IF EXISTS {}".format(tablename)
+            self.cursor.execute(table_drop_command)
+
+        # Create the table
+        if not partitioned:
+            self.cursor.execute(
+                build_create_command(
+                    tablename,
+                    table_columns,
+                    constrained_table_columns))
+            return
+
+        # Create a table for each partition of the columns of the packets,
+        # whose side tables reference the row IDs of the core table,
+        # and a view that joins them in the original layout
+        for partition in self.get_pkt_partitions().keys():
+            partition_columns = self.get_pkt_partitions()[partition]
+            if partition == "packets_blobs" and compressed:
+                partition_columns = [(x[0], "BLOB") for x in partition_columns]
+            self.cursor.execute(
+                build_create_command(
+                    partition,
+                    partition_columns,
+                    constrained_table_columns,
+                    partition != "packets_core"))
+
+        # The side tables of the lazy layout are views of the raw frames
+        if lazy:
+            for partition in PKT_PARTITIONS.keys():
+                if partition == "packets_core":
+                    continue
+                self.cursor.execute(
+                    "CREATE VIEW {} AS SELECT pkt_id, {} FROM packets_frames"
+                    "".format(
+                        partition,
+                        ", ".join(
+                            "{}(phy_payload, '{}') AS {}".format(
+                                BLOB_FUNCTIONS["frame"], x[0], x[0])
+                            if x[0] in LAZY_PKT_COLUMNS else x[0]
+                            for x in PKT_PARTITIONS[partition])))
+
+        # The view decodes the large columns only if they are not stored
+        # as text, so that other programs can read the uncompressed packets
+        view_columns = []
+        for (column_name, qualified_column) in zip(
+                PKT_COLUMN_NAMES,
+                qualify_columns("packets", PKT_COLUMN_NAMES, True)):
+            if not compressed and not lazy:
+                qualified_column = "{}.{}".format(
+                    get_pkt_partition(column_name),
+                    column_name)
+            view_columns.append(
+                "{} AS {}".format(qualified_column, column_name))
+        self.cursor.execute(
+            "CREATE VIEW packets AS SELECT {} FROM {}".format(
+                ", ".join(view_columns),
+                build_pkt_source(PKT_COLUMN_NAMES, True)))
+
+    def create_count_trigger(self, tablename, table_thres, table_reduct):
+        # Make sure that the table name is valid
+        valid_tablenames = {
+            "basic_information",
+            "battery_percentages",
+            "events",
+        }
+        if tablename not in valid_tablenames:
+            raise ValueError("Invalid table name \"{}\"".format(tablename))
+
+        # Derive the trigger name
+        triggername = tablename + "_count"
+
+        # Drop the trigger if it already exists
+        self.cursor.execute("DROP TRIGGER IF EXISTS {}".format(triggername))
+
+        # Create the trigger only if the table threshold and
+        # the table reduction are positive integers
+        if (
+            type(table_thres) is int
+            and type(table_reduct) is int
+            and table_thres > 0
+            and table_reduct > 0
+        ):
+            self.cursor.execute(
+                "CREATE TRIGGER {} ".format(triggername)
+                + "AFTER INSERT ON {} WHEN ".format(tablename)
+                + "(SELECT COUNT(*) FROM {})={} ".format(tablename,
+                                                        table_thres)
+                + "BEGIN DELETE FROM {} ".format(tablename)
+                + "WHERE pkt_time IN "
+                + "(SELECT pkt_time FROM {} ".format(tablename)
+                + "ORDER BY pkt_time LIMIT {}); END".format(table_reduct)
+            )
+
+    def insert(self, tablename, row_data):
+        self.insert_many(tablename, [row_data])
+
+    def insert_many(self, tablename, rows):
+        _, table_column_names, _ = get_table(tablename)
+        if tablename == "packets" and self.partitioned:
+            self.insert_partitioned_packets(rows)
+            return
+
+        insert_command = self.get_command(
+            ("insert", tablename),
+            build_insert_command,
+            tablename)
+
+        # Insert the provided data entries into the corresponding table
+        self.cursor.executemany(
+            insert_command,
+            (get_row_values(table_column_names, row_data)
+             for row_data in rows))
+
+    def insert_partitioned_packets(self, rows):
+        # Insert the core columns of the packets first, in order to derive
+        # the row IDs that the side tables reference
+        rows = list(rows)
+        first_rowid = self.get_max_rowid("packets") + 1
+        pkt_partitions = self.get_pkt_partitions()
+        for partition in pkt_partitions.keys():
+            insert_command = self.get_command(
+                ("insert", partition),
+                build_partition_insert_command,
+                partition,
+                pkt_partitions[partition])
+            column_names = [x[0] for x in pkt_partitions[partition]]
+            if partition == "packets_core":
+                self.cursor.executemany(
+                    insert_command,
+                    (get_row_values(PKT_COLUMN_NAMES, row_data, column_names)
+                     for row_data in rows))
+                continue
+
+            # Packets without any values in a side table are not stored in it
+            partition_rows = (
+                (first_rowid + i,)
+                + get_row_values(PKT_COLUMN_NAMES, rows[i], column_names)
+                for i in range(len(rows))
+            )
+            if ((partition == "packets_blobs" and self.compressed)
+                    or partition == "packets_frames"):
+                partition_rows = (
+                    (x[0],)
+                    + tuple(encode_blob(column_names[j], x[j+1])
+                            for j in range(len(column_names)))
+                    for x in partition_rows
+                )
+            self.cursor.executemany(
+                insert_command,
+                (x for x in partition_rows
+                 if any(value is not None for value in x[1:])))
+
+    def insert_packets(self, rows):
+        # SQLite assigns to each inserted row a row ID that is one larger
+        # than the largest row ID of the table prior to the insertion
+        first_rowid = self.get_max_rowid("packets") + 1
+        self.insert_many("packets", rows)
+        if self.get_max_rowid("packets") != first_rowid + len(rows) - 1:
+            raise ValueError("Unexpected row IDs of the inserted packets")
+
+        # Insert the reported attributes of each packet into their table
+        self.insert_many(
+            "zcl_attributes",
+            (dict(attribute, pkt_rowid=first_rowid + i)
+             for i in range(len(rows))
+             for attribute in get_stored_zcl_attributes(rows[i])))
+
+    def commit(self):
+        self.connection.commit()
+
+    def grouped_count(self, tablename, selected_columns, count_errors,
+                      conditions=None):
+        _, table_column_names, _ = get_table(tablename)
+
+        # Do not count entries with errors, unless requested
+        if not count_errors:
+            if conditions is None:
+                conditions = []
+            if ("error_msg", None) not in conditions:
+                conditions = [("error_msg", None)] + list(conditions)
+        conditions = self.restrict_conditions(conditions)
+
+        select_command = self.get_command(
+            ("grouped_count",
+             tablename,
+             tuple(selected_columns),
+             get_conditions_key(conditions)),
+            build_grouped_count_command,
+            tablename,
+            table_column_names,
+            selected_columns,
+            conditions,
+            self.partitioned)
+
+        # Return the results of the constructed command
+        return self.fetch_results(tablename, select_command,
+                                  get_condition_values(conditions))
+
+    def get_select_command(self, tablename, selected_columns, conditions,
+                           distinct, sorted_columns=None):
+        _, table_column_names, _ = get_table(tablename)
+        return self.get_command(
+            ("select",
+             tablename,
+             tuple(selected_columns),
+             get_conditions_key(conditions),
+             distinct,
+             None if sorted_columns is None else tuple(sorted_columns)),
+            build_select_command,
+            tablename,
+            table_column_names,
+            selected_columns,
+            conditions,
+            distinct,
+            self.partitioned,
+            sorted_columns)
+
+    def fetch_values(self, tablename, selected_columns, conditions,
+                     distinct):
+        conditions = self.restrict_conditions(conditions)
+        select_command = self.get_select_command(
+            tablename,
+            selected_columns,
+            conditions,
+            distinct)
+
+        # Return the results of the constructed command
+        return self.fetch_results(tablename, select_command,
+                                  get_condition_values(conditions))
+
+    def iter_values(self, tablename, selected_columns, conditions, distinct,
+                    fetch_size=FETCH_SIZE, sorted_columns=None):
+        conditions = self.restrict_conditions(conditions)
+        select_command = self.get_select_command(
+            tablename,
+            selected_columns,
+            conditions,
+            distinct,
+            sorted_columns)
+        return self.iter_results(select_command,
+                                 get_condition_values(conditions),
+                                 fetch_size)
+
+    def iter_results(self, command, params, fetch_size=FETCH_SIZE):
+        # Use a separate cursor so that other commands can be executed
+        # while the results are being iterated
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute(command, params)
+            while True:
+                results = cursor.fetchmany(fetch_size)
+                if len(results) == 0:
+                    break
+                for result in results:
+                    yield result
+        finally:
+            cursor.close()
+
+    def count_values(self, tablename, selected_columns, conditions):
+        _, table_column_names, _ = get_table(tablename)
+        conditions = self.restrict_conditions(conditions)
+
+        # Count the values of each column separately with a GROUP BY
+        # query each, instead of grouping the rows by all of their values
+        counts = []
+        for column_name in selected_columns:
+            select_command = self.get_command(
+                ("grouped_count",
+                 tablename,
+                 (column_name,),
+                 get_conditions_key(conditions)),
+                build_grouped_count_command,
+                tablename,
+                table_column_names,
+                [column_name],
+                conditions,
+                self.partitioned)
+            counts.extend(
+                (column_name, value, count)
+                for (value, count) in self.fetch_results(
+                    tablename,
+                    select_command,
+                    get_condition_values(conditions)))
+        return counts
+
+    def matching_frequency(self, tablename, conditions):
+        _, table_column_names, _ = get_table(tablename)
+        conditions = self.restrict_conditions(conditions)
+        select_command = self.get_command(
+            ("count", tablename, get_conditions_key(conditions)),
+            build_count_command,
+            tablename,
+            table_column_names,
+            conditions,
+            self.partitioned)
+
+        # Return the results of the constructed command
+        return self.fetch_results(tablename, select_command,
+                                  get_condition_values(conditions))[0][0]
+
+    def fetch_time_buckets(self, bucket_size):
+        conditions = self.restrict_conditions(None)
+        select_command = self.get_command(
+            ("time_buckets", get_conditions_key(conditions)),
+            build_time_buckets_command,
+            conditions,
+            self.partitioned)
+
+        # Return the start time of each interval that contains packets
+        self.cursor.execute(
+            select_command,
+            (bucket_size,) + get_condition_values(conditions))
+        return [
+            result[0] * bucket_size for result in self.cursor.fetchall()
+        ]
+
+    def store_networks(self, networks, panids=None):
+        # Create the table from scratch, unless only the entries
+        # of the provided keys should be replaced
+        if panids is None:
+            self.cursor.execute("DROP TABLE IF EXISTS networks")
+            self.cursor.execute("CREATE TABLE networks("
+                                "panid TEXT NOT NULL, "
+                                "epidset TEXT NOT NULL, "
+                                "earliest REAL, latest REAL)")
+            panids = networks.keys()
+        else:
+            self.cursor.executemany(
+                "DELETE FROM networks WHERE panid=?",
+                ((registry.format_shortaddr(panid),) for panid in panids))
+
+        # Insert the data into the table
+        self.cursor.executemany(
+            "INSERT INTO networks VALUES (?, ?, ?, ?)",
+            ((registry.format_shortaddr(panid),
+              ";".join(registry.format_extendedaddr(epid)
+                       for epid in sorted(networks[panid].epidset)),
+              networks[panid].earliest,
+              networks[panid].latest)
+             for panid in panids))
+
+    def store_short_addresses(self, short_addresses, keys=None):
+        # Create the table from scratch, unless only the entries
+        # of the provided keys should be replaced
+        if keys is None:
+            self.cursor.execute("DROP TABLE IF EXISTS short_addresses")
+            self.cursor.execute("CREATE TABLE short_addresses("
+                                "panid TEXT NOT NULL, "
+                                "shortaddr TEXT NOT NULL, "
+                                "altset TEXT NOT NULL, "
+                                "macset TEXT NOT NULL, "
+                                "nwkset TEXT NOT NULL, "
+                                "earliest REAL, latest REAL)")
+            keys = short_addresses.keys()
+        else:
+            self.cursor.executemany(
+                "DELETE FROM short_addresses WHERE panid=? AND shortaddr=?",
+                ((registry.format_shortaddr(panid),
+                  registry.format_shortaddr(shortaddr))
+                 for (panid, shortaddr) in keys))
+
+        # Insert the data into the table
+        rows = []
+        for (panid, shortaddr) in keys:
+            record = short_addresses[(panid, shortaddr)]
+            rows.append(
+                (registry.format_shortaddr(panid),
+                 registry.format_shortaddr(shortaddr),
+                 ";".join(registry.format_extendedaddr(extendedaddr)
+                          for extendedaddr in sorted(record.altset)),
+                 ";".join(sorted(record.macset)),
+                 ";".join(sorted(record.nwkset)),
+                 record.earliest,
+                 record.latest))
+        self.cursor.executemany(
+            "INSERT INTO short_addresses VALUES (?, ?, ?, ?, ?, ?, ?)",
+            rows)
+
+    def store_extended_addresses(self, extended_addresses,
+                                 extendedaddrs=None):
+        # Create the table from scratch, unless only the entries
+        # of the provided keys should be replaced
+        if extendedaddrs is None:
+            self.cursor.execute("DROP TABLE IF EXISTS extended_addresses")
+            self.cursor.execute("CREATE TABLE extended_addresses("
+                                "extendedaddr TEXT NOT NULL, "
+                                "altset TEXT NOT NULL, "
+                                "macset TEXT NOT NULL, "
+                                "nwkset TEXT NOT NULL, "
+                                "earliest REAL, latest REAL)")
+            extendedaddrs = extended_addresses.keys()
+        else:
+            self.cursor.executemany(
+                "DELETE FROM extended_addresses WHERE extendedaddr=?",
+                ((registry.format_extendedaddr(extendedaddr),)
+                 for extendedaddr in extendedaddrs))
+
+        # Insert the data into the table
+        rows = []
+        for extendedaddr in extendedaddrs:
+            record = extended_addresses[extendedaddr]
+            rows.append(
+                (registry.format_extendedaddr(extendedaddr),
+                 ";".join(registry.format_localaddr(localaddr)
+                          for localaddr in sorted(record.altset)),
+                 ";".join(sorted(record.macset)),
+                 ";".join(sorted(record.nwkset)),
+                 record.earliest,
+                 record.latest))
+        self.cursor.executemany(
+            "INSERT INTO extended_addresses VALUES (?, ?, ?, ?, ?, ?)",
+            rows)
+
+    def store_pairs(self, pairs, keys=None):
+        # Create the table from scratch, unless only the entries
+        # of the provided keys should be replaced
+        if keys is None:
+            self.cursor.execute("DROP TABLE IF EXISTS pairs")
+            self.cursor.execute("CREATE TABLE pairs("
+                                "panid TEXT NOT NULL, "
+                                "srcaddr TEXT NOT NULL, "
+                                "dstaddr TEXT NOT NULL, "
+                                "earliest REAL NOT NULL, "
+                                "latest REAL NOT NULL)")
+            keys = pairs.keys()
+        else:
+            self.cursor.executemany(
+                "DELETE FROM pairs WHERE panid=? AND srcaddr=? AND dstaddr=?",
+                ((registry.format_shortaddr(panid),
+                  registry.format_shortaddr(srcaddr),
+                  registry.format_shortaddr(dstaddr))
+                 for (panid, srcaddr, dstaddr) in keys))
+
+        # Insert the data into the table
+        self.cursor.executemany(
+            "INSERT INTO pairs VALUES (?, ?, ?, ?, ?)",
+            ((registry.format_shortaddr(key[0]),
+              registry.format_shortaddr(key[1]),
+              registry.format_shortaddr(key[2]),
+              pairs[key].earliest,
+              pairs[key].latest)
+             for key in keys))
+
+    def table_exists(self, tablename):
+        self.cursor.execute("SELECT COUNT(*) FROM sqlite_master "
+                            "WHERE type IN (\"table\", \"view\") "
+                            "AND name=?", (tablename,))
+        return self.cursor.fetchall()[0][0] > 0
+
+    def create_progress_tables(self):
+        # Drop the tables if they already exist
+        self.cursor.execute("DROP TABLE IF EXISTS parsed_files")
+        self.cursor.execute("DROP TABLE IF EXISTS parsing_state")
+
+        # The duplicates of a previous execution are no longer relevant
+        self.cursor.execute("DROP TABLE IF EXISTS duplicates")
+
+        # Create the tables
+        self.cursor.execute("CREATE TABLE parsed_files("
+                            "pcap_directory TEXT NOT NULL, "
+                            "pcap_filename TEXT NOT NULL)")
+        self.cursor.execute("CREATE TABLE parsing_state("
+                            "name TEXT PRIMARY KEY, "
+                            "state TEXT NOT NULL)")
+
+    def store_progress(self, pcap_directory, pcap_filename, state):
+        # Mark the pcap file as completed
+        self.cursor.execute("INSERT INTO parsed_files VALUES (?, ?)",
+                            (pcap_directory, pcap_filename))
+
+        # Replace the stored state with the provided one
+        self.cursor.executemany(
+            "INSERT OR REPLACE INTO parsing_state VALUES (?, ?)",
+            ((name, serialization.dumps(state[name]))
+             for name in state.keys()))
+
+    def load_progress(self):
+        # Fetch the pcap files that were completely parsed
+        self.cursor.execute("SELECT pcap_directory, pcap_filename "
+                            "FROM parsed_files")
+        parsed_files = set(self.cursor.fetchall())
+
+        # Fetch the state that was accumulated by parsing them
+        self.cursor.execute("SELECT name, state FROM parsing_state")
+        state = {
+            name: serialization.loads(text)
+            for (name, text) in self.cursor.fetchall()
+        }
+
+        return parsed_files, state
+
+    def delete_unfinished_packets(self):
+        # Delete packets that belong to pcap files that were not completed
+        tablename = "packets_core" if self.partitioned else "packets"
+        self.cursor.execute("DELETE FROM {0} WHERE NOT EXISTS "
+                            "(SELECT 1 FROM parsed_files WHERE "
+                            "parsed_files.pcap_directory="
+                            "{0}.pcap_directory AND "
+                            "parsed_files.pcap_filename="
+                            "{0}.pcap_filename)".format(tablename))
+        deleted_packets = self.cursor.rowcount
+        if deleted_packets > 0:
+            self.discard_aggregates()
+            self.count_modification()
+
+        # Delete the partitioned fields of the deleted packets
+        if self.partitioned:
+            for partition in self.get_pkt_partitions().keys():
+                if partition == "packets_core":
+                    continue
+                self.cursor.execute("DELETE FROM {0} WHERE NOT EXISTS "
+                                    "(SELECT 1 FROM packets_core WHERE "
+                                    "packets_core.rowid={0}.pkt_id)"
+                                    "".format(partition))
+
+        # Delete the reported attributes of the deleted packets
+        if self.table_exists("zcl_attributes"):
+            self.cursor.execute("DELETE FROM zcl_attributes WHERE NOT EXISTS "
+                                "(SELECT 1 FROM {0} WHERE "
+                                "{0}.rowid=zcl_attributes.pkt_rowid)"
+                                "".format(tablename))
+
+        # Delete duplicates that were found in unfinished pcap files
+        if self.table_exists("duplicates"):
+            self.cursor.execute("DELETE FROM duplicates WHERE NOT EXISTS "
+                                "(SELECT 1 FROM parsed_files WHERE "
+                                "parsed_files.pcap_directory="
+                                "duplicates.pcap_directory AND "
+                                "parsed_files.pcap_filename="
+                                "duplicates.pcap_filename)")
+
+        return deleted_packets
+
+    def get_nwkdevtype(self, panid, shortaddr, extendedaddr):
+        nwkset = set()
+
+        if panid is not None and shortaddr is not None:
+            self.cursor.execute("SELECT nwkset FROM short_addresses "
+                                "WHERE panid=? AND shortaddr=?",
+                                (panid, shortaddr))
+            results = self.cursor.fetchall()
+            if (len(results) > 1
+                    or (len(results) == 1 and ";" in results[0][0])):
+                return "Conflicting Data"
+            elif len(results) == 1:
+                nwkset.add(results[0][0])
+
+        if extendedaddr is not None:
+            self.cursor.execute("SELECT nwkset FROM extended_addresses "
+                                "WHERE extendedaddr=?", (extendedaddr,))
+            results = self.cursor.fetchall()
+            if (len(results) > 1
+                    or (len(results) == 1 and ";" in results[0][0])):
+                return "Conflicting Data"
+            elif len(results) == 1:
+                nwkset.add(results[0][0])
+
+        if len(nwkset) == 0:
+            return None
+        elif len(nwkset) == 1:
+            return list(nwkset)[0]
+        else:
+            return "Conflicting Data"
+
+    def update_packets(self, selected_columns, selected_values, conditions):
+        # Sanity checks
+        check_selected_columns(PKT_COLUMN_NAMES, selected_columns)
+        if len(selected_columns) != len(selected_values):
+            raise ValueError("The number of selected columns does not match "
+                             "the number of selected values")
+        if self.lazy and len(LAZY_PKT_COLUMNS.intersection(
+                selected_columns)) > 0:
+            raise ValueError("The lazy columns of packets cannot be updated")
+        elif self.compressed:
+            selected_values = [
+                encode_blob(selected_columns[i], selected_values[i])
+                for i in range(len(selected_columns))
+            ]
+
+        # Discard the analysis aggregates if any of the packets
+        # that they summarize are modified
+        aggregated_rowid = self.get_aggregated_rowid()
+        if aggregated_rowid is None:
+            conditions_list = [conditions]
+        else:
+            conditions_list = [
+                list(conditions) + [("<=rowid", aggregated_rowid)],
+                list(conditions) + [(">rowid", aggregated_rowid)],
+            ]
+
+        for i in range(len(conditions_list)):
+            update_commands = self.get_command(
+                ("update",
+                 tuple(selected_columns),
+                 get_conditions_key(conditions_list[i])),
+                build_update_commands,
+                selected_columns,
+                conditions_list[i],
+                self.partitioned)
+
+            # Execute the constructed commands
+            modified_packets = 0
+            for (update_command, indexes) in update_commands:
+                self.cursor.execute(
+                    update_command,
+                    tuple(selected_values[j] for j in indexes)
+                    + get_condition_values(conditions_list[i]))
+                if len(indexes) > 0:
+                    modified_packets += self.cursor.rowcount
+            if modified_packets > 0:
+                if aggregated_rowid is not None and i == 0:
+                    self.discard_aggregates()
+                self.count_modification()
+
+    def extract_zcl_attributes(self):
+        # Create the table of reported attributes and its indexes
+        self.create_table("zcl_attributes")
+        self.create_index(
+            "zcl_attributes_cluster_id__attribute_id",
+            "zcl_attributes",
+            ["cluster_id", "attribute_id"])
+        self.create_zcl_attributes_index()
+
+        # Derive the reported attributes of the stored packets
+        column_names = ["aps_cluster_id", "zcl_cmd_id"]
+        for field_names in ZCL_ATTR_LISTS.values():
+            column_names.extend(field_names)
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute(
+                "SELECT {} FROM {} WHERE {} IN ({})".format(
+                    ", ".join(qualify_columns(
+                        "packets",
+                        ["rowid"] + column_names,
+                        self.partitioned)),
+                    build_pkt_source(
+                        ["rowid"] + column_names,
+                        self.partitioned),
+                    qualify_columns(
+                        "packets",
+                        ["zcl_cmd_id"],
+                        self.partitioned)[0],
+                    ", ".join("?"*len(ZCL_ATTR_LISTS))),
+                tuple(ZCL_ATTR_LISTS.keys()))
+            num_attributes = 0
+            while True:
+                results = cursor.fetchmany(FETCH_SIZE)
+                if len(results) == 0:
+                    break
+                attributes = [
+                    dict(attribute, pkt_rowid=result[0])
+                    for result in results
+                    for attribute in get_stored_zcl_attributes(
+                        dict(zip(column_names, result[1:])))
+                ]
+                self.insert_many("zcl_attributes", attributes)
+                num_attributes += len(attributes)
+        finally:
+            cursor.close()
+        return num_attributes
+
+    def create_zcl_attributes_index(self):
+        # The reported attributes of the packets that are examined
+        # in the order of another index are looked up by their row IDs
+        self.create_index(
+            "zcl_attributes_pkt_rowid",
+            "zcl_attributes",
+            ["pkt_rowid"])
+
+    def fetch_zcl_attributes(self, cluster_id, attribute_id, datatype,
+                             selected_columns, conditions):
+        conditions = self.restrict_conditions(conditions)
+        select_command = self.get_command(
+            ("zcl_attributes",
+             tuple(selected_columns),
+             get_conditions_key(conditions)),
+            build_zcl_attributes_command,
+            selected_columns,
+            conditions,
+            self.partitioned)
+
+        # Return the value of the attribute in each matching packet,
+        # along with the selected columns of that packet
+        return self.fetch_results(
+            "zcl_attributes",
+            select_command,
+            (cluster_id, attribute_id, datatype)
+            + get_condition_values(conditions))
+
+    def iter_zcl_attributes(self, cluster_id, attribute_id, datatype,
+                            selected_columns, conditions, sorted_columns,
+                            fetch_size=FETCH_SIZE):
+        conditions = self.restrict_conditions(conditions)
+        select_command = self.get_command(
+            ("zcl_attributes",
+             tuple(selected_columns),
+             get_conditions_key(conditions),
+             tuple(sorted_columns)),
+            build_zcl_attributes_command,
+            selected_columns,
+            conditions,
+            self.partitioned,
+            sorted_columns)
+
+        # Iterate over the matching attributes in the order of the sorted
+        # columns of their packets, without fetching all of them at once
+        return self.iter_results(
+            select_command,
+            (cluster_id, attribute_id, datatype)
+            + get_condition_values(conditions),
+            fetch_size)
+
+    def get_max_rowid(self, tablename):
+        get_table(tablename)
+        if tablename == "packets" and self.partitioned:
+            tablename = "packets_core"
+        self.cursor.execute("SELECT MAX(rowid) FROM {}".format(tablename))
+        max_rowid = self.cursor.fetchall()[0][0]
+        return 0 if max_rowid is None else max_rowid
+
+    def load_aggregates(self):
+        if not self.table_exists("analysis_aggregates"):
+            return {}
+        self.cursor.execute("SELECT method, task, watermark, aggregate "
+                            "FROM analysis_aggregates")
+        return {
+            (method, task): (watermark, serialization.loads(text))
+            for (method, task, watermark, text) in self.cursor.fetchall()
+        }
+
+    def store_aggregates(self, aggregates):
+        self.cursor.execute("CREATE TABLE IF NOT EXISTS analysis_aggregates("
+                            "method TEXT NOT NULL, "
+                            "task TEXT NOT NULL, "
+                            "watermark INTEGER NOT NULL, "
+                            "aggregate TEXT NOT NULL, "
+                            "PRIMARY KEY (method, task))")
+        self.cursor.executemany(
+            "INSERT OR REPLACE INTO analysis_aggregates "
+            "VALUES (?, ?, ?, ?)",
+            ((method, task, watermark, serialization.dumps(aggregate))
+             for (method, task, watermark, aggregate) in aggregates))
+
+    def load_column_stats(self, stale=False):
+        if not self.table_exists("column_stats"):
+            return {}
+        select_command = (
+            "SELECT column_name, num_rows, null_count, distinct_count, "
+            "min_value, max_value, top_values, top_error FROM column_stats"
+        )
+
+        # Only the statistics of the rows that are examined can be used,
+        # unless the statistics are only used for estimates
+        if stale:
+            self.cursor.execute(select_command)
+        else:
+            min_rowid, max_rowid = self.rowid_range
+            if min_rowid is not None or len(self.packet_filters) > 0:
+                return {}
+            if max_rowid is None:
+                max_rowid = self.get_max_rowid("packets")
+            self.cursor.execute(select_command + " WHERE watermark=?",
+                                (max_rowid,))
+        return {
+            row[0]: row[1:6] + (serialization.loads(row[6]), row[7])
+            for row in self.cursor.fetchall()
+        }
+
+    def store_column_stats(self, watermark, column_stats):
+        self.cursor.execute("DROP TABLE IF EXISTS column_stats")
+        self.cursor.execute("CREATE TABLE column_stats("
+                            "column_name TEXT NOT NULL PRIMARY KEY, "
+                            "watermark INTEGER NOT NULL, "
+                            "num_rows INTEGER NOT NULL, "
+                            "null_count INTEGER NOT NULL, "
+                            "distinct_count INTEGER NOT NULL, "
+                            "min_value, "
+                            "max_value, "
+                            "top_values TEXT NOT NULL, "
+                            "top_error INTEGER NOT NULL)")
+        self.cursor.executemany(
+            "INSERT INTO column_stats VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            ((column_name, watermark) + stats[:5]
+             + (serialization.dumps(stats[5]), stats[6])
+             for (column_name, stats) in column_stats.items()))
+
+    def get_aggregated_rowid(self):
+        # Return the last row that is summarized by the analysis aggregates
+        # or the column statistics, if any
+        aggregated_rowid = None
+        for tablename in ["analysis_aggregates", "column_stats"]:
+            if not self.table_exists(tablename):
+                continue
+            self.cursor.execute("SELECT MAX(watermark) FROM {}"
+                                "".format(tablename))
+            watermark = self.cursor.fetchall()[0][0]
+            if aggregated_rowid is None or (watermark is not None
+                                            and watermark > aggregated_rowid):
+                aggregated_rowid = watermark
+        return aggregated_rowid
+
+    def discard_aggregates(self):
+        # The column statistics summarize the same packets
+        self.cursor.execute("DROP TABLE IF EXISTS analysis_aggregates")
+        self.cursor.execute("DROP TABLE IF EXISTS column_stats")
+
+    def create_index(self, indexname, tablename, column_names,
+                     conditions=None):
+        _, table_column_names, _ = get_table(tablename)
+
+        # Sanity checks
+        check_name(indexname)
+        check_selected_columns(table_column_names, column_names)
+        if len(get_condition_values(conditions)) > 0:
+            raise ValueError("The conditions of a partial index can only "
+                             "examine whether columns are undefined")
+
+        # Each index of the partitioned layout covers a single partition
+        if tablename == "packets" and self.partitioned:
+            tablename = self.get_index_partition(
+                list(column_names) + get_condition_columns(conditions))
+            table_column_names = [x[0] for x in PKT_PARTITIONS[tablename]]
+
+        self.cursor.execute(
+            "CREATE INDEX IF NOT EXISTS {} ON {}({}){}".format(
+                indexname,
+                tablename,
+                ", ".join(column_names),
+                build_where_clause(table_column_names, conditions)))
+
+    def get_index_partition(self, column_names):
+        # The views of the lazy layout cannot be indexed
+        partition = get_index_partition(column_names)
+        if self.lazy and partition not in LAZY_PKT_PARTITIONS.keys():
+            raise ValueError("The lazy columns {} cannot be indexed"
+                             "".format(column_names))
+        return partition
+
+    def drop_index(self, indexname):
+        check_name(indexname)
+        self.cursor.execute("DROP INDEX IF EXISTS {}".format(indexname))
+
+    def fetch_index_names(self, tablename):
+        tablenames = [tablename]
+        if tablename == "packets" and self.partitioned:
+            tablenames = list(PKT_PARTITIONS.keys())
+        self.cursor.execute("SELECT name FROM sqlite_master "
+                            "WHERE type=\"index\" AND tbl_name IN ({})"
+                            "".format(", ".join("?"*len(tablenames))),
+                            tuple(tablenames))
+        return [result[0] for result in self.cursor.fetchall()]
+
+    def analyze(self):
+        self.cursor.execute("ANALYZE")
+
+    def get_size(self):
+        self.cursor.execute("PRAGMA page_count")
+        page_count = self.cursor.fetchall()[0][0]
+        self.cursor.execute("PRAGMA page_size")
+        page_size = self.cursor.fetchall()[0][0]
+        return page_count * page_size
+
+    def disconnect(self):
+        # Close the query cache along with the connection with the database
+        if self.query_cache is not None:
+            logging.debug("The query cache served {} out of {} queries"
+                          "".format(self.query_cache.hits,
+                                    self.query_cache.hits
+                                    + self.query_cache.misses))
+            self.query_cache.close()
+            self.query_cache = None
+        self.cursor.close()
+        self.connection.close()
+        self.connection = None
+        self.cursor = None
+        self.commands = {}
+
+
+def check_selected_columns(table_column_names, selected_columns):
+    if len(selected_columns) == 0:
+        raise ValueError("At least one selected column is required")
+    for column_name in selected_columns:
+        if column_name not in table_column_names:
+            raise ValueError("Unknown column name \"{}\"".format(column_name))
+
+
+def get_row_values(table_column_names, row_data, selected_columns=None):
+    # Sanity check
+    if len(row_data.keys()) != len(table_column_names):
+        raise ValueError("Unexpected number of data entries: {}"
+                         "".format(len(row_data.keys())))
+
+    if selected_columns is None:
+        selected_columns = table_column_names
+    return tuple(row_data[column_name] for column_name in selected_columns)
+
+
+def split_zcl_attributes(row_data):
+    # Sanity checks
+    if row_data["zcl_cmd_id"] not in ZCL_ATTR_LISTS.keys():
+        return []
+    field_names = ZCL_ATTR_LISTS[row_data["zcl_cmd_id"]]
+    if (row_data["aps_cluster_id"] is None
+            or any(row_data[x] is None for x in field_names)
+            or len(row_data[field_names[0]]) == 0):
+        return []
+    fields = [row_data[field_name].split(",") for field_name in field_names]
+    if any(len(field) != len(fields[0]) for field in fields):
+        return None
+
+    # Attributes without a status were reported successfully
+    return [
+        (fields[0][i], fields[1][i], fields[2][i],
+         fields[3][i] if len(fields) > 3 else "0x00: SUCCESS")
+        for i in range(len(fields[0]))
+    ]
+
+
+def get_zcl_attributes(row_data):
+    # Only attributes whose values were included are returned
+    attributes = []
+    for (attribute_id, datatype, value, status) in (
+            split_zcl_attributes(row_data) or []):
+        if status != "0x00: SUCCESS":
+            continue
+        attributes.append({
+            "cluster_id": row_data["aps_cluster_id"],
+            "attribute_id": attribute_id,
+            "datatype": datatype,
+            "value": value,
+        })
+    return attributes
+
+
+def get_stored_zcl_attributes(row_data):
+    split_attributes = split_zcl_attributes(row_data)
+    if split_attributes is None:
+        logging.warning("Invalid ZCL {} entries"
+                        "".format(row_data["zcl_cmd_id"].split(": ")[1]))
+        return []
+
+    # Only the first attribute with each identifier is stored, as long as
+    # its value was included, since the analyses examine only that one
+    attributes = []
+    attribute_ids = set()
+    for (attribute_id, datatype, value, status) in split_attributes:
+        if attribute_id in attribute_ids:
+            continue
+        attribute_ids.add(attribute_id)
+        if status != "0x00: SUCCESS":
+            continue
+        attributes.append({
+            "cluster_id": row_data["aps_cluster_id"],
+            "attribute_id": attribute_id,
+            "datatype": datatype,
+            "value": value,
+        })
+    return attributes
+
+
+def get_conditions_key(conditions):
+    # Conditions with the same parameters and the same undefined values
+    # correspond to the same command
+    if conditions is None:
+        return None
+    return tuple(
+        (condition[0], condition[1] is None) for condition in conditions
+    )
+
+
+def get_condition_values(conditions):
+    # Conditions on several columns compare each of them with the value
+    if conditions is None:
+        return ()
+    return tuple(
+        condition[1] for condition in conditions if condition[1] is not None
+        for _ in condition[0].split("|")
+    )
+
+
+def build_where_clause(table_column_names, conditions, tablename=None,
+                       partitioned=False):
+    if conditions is None or len(conditions) == 0:
+        return ""
+
+    expr_statements = []
+    for condition in conditions:
+        param = condition[0]
+        value = condition[1]
+        if param[0] == "!":
+            operator = "!="
+            param = param[1:]
+        elif param[:2] in {"<=", ">="}:
+            operator = param[:2]
+            param = param[2:]
+        elif param[0] in {"<", ">"}:
+            operator = param[0]
+            param = param[1:]
+        else:
+            operator = "="
+
+        # Conditions on several columns, which are separated by vertical
+        # bars, are satisfied if any of their columns satisfies them
+        column_names = param.split("|")
+        for column_name in column_names:
+            if (column_name not in table_column_names
+                    and column_name != "rowid"):
+                raise ValueError("Unknown column name \"{}\""
+                                 "".format(column_name))
+        if tablename is not None:
+            column_names = qualify_columns(tablename, column_names,
+                                           partitioned)
+        if value is None:
+            if operator == "!=":
+                expr_format = "{} IS NOT NULL"
+            elif operator == "=":
+                expr_format = "{} IS NULL"
+            else:
+                raise ValueError("Undefined values cannot be compared "
+                                 "with the \"{}\" operator".format(operator))
+        else:
+            expr_format = "{}" + operator + "?"
+        expressions = [expr_format.format(x) for x in column_names]
+        if len(expressions) == 1:
+            expr_statements.append(expressions[0])
+        else:
+            expr_statements.append("({})".format(" OR ".join(expressions)))
+    return " WHERE " + " AND ".join(expr_statements)
 
-    # Drop the table if it already exists
-    table_drop_command = "DROP TABLE IF EXISTS {}".format(tablename)
-    cursor.execute(table_drop_command)
 
-    # Create the table
+def build_create_command(tablename, table_columns,
+                         constrained_table_columns, referencing=False):
+    # Tables that reference the packets start with their row IDs
     table_creation_command = "CREATE TABLE {}(".format(tablename)
     delimiter_needed = False
+    if referencing:
+        table_creation_command += "pkt_id INTEGER PRIMARY KEY"
+        delimiter_needed = True
     for column in table_columns:
         if delimiter_needed:
             table_creation_command += ", "
@@ -410,13 +1916,13 @@ def create_table(tablename):
 
         for i in range(len(column_name)):
             if column_name[i] not in ALLOWED_CHARACTERS:
-                raise ValueError("The character \"{}\" in the name of the "
-                                 "column \"{}\" is not allowed"
+                raise ValueError("The character \"{}\" in the name of "
+                                 "the column \"{}\" is not allowed"
                                  "".format(column_name[i], column_name))
 
         if column_name[0].isdigit():
-            raise ValueError("The name of the column \"{}\" is not allowed "
-                             "because it starts with a digit"
+            raise ValueError("The name of the column \"{}\" is not "
+                             "allowed because it starts with a digit"
                              "".format(column_name))
 
         table_creation_command += column_name
@@ -431,388 +1937,359 @@ def create_table(tablename):
         if column_name in constrained_table_columns:
             table_creation_command += " NOT NULL"
     table_creation_command += ")"
+    return table_creation_command
+
+
+def get_condition_columns(conditions):
+    if conditions is None:
+        return []
+    return [
+        column_name for condition in conditions
+        for column_name in condition[0].lstrip("!<>=").split("|")
+    ]
+
+
+def qualify_columns(tablename, column_names, partitioned=False):
+    # The columns of the partitioned packets table are qualified with
+    # the name of their partition, whose core table holds the row IDs,
+    # while its large columns are read through their decoding functions
+    if tablename == "packets" and partitioned:
+        qualified_columns = []
+        for column_name in column_names:
+            qualified_column = "{}.{}".format(
+                get_pkt_partition(column_name),
+                column_name)
+            blob_function = get_blob_function(column_name)
+            if blob_function is not None:
+                qualified_column = "{}({})".format(
+                    blob_function,
+                    qualified_column)
+            qualified_columns.append(qualified_column)
+        return qualified_columns
+    return ["{}.{}".format(tablename, x) for x in column_names]
+
+
+def build_pkt_joins(column_names):
+    # Join the core table only with the partitions of the examined columns
+    partitions = set(get_pkt_partition(x) for x in column_names)
+    return "".join(
+        " LEFT JOIN {0} ON {0}.pkt_id=packets_core.rowid".format(partition)
+        for partition in PKT_PARTITIONS.keys()
+        if partition != "packets_core" and partition in partitions)
+
+
+def build_pkt_source(column_names, partitioned):
+    if not partitioned:
+        return "packets"
+    return "packets_core" + build_pkt_joins(column_names)
+
+
+def build_source(tablename, table_column_names, selected_columns,
+                 conditions, partitioned):
+    # Return the source, the selected columns, and the WHERE clause of a
+    # command, which are qualified if the packets table is partitioned
+    if tablename != "packets" or not partitioned:
+        return (
+            tablename,
+            list(selected_columns),
+            build_where_clause(table_column_names, conditions),
+        )
+    return (
+        build_pkt_source(
+            list(selected_columns) + get_condition_columns(conditions),
+            True),
+        qualify_columns(tablename, selected_columns, True),
+        build_where_clause(table_column_names, conditions, tablename, True),
+    )
+
+
+def build_insert_command(tablename):
+    table_columns, _, _ = get_table(tablename)
+    return "INSERT INTO {} VALUES ({})".format(
+        tablename,
+        ", ".join("?"*len(table_columns)))
+
+
+def build_partition_insert_command(partition, partition_columns):
+    num_columns = len(partition_columns)
+    if partition != "packets_core":
+        num_columns += 1
+    return "INSERT INTO {} VALUES ({})".format(
+        partition,
+        ", ".join("?"*num_columns))
+
+
+def build_select_command(tablename, table_column_names, selected_columns,
+                         conditions, distinct, partitioned=False,
+                         sorted_columns=None):
+    # Sanity checks
+    check_selected_columns(table_column_names, selected_columns)
+    if sorted_columns is not None:
+        check_selected_columns(table_column_names + ["rowid"],
+                               sorted_columns)
 
-    # Execute the constructed command
-    cursor.execute(table_creation_command)
+    # Construct the selection command
+    source, selected_columns, where_clause = build_source(
+        tablename,
+        table_column_names,
+        selected_columns,
+        conditions,
+        partitioned)
+    column_csv = ", ".join(selected_columns)
+    select_command = "SELECT"
+    if distinct:
+        select_command += " DISTINCT"
+    select_command += " {} FROM {}".format(column_csv, source)
+    select_command += where_clause
+    if sorted_columns is not None:
+        if tablename == "packets" and partitioned:
+            sorted_columns = qualify_columns(tablename, sorted_columns, True)
+        select_command += " ORDER BY {}".format(", ".join(sorted_columns))
+    return select_command
+
+
+def build_grouped_count_command(tablename, table_column_names,
+                                selected_columns, conditions,
+                                partitioned=False):
+    # Sanity checks
+    check_selected_columns(table_column_names, selected_columns)
 
+    # Construct the selection command
+    source, selected_columns, where_clause = build_source(
+        tablename,
+        table_column_names,
+        selected_columns,
+        conditions,
+        partitioned)
+    column_csv = ", ".join(selected_columns)
+    select_command = "SELECT {}, COUNT(*)".format(column_csv)
+    select_command += " FROM {}".format(source)
+    select_command += where_clause
+    select_command += " GROUP BY {}".format(column_csv)
+    return select_command
 
-def create_count_trigger(tablename, table_thres, table_reduct):
-    # Make sure that the table name is valid
-    valid_tablenames = {
-        "basic_information",
-        "battery_percentages",
-        "events",
-    }
-    if tablename not in valid_tablenames:
-        raise ValueError("Invalid table name \"{}\"".format(tablename))
-
-    # Derive the trigger name
-    triggername = tablename + "_count"
-
-    # Drop the trigger if it already exists
-    cursor.execute("DROP TRIGGER IF EXISTS {}".format(triggername))
-
-    # Create the trigger only if the table threshold and the table reduction
-    # are positive integers
-    if (
-        type(table_thres) is int
-        and type(table_reduct) is int
-        and table_thres > 0
-        and table_reduct > 0
-    ):
-        cursor.execute(
-            "CREATE TRIGGER {} ".format(triggername)
-            + "AFTER INSERT ON {} WHEN ".format(tablename)
-            + "(SELECT COUNT(*) FROM {})={} ".format(tablename, table_thres)
-            + "BEGIN DELETE FROM {} ".format(tablename)
-            + "WHERE pkt_time IN "
-            + "(SELECT pkt_time FROM {} ".format(tablename)
-            + "ORDER BY pkt_time LIMIT {}); END".format(table_reduct)
-        )
 
+def build_zcl_attributes_command(selected_columns, conditions,
+                                 partitioned=False, sorted_columns=()):
+    # Sanity checks
+    check_selected_columns(PKT_COLUMN_NAMES, selected_columns)
+    if len(sorted_columns) > 0:
+        check_selected_columns(PKT_COLUMN_NAMES + ["rowid"], sorted_columns)
 
-def insert(tablename, row_data):
-    # Use the variables of the corresponding table
-    if tablename == "packets":
-        table_columns = PKT_COLUMNS
-        table_column_names = PKT_COLUMN_NAMES
-    elif tablename == "basic_information":
-        table_columns = BASIC_INFO_COLUMNS
-        table_column_names = BASIC_INFO_COLUMN_NAMES
-    elif tablename == "battery_percentages":
-        table_columns = BTRY_PERC_COLUMNS
-        table_column_names = BTRY_PERC_COLUMN_NAMES
-    elif tablename == "events":
-        table_columns = EVENTS_COLUMNS
-        table_column_names = EVENTS_COLUMN_NAMES
+    # Construct the selection command
+    if partitioned:
+        pkt_tablename = "packets_core"
+        pkt_joins = build_pkt_joins(
+            list(selected_columns) + list(sorted_columns)
+            + get_condition_columns(conditions))
     else:
-        raise ValueError("Unknown table name \"{}\"".format(tablename))
+        pkt_tablename = "packets"
+        pkt_joins = ""
+    select_command = "SELECT zcl_attributes.value, {}".format(
+        ", ".join(qualify_columns("packets", selected_columns, partitioned)))
+    select_command += " FROM zcl_attributes JOIN {}".format(pkt_tablename)
+    select_command += " ON {}.rowid=zcl_attributes.pkt_rowid".format(
+        pkt_tablename)
+    select_command += pkt_joins
+    select_command += build_where_clause(
+        ZCL_ATTR_COLUMN_NAMES,
+        [("cluster_id", ""), ("attribute_id", ""), ("datatype", "")],
+        "zcl_attributes")
+    pkt_where_clause = build_where_clause(
+        PKT_COLUMN_NAMES,
+        conditions,
+        "packets",
+        partitioned)
+    if len(pkt_where_clause) > 0:
+        select_command += " AND" + pkt_where_clause[len(" WHERE"):]
+    select_command += " ORDER BY {}".format(", ".join(
+        qualify_columns("packets", sorted_columns, partitioned)
+        + ["zcl_attributes.rowid"]))
+    return select_command
+
+
+def build_count_command(tablename, table_column_names, conditions,
+                        partitioned=False):
+    source, _, where_clause = build_source(
+        tablename,
+        table_column_names,
+        [],
+        conditions,
+        partitioned)
+    select_command = "SELECT COUNT(*) FROM {}".format(source)
+    select_command += where_clause
+    return select_command
+
+
+def build_time_buckets_command(conditions, partitioned=False):
+    # Number the intervals of the provided duration since the epoch
+    source, selected_columns, where_clause = build_source(
+        "packets",
+        PKT_COLUMN_NAMES,
+        ["pkt_time"],
+        conditions,
+        partitioned)
+    select_command = "SELECT DISTINCT CAST({} / ? AS INTEGER)".format(
+        selected_columns[0])
+    select_command += " FROM {}".format(source)
+    select_command += where_clause
+    select_command += " ORDER BY 1"
+    return select_command
+
+
+def build_update_commands(selected_columns, conditions, partitioned=False):
+    # Return each command along with the indexes of the selected values
+    # that it uses, before the values of the conditions
+    if not partitioned:
+        set_statements = ["{} = ?".format(x) for x in selected_columns]
+        update_command = "UPDATE packets SET {}".format(
+            ", ".join(set_statements))
+        update_command += build_where_clause(PKT_COLUMN_NAMES, conditions)
+        return [(update_command, list(range(len(selected_columns))))]
+
+    # Update the partitions of the selected columns separately, making sure
+    # that the updated packets have a row in each of their side tables
+    source, _, where_clause = build_source(
+        "packets",
+        PKT_COLUMN_NAMES,
+        [],
+        conditions,
+        True)
+    pkt_rowids = "SELECT packets_core.rowid FROM {}{}".format(
+        source,
+        where_clause)
+    update_commands = []
+    for partition in PKT_PARTITIONS.keys():
+        indexes = [
+            i for i in range(len(selected_columns))
+            if get_pkt_partition(selected_columns[i]) == partition
+        ]
+        if len(indexes) == 0:
+            continue
+        if partition != "packets_core":
+            update_commands.append(
+                ("INSERT OR IGNORE INTO {}(pkt_id) {}"
+                 "".format(partition, pkt_rowids),
+                 []))
+        set_statements = [
+            "{} = ?".format(selected_columns[i]) for i in indexes
+        ]
+        update_commands.append(
+            ("UPDATE {} SET {} WHERE rowid IN ({})"
+             "".format(partition, ", ".join(set_statements), pkt_rowids),
+             indexes))
+    return update_commands
+
+
+# Initialize the database that is used by the module-level functions
+default_database = Database()
+
+
+def connect(db_filepath, pragmas=None):
+    default_database.connect(db_filepath, pragmas)
+
+
+def create_table(tablename, partitioned=False, compressed=False, lazy=False):
+    default_database.create_table(tablename, partitioned, compressed, lazy)
 
-    # Sanity check
-    if len(row_data.keys()) != len(table_column_names):
-        raise ValueError("Unexpected number of data entries: {}"
-                         "".format(len(row_data.keys())))
 
-    # Insert the provided data entries into the corresponding table
-    cursor.execute("INSERT INTO {} VALUES ({})"
-                   "".format(tablename, ", ".join("?"*len(table_columns))),
-                   tuple(row_data[column_name]
-                         for column_name in table_column_names))
+def create_count_trigger(tablename, table_thres, table_reduct):
+    default_database.create_count_trigger(tablename, table_thres,
+                                          table_reduct)
 
 
-def commit():
-    connection.commit()
+def insert(tablename, row_data):
+    default_database.insert(tablename, row_data)
 
 
-def grouped_count(tablename, selected_columns, count_errors):
-    # Use the variables of the corresponding table
-    if tablename == "packets":
-        table_column_names = PKT_COLUMN_NAMES
-    elif tablename == "basic_information":
-        table_column_names = BASIC_INFO_COLUMN_NAMES
-    elif tablename == "battery_percentages":
-        table_column_names = BTRY_PERC_COLUMN_NAMES
-    elif tablename == "events":
-        table_column_names = EVENTS_COLUMN_NAMES
-    else:
-        raise ValueError("Unknown table name \"{}\"".format(tablename))
+def insert_many(tablename, rows):
+    default_database.insert_many(tablename, rows)
 
-    # Sanity checks
-    if len(selected_columns) == 0:
-        raise ValueError("At least one selected column is required")
-    for column_name in selected_columns:
-        if column_name not in table_column_names:
-            raise ValueError("Unknown column name \"{}\"".format(column_name))
 
-    # Construct the selection command
-    column_csv = ", ".join(selected_columns)
-    select_command = "SELECT {}, COUNT(*)".format(column_csv)
-    select_command += " FROM {}".format(tablename)
-    if not count_errors:
-        select_command += " WHERE error_msg IS NULL"
-    select_command += " GROUP BY {}".format(column_csv)
+def commit():
+    default_database.commit()
+
 
-    # Return the results of the constructed command
-    cursor.execute(select_command)
-    return cursor.fetchall()
+def grouped_count(tablename, selected_columns, count_errors,
+                  conditions=None):
+    return default_database.grouped_count(tablename, selected_columns,
+                                          count_errors, conditions)
 
 
 def fetch_values(tablename, selected_columns, conditions, distinct):
-    # Use the variables of the corresponding table
-    if tablename == "packets":
-        table_column_names = PKT_COLUMN_NAMES
-    elif tablename == "basic_information":
-        table_column_names = BASIC_INFO_COLUMN_NAMES
-    elif tablename == "battery_percentages":
-        table_column_names = BTRY_PERC_COLUMN_NAMES
-    elif tablename == "events":
-        table_column_names = EVENTS_COLUMN_NAMES
-    else:
-        raise ValueError("Unknown table name \"{}\"".format(tablename))
+    return default_database.fetch_values(tablename, selected_columns,
+                                         conditions, distinct)
 
-    # Sanity checks
-    if len(selected_columns) == 0:
-        raise ValueError("At least one selected column is required")
-    for column_name in selected_columns:
-        if column_name not in table_column_names:
-            raise ValueError("Unknown column name \"{}\"".format(column_name))
 
-    # Construct the selection command
-    column_csv = ", ".join(selected_columns)
-    select_command = "SELECT"
-    if distinct:
-        select_command += " DISTINCT"
-    select_command += " {} FROM {}".format(column_csv, tablename)
-    expr_statements = []
-    expr_values = []
-    if conditions is not None:
-        select_command += " WHERE "
-        for condition in conditions:
-            param = condition[0]
-            value = condition[1]
-            if param[0] == "!":
-                neq = True
-                param = param[1:]
-            else:
-                neq = False
-            if param not in table_column_names:
-                raise ValueError("Unknown column name \"{}\"".format(param))
-            elif value is None:
-                if neq:
-                    expr_statements.append("{} IS NOT NULL".format(param))
-                else:
-                    expr_statements.append("{} IS NULL".format(param))
-            else:
-                if neq:
-                    expr_statements.append("{}!=?".format(param))
-                else:
-                    expr_statements.append("{}=?".format(param))
-                expr_values.append(value)
-        select_command += " AND ".join(expr_statements)
+def iter_values(tablename, selected_columns, conditions, distinct,
+                fetch_size=FETCH_SIZE, sorted_columns=None):
+    return default_database.iter_values(tablename, selected_columns,
+                                        conditions, distinct, fetch_size,
+                                        sorted_columns)
+
 
-    # Return the results of the constructed command
-    cursor.execute(select_command, tuple(expr_values))
-    return cursor.fetchall()
+def count_values(tablename, selected_columns, conditions):
+    return default_database.count_values(tablename, selected_columns,
+                                         conditions)
 
 
 def matching_frequency(tablename, conditions):
-    # Use the variables of the corresponding table
-    if tablename == "packets":
-        table_column_names = PKT_COLUMN_NAMES
-    elif tablename == "basic_information":
-        table_column_names = BASIC_INFO_COLUMN_NAMES
-    elif tablename == "battery_percentages":
-        table_column_names = BTRY_PERC_COLUMN_NAMES
-    elif tablename == "events":
-        table_column_names = EVENTS_COLUMN_NAMES
-    else:
-        raise ValueError("Unknown table name \"{}\"".format(tablename))
+    return default_database.matching_frequency(tablename, conditions)
 
-    # Construct the selection command
-    select_command = "SELECT COUNT(*) FROM {}".format(tablename)
-    expr_statements = []
-    expr_values = []
-    if conditions is not None:
-        select_command += " WHERE "
-        for condition in conditions:
-            param = condition[0]
-            value = condition[1]
-            if param[0] == "!":
-                neq = True
-                param = param[1:]
-            else:
-                neq = False
-            if param not in table_column_names:
-                raise ValueError("Unknown column name \"{}\"".format(param))
-            elif value is None:
-                if neq:
-                    expr_statements.append("{} IS NOT NULL".format(param))
-                else:
-                    expr_statements.append("{} IS NULL".format(param))
-            else:
-                if neq:
-                    expr_statements.append("{}!=?".format(param))
-                else:
-                    expr_statements.append("{}=?".format(param))
-                expr_values.append(value)
-        select_command += " AND ".join(expr_statements)
 
-    # Return the results of the constructed command
-    cursor.execute(select_command, tuple(expr_values))
-    return cursor.fetchall()[0][0]
+def store_networks(networks, panids=None):
+    default_database.store_networks(networks, panids)
 
 
-def store_networks(networks):
-    # Drop the table if it already exists
-    cursor.execute("DROP TABLE IF EXISTS networks")
+def store_short_addresses(short_addresses, keys=None):
+    default_database.store_short_addresses(short_addresses, keys)
 
-    # Create the table
-    cursor.execute("CREATE TABLE networks(panid TEXT NOT NULL, "
-                   "epidset TEXT NOT NULL, earliest REAL, latest REAL)")
 
-    # Insert the data into the table
-    for panid in networks.keys():
-        cursor.execute(
-            "INSERT INTO networks VALUES (?, ?, ?, ?)",
-            (panid,
-             ";".join(epid for epid in sorted(list(
-                      networks[panid]["epidset"]))),
-             networks[panid]["earliest"],
-             networks[panid]["latest"]))
-
-
-def store_short_addresses(short_addresses):
-    # Drop the table if it already exists
-    cursor.execute("DROP TABLE IF EXISTS short_addresses")
-
-    # Create the table
-    cursor.execute("CREATE TABLE short_addresses(panid TEXT NOT NULL, "
-                   "shortaddr TEXT NOT NULL, altset TEXT NOT NULL, "
-                   "macset TEXT NOT NULL, nwkset TEXT NOT NULL, "
-                   "earliest REAL, latest REAL)")
-
-    # Insert the data into the table
-    for (panid, shortaddr) in short_addresses.keys():
-        cursor.execute(
-            "INSERT INTO short_addresses VALUES (?, ?, ?, ?, ?, ?, ?)",
-            (panid,
-             shortaddr,
-             ";".join(extendedaddr for extendedaddr in sorted(list(
-                      short_addresses[(panid, shortaddr)]["altset"]))),
-             ";".join(macdevtype for macdevtype in sorted(list(
-                      short_addresses[(panid, shortaddr)]["macset"]))),
-             ";".join(nwkdevtype for nwkdevtype in sorted(list(
-                      short_addresses[(panid, shortaddr)]["nwkset"]))),
-             short_addresses[(panid, shortaddr)]["earliest"],
-             short_addresses[(panid, shortaddr)]["latest"]))
-
-
-def store_extended_addresses(extended_addresses):
-    # Drop the table if it already exists
-    cursor.execute("DROP TABLE IF EXISTS extended_addresses")
-
-    # Create the table
-    cursor.execute("CREATE TABLE extended_addresses("
-                   "extendedaddr TEXT NOT NULL, altset TEXT NOT NULL, "
-                   "macset TEXT NOT NULL, nwkset TEXT NOT NULL, "
-                   "earliest REAL, latest REAL)")
-
-    # Insert the data into the table
-    for extendedaddr in extended_addresses.keys():
-        cursor.execute(
-            "INSERT INTO extended_addresses VALUES (?, ?, ?, ?, ?, ?)",
-            (extendedaddr,
-             ";".join(str(localaddr) for localaddr in sorted(list(
-                      extended_addresses[extendedaddr]["altset"]))),
-             ";".join(macdevtype for macdevtype in sorted(list(
-                      extended_addresses[extendedaddr]["macset"]))),
-             ";".join(nwkdevtype for nwkdevtype in sorted(list(
-                      extended_addresses[extendedaddr]["nwkset"]))),
-             extended_addresses[extendedaddr]["earliest"],
-             extended_addresses[extendedaddr]["latest"]))
-
-
-def store_pairs(pairs):
-    # Drop the table if it already exists
-    cursor.execute("DROP TABLE IF EXISTS pairs")
-
-    # Create the table
-    cursor.execute("CREATE TABLE pairs(panid TEXT NOT NULL, "
-                   "srcaddr TEXT NOT NULL, dstaddr TEXT NOT NULL, "
-                   "earliest REAL NOT NULL, latest REAL NOT NULL)")
-
-    # Insert the data into the table
-    for (panid, srcaddr, dstaddr) in pairs.keys():
-        cursor.execute("INSERT INTO pairs VALUES (?, ?, ?, ?, ?)",
-                       (panid,
-                        srcaddr,
-                        dstaddr,
-                        pairs[(panid, srcaddr, dstaddr)]["earliest"],
-                        pairs[(panid, srcaddr, dstaddr)]["latest"]))
+def store_extended_addresses(extended_addresses, extendedaddrs=None):
+    default_database.store_extended_addresses(extended_addresses,
+                                              extendedaddrs)
 
 
-def get_nwkdevtype(panid, shortaddr, extendedaddr):
-    nwkset = set()
-
-    if panid is not None and shortaddr is not None:
-        cursor.execute("SELECT nwkset FROM short_addresses WHERE panid=? "
-                       "AND shortaddr=?", (panid, shortaddr))
-        results = cursor.fetchall()
-        if (len(results) > 1
-                or (len(results) == 1 and ";" in results[0][0])):
-            return "Conflicting Data"
-        elif len(results) == 1:
-            nwkset.add(results[0][0])
-
-    if extendedaddr is not None:
-        cursor.execute("SELECT nwkset FROM extended_addresses "
-                       "WHERE extendedaddr=?", (extendedaddr,))
-        results = cursor.fetchall()
-        if (len(results) > 1
-                or (len(results) == 1 and ";" in results[0][0])):
-            return "Conflicting Data"
-        elif len(results) == 1:
-            nwkset.add(results[0][0])
+def store_pairs(pairs, keys=None):
+    default_database.store_pairs(pairs, keys)
+
+
+def table_exists(tablename):
+    return default_database.table_exists(tablename)
 
-    if len(nwkset) == 0:
-        return None
-    elif len(nwkset) == 1:
-        return list(nwkset)[0]
-    else:
-        return "Conflicting Data"
+
+def create_progress_tables():
+    default_database.create_progress_tables()
+
+
+def store_progress(pcap_directory, pcap_filename, state):
+    default_database.store_progress(pcap_directory, pcap_filename, state)
+
+
+def load_progress():
+    return default_database.load_progress()
+
+
+def delete_unfinished_packets():
+    return default_database.delete_unfinished_packets()
+
+
+def get_nwkdevtype(panid, shortaddr, extendedaddr):
+    return default_database.get_nwkdevtype(panid, shortaddr, extendedaddr)
 
 
 def update_packets(selected_columns, selected_values, conditions):
-    # Sanity checks
-    if len(selected_columns) == 0:
-        raise ValueError("At least one selected column is required")
-    elif len(selected_columns) != len(selected_values):
-        raise ValueError("The number of selected columns does not match "
-                         "the number of selected values")
-    for column_name in selected_columns:
-        if column_name not in PKT_COLUMN_NAMES:
-            raise ValueError("Unknown column name \"{}\"".format(column_name))
+    default_database.update_packets(selected_columns, selected_values,
+                                    conditions)
+
+
+def insert_packets(rows):
+    default_database.insert_packets(rows)
 
-    # Update the packets table
-    set_statements = ["{} = ?".format(x) for x in selected_columns]
-    update_command = "UPDATE packets SET {}".format(", ".join(set_statements))
-    expr_statements = []
-    expr_values = list(selected_values)
-    if conditions is not None:
-        update_command += " WHERE "
-        for condition in conditions:
-            param = condition[0]
-            value = condition[1]
-            if param[0] == "!":
-                neq = True
-                param = param[1:]
-            else:
-                neq = False
-            if param not in PKT_COLUMN_NAMES:
-                raise ValueError("Unknown column name \"{}\"".format(param))
-            elif value is None:
-                if neq:
-                    expr_statements.append("{} IS NOT NULL".format(param))
-                else:
-                    expr_statements.append("{} IS NULL".format(param))
-            else:
-                if neq:
-                    expr_statements.append("{}!=?".format(param))
-                else:
-                    expr_statements.append("{}=?".format(param))
-                expr_values.append(value)
-        update_command += " AND ".join(expr_statements)
 
-    # Execute the constructed command
-    cursor.execute(update_command, tuple(expr_values))
+def extract_zcl_attributes():
+    return default_database.extract_zcl_attributes()
 
 
 def disconnect():
-    global connection
-    global cursor
-
-    # Close the connection with the database
-    cursor.close()
-    connection.close()
-    connection = None
-    cursor = None
+    default_database.disconnect()
@@ -20,6 +20,7 @@ from . import (
     cli,
     config,
     injection,
+    merging,
     parsing,
     training,
     visualization,
@@ -74,15 +75,48 @@ def main(argv):
             args.PCAP_DIRECTORY,
             args.DATABASE_FILEPATH,
             None if not hasattr(args, "num_workers") else args.num_workers,
+            args.resume,
+            args.watch,
+            args.watch_delay,
+            None if not hasattr(args, "dedup_tolerance")
+            else args.dedup_tolerance,
+            args.partitioned,
+            args.compressed,
+            args.lazy,
+        )
+    elif args.SUBCOMMAND == "merge-pcaps":
+        merging.main(
+            args.PCAP_DIRECTORY,
+            args.OUTPUT_FILEPATH,
+            args.correct_clocks,
+            args.max_clock_offset,
         )
     elif args.SUBCOMMAND == "analyze":
         analysis.main(
             args.DATABASE_FILEPATH,
             args.OUTPUT_DIRECTORY,
             None if not hasattr(args, "num_workers") else args.num_workers,
+            args.in_memory,
+            None if not hasattr(args, "methods") else args.methods,
+            args.incremental,
+            args.approx,
+            args.approx_epsilon,
+            args.approx_delta,
+            args.approx_error,
+            args.query_cache,
+            None if not hasattr(args, "other_databases")
+            else args.other_databases,
+            None if not hasattr(args, "since") else args.since,
+            None if not hasattr(args, "until") else args.until,
+            None if not hasattr(args, "panid") else args.panid,
+            None if not hasattr(args, "bucket") else args.bucket,
         )
     elif args.SUBCOMMAND == "visualize":
-        visualization.main(args.DATABASE_FILEPATH, args.OUTPUT_DIRECTORY)
+        visualization.main(
+            args.DATABASE_FILEPATH,
+            args.OUTPUT_DIRECTORY,
+            args.query_cache,
+        )
     elif args.SUBCOMMAND == "train":
         training.main(
             "enc-nwk-cmd",
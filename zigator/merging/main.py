@@ -0,0 +1,194 @@
+# Copyright (C) 2021 Dimitrios-Georgios Akestoridis
+#
+# This file is part of Zigator.
+#
+# Zigator is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 only,
+# as published by the Free Software Foundation.
+#
+# Zigator is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Zigator. If not, see <https://www.gnu.org/licenses/>.
+
+import logging
+import os
+import statistics
+import struct
+from collections import deque
+
+from ..parsing.main import find_pcap_files
+from ..parsing.stream import get_phy_payload
+from ..parsing.stream import merge_pcap_files
+
+
+# Maximum number of time differences that are kept for each pair of sensors
+MAX_SAMPLES = 1000
+
+
+def estimate_clock_offsets(filepaths, sensor_indices, num_sensors,
+                           max_clock_offset):
+    """Estimate the clock offset of each sensor relative to the first one."""
+    max_clock_offset = int(max_clock_offset * 1000000000)
+
+    # Collect time differences between the captures of identical frames,
+    # indexing only the frames within the maximum clock offset
+    recent_frames = deque()
+    captures = {}
+    samples = {}
+    for (pkt_time, file_index, _, linktype, pkt_bytes, _) in (
+            merge_pcap_files(filepaths)):
+        phy_payload = get_phy_payload(linktype, pkt_bytes)
+        if phy_payload is None:
+            continue
+        sensor_index = sensor_indices[file_index]
+
+        while (len(recent_frames) > 0
+               and recent_frames[0][0] < pkt_time - max_clock_offset):
+            old_payload = recent_frames.popleft()[1]
+            captures[old_payload].popleft()
+            if len(captures[old_payload]) == 0:
+                del captures[old_payload]
+
+        # Frames that were captured more than once by the same sensor
+        # within the time window are ambiguous, e.g., retransmissions
+        if phy_payload in captures.keys():
+            capture_times = {}
+            for (capture_time, capture_sensor) in captures[phy_payload]:
+                if capture_sensor in capture_times.keys():
+                    capture_times[capture_sensor] = None
+                else:
+                    capture_times[capture_sensor] = capture_time
+            for capture_sensor in capture_times.keys():
+                if (capture_sensor == sensor_index
+                        or capture_times[capture_sensor] is None):
+                    continue
+                if capture_sensor < sensor_index:
+                    pair = (capture_sensor, sensor_index)
+                    sample = pkt_time - capture_times[capture_sensor]
+                else:
+                    pair = (sensor_index, capture_sensor)
+                    sample = capture_times[capture_sensor] - pkt_time
+                if pair not in samples.keys():
+                    samples[pair] = []
+                if len(samples[pair]) < MAX_SAMPLES:
+                    samples[pair].append(sample)
+        else:
+            captures[phy_payload] = deque()
+        captures[phy_payload].append((pkt_time, sensor_index))
+        recent_frames.append((pkt_time, phy_payload))
+
+    # Propagate the median time differences from the first sensor
+    offsets = [None] * num_sensors
+    offsets[0] = 0
+    pending_sensors = deque([0])
+    while len(pending_sensors) > 0:
+        sensor_a = pending_sensors.popleft()
+        for sensor_b in range(num_sensors):
+            if offsets[sensor_b] is not None:
+                continue
+            elif (sensor_a, sensor_b) in samples.keys():
+                offsets[sensor_b] = offsets[sensor_a] - int(
+                    statistics.median(samples[(sensor_a, sensor_b)]))
+            elif (sensor_b, sensor_a) in samples.keys():
+                offsets[sensor_b] = offsets[sensor_a] + int(
+                    statistics.median(samples[(sensor_b, sensor_a)]))
+            else:
+                continue
+            pending_sensors.append(sensor_b)
+    return offsets
+
+
+def main(pcap_dirpath, out_filepath, correct_clocks, max_clock_offset):
+    """Merge the pcap files of multiple sensors in chronological order."""
+    # Sanity checks
+    if not os.path.isdir(pcap_dirpath):
+        raise ValueError("The provided directory \"{}\" "
+                         "does not exist".format(pcap_dirpath))
+    elif max_clock_offset < 0:
+        raise ValueError("The maximum clock offset should not be negative")
+
+    # The pcap files of each directory are considered to be the captures
+    # of a single sensor
+    filepaths = [
+        filepath for filepath in find_pcap_files(pcap_dirpath)
+        if os.path.abspath(filepath) != os.path.abspath(out_filepath)
+    ]
+    sensor_dirpaths = sorted(set(
+        os.path.dirname(os.path.abspath(filepath)) for filepath in filepaths))
+    sensor_indices = [
+        sensor_dirpaths.index(os.path.dirname(os.path.abspath(filepath)))
+        for filepath in filepaths
+    ]
+    logging.info("Detected {} pcap files from {} sensors in the \"{}\" "
+                 "directory".format(len(filepaths), len(sensor_dirpaths),
+                                    pcap_dirpath))
+
+    # Estimate the clock offsets of the sensors, if requested
+    sensor_offsets = [0] * len(sensor_dirpaths)
+    if correct_clocks and len(sensor_dirpaths) > 1:
+        sensor_offsets = estimate_clock_offsets(
+            filepaths,
+            sensor_indices,
+            len(sensor_dirpaths),
+            max_clock_offset)
+        for i in range(len(sensor_dirpaths)):
+            if sensor_offsets[i] is None:
+                logging.warning("Unable to estimate the clock offset of the "
+                                "\"{}\" sensor".format(sensor_dirpaths[i]))
+                sensor_offsets[i] = 0
+            else:
+                logging.info("Estimated a clock offset of {:.9f} seconds "
+                             "for the \"{}\" sensor"
+                             "".format(sensor_offsets[i] / 1000000000,
+                                       sensor_dirpaths[i]))
+    offsets = [sensor_offsets[sensor_index]
+               for sensor_index in sensor_indices]
+
+    # Write the merged packets into a pcap file with nanosecond precision,
+    # which replaces the output file only if all the packets were merged
+    logging.info("Writing the merged packets to the \"{}\" file..."
+                 "".format(out_filepath))
+    out_linktype = None
+    num_packets = 0
+    num_clamped = 0
+    tmp_filepath = out_filepath + ".tmp"
+    try:
+        with open(tmp_filepath, mode="wb") as fp:
+            for (pkt_time, file_index, _, linktype, pkt_bytes, wirelen) in (
+                    merge_pcap_files(filepaths, offsets)):
+                if out_linktype is None:
+                    out_linktype = linktype
+                    fp.write(struct.pack("<IHHiIII", 0xa1b23c4d, 2, 4, 0, 0,
+                                         65535, out_linktype))
+                elif linktype != out_linktype:
+                    raise ValueError("The \"{}\" file has a different data "
+                                     "link type than the previous pcap "
+                                     "files".format(filepaths[file_index]))
+                # The pcap format cannot store times before the epoch,
+                # which the clock offsets of some sensors may result in
+                if pkt_time < 0:
+                    pkt_time = 0
+                    num_clamped += 1
+                fp.write(struct.pack("<IIII", pkt_time // 1000000000,
+                                     pkt_time % 1000000000, len(pkt_bytes),
+                                     wirelen))
+                fp.write(pkt_bytes)
+                num_packets += 1
+        if out_linktype is None:
+            raise ValueError("No packets were found in the pcap files of "
+                             "the \"{}\" directory".format(pcap_dirpath))
+        os.replace(tmp_filepath, out_filepath)
+    except BaseException:
+        if os.path.isfile(tmp_filepath):
+            os.remove(tmp_filepath)
+        raise
+    if num_clamped > 0:
+        logging.warning("The times of {} packets preceded the epoch after "
+                        "the correction of clock offsets and were clamped "
+                        "to zero".format(num_clamped))
+    logging.info("Merged {} packets from {} pcap files"
+                 "".format(num_packets, len(filepaths)))
@@ -18,7 +18,13 @@
 Collection of parsing modules for the zigator package
 """
 
+from .. import config
 from .main import main
+from .pcap_file import dissect_frame
+
+
+# The lazily parsed packets are dissected again whenever they are queried
+config.db.set_frame_dissector(dissect_frame)
 
 
 __all__ = ["main"]
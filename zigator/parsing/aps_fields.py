@@ -721,9 +721,7 @@ def aps_auxiliary(pkt, msg_queue, tunneled=False):
         potential_sources = config.get_alternative_addresses(panid, shortaddr)
 
         if len(potential_sources) == 0:
-            potential_sources = set(
-                [int(extendedaddr, 16)
-                 for extendedaddr in config.extended_addresses.keys()])
+            potential_sources = set(config.extended_addresses.keys())
 
         if config.entry["nwk_aux_srcaddr"] is not None:
             potential_sources.add(
@@ -0,0 +1,98 @@
+# Copyright (C) 2021 Dimitrios-Georgios Akestoridis
+#
+# This file is part of Zigator.
+#
+# Zigator is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 only,
+# as published by the Free Software Foundation.
+#
+# Zigator is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Zigator. If not, see <https://www.gnu.org/licenses/>.
+
+import logging
+from array import array
+from collections import deque
+
+from .. import config
+from .pcap_file import split_pcap_filepath
+from .stream import get_phy_payload
+from .stream import merge_pcap_files
+
+
+def find_duplicates(filepaths, parsed_files, tolerance):
+    """Find the packets that were also captured by other pcap files."""
+    # Sanity check
+    if tolerance < 0:
+        raise ValueError("The deduplication tolerance should not be negative")
+
+    if not config.db.table_exists("duplicates"):
+        config.db.create_table("duplicates")
+
+    # Examine the packets of all the pcap files in chronological order,
+    # while indexing only the kept packets that were captured within
+    # the time tolerance of the most recent packet
+    tolerance = int(tolerance * 1000000000)
+    locations = [split_pcap_filepath(filepath) for filepath in filepaths]
+    duplicates = {}
+    recent_payloads = deque()
+    kept_packets = {}
+    for (pkt_time, file_index, pkt_num, linktype, pkt_bytes, _) in (
+            merge_pcap_files(filepaths)):
+        phy_payload = get_phy_payload(linktype, pkt_bytes)
+        if phy_payload is None:
+            # Packets of other data link types are never considered duplicates
+            continue
+
+        while (len(recent_payloads) > 0
+               and recent_payloads[0][0] < pkt_time - tolerance):
+            old_payload = recent_payloads.popleft()[1]
+            kept_packets[old_payload].popleft()
+            if len(kept_packets[old_payload]) == 0:
+                del kept_packets[old_payload]
+
+        # Each kept packet can be matched with at most one packet of every
+        # other pcap file, since a pcap file may contain retransmissions
+        orig_packet = None
+        for kept_packet in kept_packets.get(phy_payload, ()):
+            if file_index not in kept_packet[2]:
+                orig_packet = kept_packet
+                break
+
+        if orig_packet is None:
+            recent_payloads.append((pkt_time, phy_payload))
+            if phy_payload not in kept_packets.keys():
+                kept_packets[phy_payload] = deque()
+            kept_packets[phy_payload].append(
+                (file_index, pkt_num, set([file_index])))
+            continue
+        orig_packet[2].add(file_index)
+
+        # The outcome for already parsed pcap files is already stored
+        if locations[file_index] in parsed_files:
+            continue
+        filepath = filepaths[file_index]
+        if filepath not in duplicates.keys():
+            duplicates[filepath] = array("L")
+        duplicates[filepath].append(pkt_num)
+        config.db.insert(
+            "duplicates",
+            {
+                "pcap_directory": locations[file_index][0],
+                "pcap_filename": locations[file_index][1],
+                "pkt_num": pkt_num,
+                "pkt_time": pkt_time / 1000000000,
+                "orig_pcap_directory": locations[orig_packet[0]][0],
+                "orig_pcap_filename": locations[orig_packet[0]][1],
+                "orig_pkt_num": orig_packet[1],
+            })
+    config.db.commit()
+
+    logging.info("Found {} duplicate packets in {} pcap files"
+                 "".format(sum(len(x) for x in duplicates.values()),
+                           len(duplicates.keys())))
+    return duplicates
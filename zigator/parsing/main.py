@@ -18,12 +18,22 @@ import glob
 import logging
 import multiprocessing as mp
 import os
+import time
 
 from .. import config
+from .. import registry
+from ..analysis.column_stats import compute_column_stats
+from ..analysis.index_advisor import create_indexes
+from .dedup import find_duplicates
 from .pcap_file import pcap_file
+from .pcap_file import split_pcap_filepath
 
 
-def worker(filepaths, msg_queue, task_index, task_lock):
+# Define the number of parsed packets that are inserted at a time
+MAX_PENDING_PACKETS = 1000
+
+
+def worker(filepaths, duplicates, msg_queue, task_index, task_lock):
     """Parse pcap files from the task list."""
     while True:
         with task_lock:
@@ -32,32 +42,99 @@ def worker(filepaths, msg_queue, task_index, task_lock):
                 task_index.value += 1
             else:
                 break
-        pcap_file(filepath, msg_queue)
+        pcap_file(filepath, msg_queue, duplicates.get(filepath, ()))
         msg_queue.put((config.PCAP_MSG, filepath))
     msg_queue.put((config.RETURN_MSG, os.getpid()))
 
 
-def main(pcap_dirpath, db_filepath, num_workers):
-    """Parse all pcap files in the provided directory."""
-    # Sanity check
-    if not os.path.isdir(pcap_dirpath):
-        raise ValueError("The provided directory \"{}\" "
-                         "does not exist".format(pcap_dirpath))
+def get_parsing_state():
+    """Return the state that was accumulated by parsing pcap files."""
+    return {
+        "network_keys": config.network_keys,
+        "link_keys": config.link_keys,
+        "networks": registry.export_records(config.networks),
+        "short_addresses": registry.export_records(config.short_addresses),
+        "extended_addresses": registry.export_records(
+            config.extended_addresses),
+        "pairs": registry.export_records(config.pairs),
+    }
 
-    # Initialize the database that will store the parsed data
-    config.db.connect(db_filepath)
-    config.db.create_table("packets")
-    config.db.commit()
 
-    # Get a sorted list of pcap filepaths
+def restore_parsing_state(state):
+    """Restore the state that was accumulated by parsing pcap files."""
+    for key_name in state["network_keys"].keys():
+        if key_name not in config.network_keys.keys():
+            if state["network_keys"][key_name] not in (
+                    config.network_keys.values()):
+                config.network_keys[key_name] = (
+                    state["network_keys"][key_name]
+                )
+    for key_name in state["link_keys"].keys():
+        if key_name not in config.link_keys.keys():
+            if state["link_keys"][key_name] not in config.link_keys.values():
+                config.link_keys[key_name] = state["link_keys"][key_name]
+    config.networks = registry.import_records(
+        registry.NetworkRecord,
+        state["networks"])
+    config.short_addresses = registry.import_records(
+        registry.AddressRecord,
+        state["short_addresses"])
+    config.extended_addresses = registry.import_records(
+        registry.AddressRecord,
+        state["extended_addresses"])
+    config.pairs = registry.import_records(
+        registry.PairRecord,
+        state["pairs"])
+
+
+def find_pcap_files(pcap_dirpath):
+    """Return a sorted list of the pcap files in the provided directory."""
     filepaths = glob.glob(
         os.path.join(pcap_dirpath, "**", "*.[pP][cC][aA][pP]"),
         recursive=True)
+
+    # Ignore compressed pcap files whose uncompressed version still exists
+    zip_filepaths = glob.glob(
+        os.path.join(pcap_dirpath, "**", "*.[pP][cC][aA][pP].[zZ][iI][pP]"),
+        recursive=True)
+    for filepath in zip_filepaths:
+        if not os.path.isfile(filepath[:-4]):
+            filepaths.append(filepath)
+
     filepaths.sort()
-    logging.info("Detected {} pcap files in the \"{}\" directory"
-                 "".format(len(filepaths), pcap_dirpath))
+    return filepaths
 
-    # Determine the number of processes that will be used
+
+def init_database(db_filepath, resume, partitioned=False, compressed=False,
+                  lazy=False):
+    """Initialize the database and return the already parsed pcap files."""
+    config.db.connect(db_filepath)
+    parsed_files = set()
+    if resume and config.db.table_exists("parsed_files"):
+        parsed_files, state = config.db.load_progress()
+        if len(state) > 0:
+            restore_parsing_state(state)
+        deleted_packets = config.db.delete_unfinished_packets()
+        if not config.db.table_exists("zcl_attributes"):
+            config.db.extract_zcl_attributes()
+        config.db.commit()
+        logging.info("Resuming the parsing process after {} completed "
+                     "pcap files and {} discarded packets"
+                     "".format(len(parsed_files), deleted_packets))
+    elif resume and config.db.table_exists("packets"):
+        config.db.disconnect()
+        raise ValueError("The provided database \"{}\" does not contain "
+                         "any parsing progress".format(db_filepath))
+    else:
+        config.db.create_table("packets", partitioned, compressed, lazy)
+        config.db.extract_zcl_attributes()
+        config.db.create_progress_tables()
+        config.db.commit()
+    return parsed_files
+
+
+def get_num_workers(num_workers):
+    """Return the number of processes that will be used."""
     if num_workers is None:
         if hasattr(os, "sched_getaffinity"):
             num_workers = len(os.sched_getaffinity(0)) - 1
@@ -65,8 +142,13 @@ def main(pcap_dirpath, db_filepath, num_workers):
             num_workers = mp.cpu_count() - 1
     if num_workers < 1:
         num_workers = 1
-    logging.info("The pcap files will be parsed by {} workers"
-                 "".format(num_workers))
+    return num_workers
+
+
+def parse_files(filepaths, num_workers, duplicates=None):
+    """Parse the provided pcap files using multiple processes."""
+    if duplicates is None:
+        duplicates = {}
 
     # Create variables that will be shared by the processes
     msg_queue = mp.Queue()
@@ -77,7 +159,8 @@ def main(pcap_dirpath, db_filepath, num_workers):
     processes = []
     for _ in range(num_workers):
         p = mp.Process(target=worker,
-                       args=(filepaths, msg_queue, task_index, task_lock))
+                       args=(filepaths, duplicates, msg_queue, task_index,
+                             task_lock))
         p.start()
         processes.append(p)
 
@@ -86,6 +169,8 @@ def main(pcap_dirpath, db_filepath, num_workers):
     pcap_counter = 0
     new_network_keys = 0
     new_link_keys = 0
+    state_changed = False
+    pending_packets = []
     while num_terminated_processes < num_workers:
         msg_type, msg_obj = msg_queue.get()
         if msg_type is config.RETURN_MSG:
@@ -104,57 +189,63 @@ def main(pcap_dirpath, db_filepath, num_workers):
         elif msg_type is config.CRITICAL_MSG:
             logging.critical(msg_obj)
         elif msg_type is config.PCAP_MSG:
+            # Commit the parsed packets of this pcap file together with
+            # the accumulated state, so that parsing can be resumed
+            head, tail = split_pcap_filepath(msg_obj)
+            config.db.insert_packets(pending_packets)
+            pending_packets = []
+            config.db.store_progress(
+                head,
+                tail,
+                get_parsing_state() if state_changed else {})
+            config.db.commit()
+            state_changed = False
             pcap_counter += 1
             logging.info("Parsed {} out of the {} pcap files"
                          "".format(pcap_counter, len(filepaths)))
         elif msg_type is config.PKT_MSG:
-            config.db.insert("packets", msg_obj)
+            pending_packets.append(msg_obj)
+            if len(pending_packets) >= MAX_PENDING_PACKETS:
+                config.db.insert_packets(pending_packets)
+                pending_packets = []
         elif msg_type is config.NETWORK_KEYS_MSG:
+            state_changed = True
             for key_name in msg_obj.keys():
                 if key_name not in config.network_keys.keys():
                     if msg_obj[key_name] not in config.network_keys.values():
                         config.network_keys[key_name] = msg_obj[key_name]
                         new_network_keys += 1
         elif msg_type is config.LINK_KEYS_MSG:
+            state_changed = True
             for key_name in msg_obj.keys():
                 if key_name not in config.link_keys.keys():
                     if msg_obj[key_name] not in config.link_keys.values():
                         config.link_keys[key_name] = msg_obj[key_name]
                         new_link_keys += 1
         elif msg_type is config.NETWORKS_MSG:
-            for panid in msg_obj.keys():
-                config.update_networks(
-                    panid,
-                    msg_obj[panid]["epidset"],
-                    msg_obj[panid]["earliest"],
-                    msg_obj[panid]["latest"])
+            state_changed = True
+            registry.merge_records(
+                config.networks,
+                registry.NetworkRecord,
+                msg_obj)
         elif msg_type is config.SHORT_ADDRESSES_MSG:
-            for (panid, shortaddr) in msg_obj.keys():
-                config.update_short_addresses(
-                    panid,
-                    shortaddr,
-                    msg_obj[(panid, shortaddr)]["altset"],
-                    msg_obj[(panid, shortaddr)]["macset"],
-                    msg_obj[(panid, shortaddr)]["nwkset"],
-                    msg_obj[(panid, shortaddr)]["earliest"],
-                    msg_obj[(panid, shortaddr)]["latest"])
+            state_changed = True
+            registry.merge_records(
+                config.short_addresses,
+                registry.AddressRecord,
+                msg_obj)
         elif msg_type is config.EXTENDED_ADDRESSES_MSG:
-            for extendedaddr in msg_obj.keys():
-                config.update_extended_addresses(
-                    extendedaddr,
-                    msg_obj[extendedaddr]["altset"],
-                    msg_obj[extendedaddr]["macset"],
-                    msg_obj[extendedaddr]["nwkset"],
-                    msg_obj[extendedaddr]["earliest"],
-                    msg_obj[extendedaddr]["latest"])
+            state_changed = True
+            registry.merge_records(
+                config.extended_addresses,
+                registry.AddressRecord,
+                msg_obj)
         elif msg_type is config.PAIRS_MSG:
-            for (panid, srcaddr, dstaddr) in msg_obj.keys():
-                config.update_pairs(
-                    panid,
-                    srcaddr,
-                    dstaddr,
-                    msg_obj[(panid, srcaddr, dstaddr)]["earliest"],
-                    msg_obj[(panid, srcaddr, dstaddr)]["latest"])
+            state_changed = True
+            registry.merge_records(
+                config.pairs,
+                registry.PairRecord,
+                msg_obj)
         else:
             raise ValueError("Unknown message type \"{}\"".format(msg_type))
 
@@ -171,6 +262,195 @@ def main(pcap_dirpath, db_filepath, num_workers):
     # Commit the received data to the database
     config.db.commit()
 
+    return new_network_keys, new_link_keys
+
+
+def watch_directory(pcap_dirpath, db_filepath, num_workers, watch_delay,
+                    dedup_tolerance, partitioned=False, compressed=False,
+                    lazy=False):
+    """Parse pcap files as soon as they are closed in the directory."""
+    # Initialize the database, unless it already contains parsing progress
+    parsed_files = init_database(db_filepath, True, partitioned, compressed,
+                                 lazy)
+    num_workers = get_num_workers(num_workers)
+
+    # Bring the derived information of any previously parsed packets
+    # up to date, in case a previous execution was interrupted
+    logging.info("Updating the derived entries of parsed packets...")
+    config.update_derived_entries()
+    logging.info("Finished updating the derived entries of parsed packets")
+    config.db.store_networks(config.networks)
+    config.db.store_short_addresses(config.short_addresses)
+    config.db.store_extended_addresses(config.extended_addresses)
+    config.db.store_pairs(config.pairs)
+    config.db.commit()
+    logging.info("Watching the \"{}\" directory for closed pcap files, "
+                 "which will be parsed by {} workers"
+                 "".format(pcap_dirpath, num_workers))
+
+    # A pcap file is considered closed once its size and modification time
+    # remained the same between two consecutive scans of the directory
+    file_stats = {}
+    try:
+        while True:
+            filepaths = []
+            for filepath in find_pcap_files(pcap_dirpath):
+                if split_pcap_filepath(filepath) in parsed_files:
+                    continue
+                try:
+                    stat_result = os.stat(filepath)
+                except FileNotFoundError:
+                    # The file was renamed or removed after its detection
+                    continue
+                file_stat = (stat_result.st_size, stat_result.st_mtime)
+                if file_stats.get(filepath) == file_stat:
+                    filepaths.append(filepath)
+                else:
+                    file_stats[filepath] = file_stat
+            if len(filepaths) > 0:
+                parse_new_files(filepaths, num_workers, dedup_tolerance)
+                for filepath in filepaths:
+                    parsed_files.add(split_pcap_filepath(filepath))
+                    del file_stats[filepath]
+            time.sleep(watch_delay)
+    except KeyboardInterrupt:
+        logging.info("Stopped watching the \"{}\" directory"
+                     "".format(pcap_dirpath))
+    finally:
+        config.db.disconnect()
+
+
+def parse_new_files(filepaths, num_workers, dedup_tolerance):
+    """Parse closed pcap files and incrementally update the derived data."""
+    logging.info("Detected {} closed pcap files".format(len(filepaths)))
+
+    # Keep a copy of each dictionary that may change after parsing packets
+    init_networks = registry.copy_records(config.networks)
+    init_short_addresses = registry.copy_records(config.short_addresses)
+    init_extended_addresses = registry.copy_records(config.extended_addresses)
+    init_pairs = registry.copy_records(config.pairs)
+
+    # Duplicate packets are only searched among the closed pcap files
+    duplicates = None
+    if dedup_tolerance is not None:
+        duplicates = find_duplicates(filepaths, set(), dedup_tolerance)
+
+    parse_files(filepaths, num_workers, duplicates)
+
+    # Determine which entries of each dictionary changed
+    panids = [
+        panid for panid in config.networks.keys()
+        if panid not in init_networks.keys()
+        or config.networks[panid] != init_networks[panid]
+    ]
+    short_keys = [
+        key for key in config.short_addresses.keys()
+        if key not in init_short_addresses.keys()
+        or config.short_addresses[key] != init_short_addresses[key]
+    ]
+    extendedaddrs = [
+        extendedaddr for extendedaddr in config.extended_addresses.keys()
+        if extendedaddr not in init_extended_addresses.keys()
+        or config.extended_addresses[extendedaddr]
+        != init_extended_addresses[extendedaddr]
+    ]
+    pair_keys = [
+        key for key in config.pairs.keys()
+        if key not in init_pairs.keys()
+        or config.pairs[key] != init_pairs[key]
+    ]
+
+    # The derived entries of previously parsed packets can only change
+    # if the alternative addresses or the device types of their devices
+    # changed, whereas those of the new packets were derived using the
+    # information that was available when their pcap files were parsed
+    scopes = []
+    for filepath in filepaths:
+        head, tail = split_pcap_filepath(filepath)
+        scopes.append([("pcap_directory", head), ("pcap_filename", tail)])
+    for (panid, shortaddr) in short_keys:
+        init_entry = init_short_addresses.get((panid, shortaddr))
+        entry = config.short_addresses[(panid, shortaddr)]
+        if (init_entry is None or init_entry.altset != entry.altset
+                or init_entry.nwkset != entry.nwkset):
+            scopes.append([
+                ("der_{}panid", registry.format_shortaddr(panid)),
+                ("der_{}shortaddr", registry.format_shortaddr(shortaddr)),
+            ])
+    for extendedaddr in extendedaddrs:
+        init_entry = init_extended_addresses.get(extendedaddr)
+        entry = config.extended_addresses[extendedaddr]
+        if init_entry is None or init_entry.nwkset != entry.nwkset:
+            scopes.append([
+                ("der_{}extendedaddr",
+                 registry.format_extendedaddr(extendedaddr)),
+            ])
+    config.update_derived_entries(scopes)
+
+    # Replace only the changed entries of the derived information
+    config.db.store_networks(config.networks, panids)
+    config.db.store_short_addresses(config.short_addresses, short_keys)
+    config.db.store_extended_addresses(config.extended_addresses,
+                                       extendedaddrs)
+    config.db.store_pairs(config.pairs, pair_keys)
+    config.db.commit()
+    logging.info("Updated the derived information of {} networks, "
+                 "{} short addresses, {} extended addresses, and {} pairs"
+                 "".format(len(panids), len(short_keys), len(extendedaddrs),
+                           len(pair_keys)))
+
+
+def main(pcap_dirpath, db_filepath, num_workers, resume=False, watch=False,
+         watch_delay=60.0, dedup_tolerance=None, partitioned=False,
+         compressed=False, lazy=False):
+    """Parse all pcap files in the provided directory."""
+    # Sanity check
+    if not os.path.isdir(pcap_dirpath):
+        raise ValueError("The provided directory \"{}\" "
+                         "does not exist".format(pcap_dirpath))
+
+    # Keep parsing pcap files as they are closed, if requested
+    if watch:
+        watch_directory(pcap_dirpath, db_filepath, num_workers, watch_delay,
+                        dedup_tolerance, partitioned, compressed, lazy)
+        return
+
+    # Initialize the database that will store the parsed data,
+    # unless the progress of a previous execution should be resumed
+    parsed_files = init_database(db_filepath, resume, partitioned,
+                                 compressed, lazy)
+
+    # Get a sorted list of pcap filepaths
+    filepaths = find_pcap_files(pcap_dirpath)
+    logging.info("Detected {} pcap files in the \"{}\" directory"
+                 "".format(len(filepaths), pcap_dirpath))
+
+    # Find the packets that were captured by more than one pcap file,
+    # taking into account the pcap files that were already parsed
+    duplicates = None
+    if dedup_tolerance is not None:
+        duplicates = find_duplicates(filepaths, parsed_files,
+                                     dedup_tolerance)
+
+    # Skip the pcap files that were completely parsed
+    if len(parsed_files) > 0:
+        num_filepaths = len(filepaths)
+        filepaths = [
+            filepath for filepath in filepaths
+            if split_pcap_filepath(filepath) not in parsed_files
+        ]
+        logging.info("Skipping {} pcap files that were already parsed"
+                     "".format(num_filepaths - len(filepaths)))
+
+    # Determine the number of processes that will be used
+    num_workers = get_num_workers(num_workers)
+    logging.info("The pcap files will be parsed by {} workers"
+                 "".format(num_workers))
+
+    # Parse the pcap files and commit the received data to the database
+    new_network_keys, new_link_keys = parse_files(filepaths, num_workers,
+                                                  duplicates)
+
     # Log a summary of new keys and derived information
     logging.info("Discovered {} previously unknown network keys"
                  "".format(new_network_keys))
@@ -223,5 +503,18 @@ def main(pcap_dirpath, db_filepath, num_workers):
         logging.warning("Generated {} \"{}\" parsing errors"
                         "".format(frequency, message))
 
+    # Summarize the values of each column for the analysis methods
+    start_time = time.time()
+    num_columns = compute_column_stats(config.db.default_database)
+    config.db.commit()
+    logging.info("Computed the statistics of {} columns in {:.3f} seconds"
+                 "".format(num_columns, time.time() - start_time))
+
+    # Create the indexes that serve the queries of the analysis methods
+    num_indexes, index_time, index_size = create_indexes(
+        config.db.default_database)
+    logging.info("Created {} indexes in {:.3f} seconds using {} bytes"
+                 "".format(num_indexes, index_time, index_size))
+
     # Disconnection from the database
     config.db.disconnect()
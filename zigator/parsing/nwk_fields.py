@@ -965,9 +965,7 @@ def nwk_auxiliary(pkt, msg_queue):
         potential_sources = config.get_alternative_addresses(panid, shortaddr)
 
         if len(potential_sources) == 0:
-            potential_sources = set(
-                [int(extendedaddr, 16)
-                 for extendedaddr in config.extended_addresses.keys()])
+            potential_sources = set(config.extended_addresses.keys())
 
         if config.entry["nwk_srcextendedaddr"] is not None:
             potential_sources.add(
@@ -16,8 +16,11 @@
 
 import copy
 import os
+import queue
+import zipfile
 
 from scapy.all import CookedLinux
+from scapy.all import Dot15d4FCS
 from scapy.all import PcapReader
 
 from .. import config
@@ -26,21 +29,40 @@ from .phy_fields import phy_fields
 from .sll_fields import sll_fields
 
 
-def pcap_file(filepath, msg_queue):
+def split_pcap_filepath(filepath):
+    """Return the directory and the name of the provided pcap file."""
+    head, tail = os.path.split(os.path.abspath(filepath))
+
+    # Compressed pcap files are identified by the name of their pcap file
+    if tail.lower().endswith(".pcap.zip"):
+        tail = tail[:-4]
+
+    return head, tail
+
+
+def open_pcap_file(filepath, reader_class=PcapReader):
+    """Return a reader for the provided, possibly compressed, pcap file."""
+    if filepath.lower().endswith(".zip"):
+        with zipfile.ZipFile(filepath, mode="r") as zip_file:
+            member_names = zip_file.namelist()
+            if len(member_names) != 1:
+                raise ValueError("Expected the \"{}\" file to contain "
+                                 "exactly one pcap file".format(filepath))
+            return reader_class(zip_file.open(member_names[0]))
+    else:
+        return reader_class(filepath)
+
+
+def pcap_file(filepath, msg_queue, duplicate_pkt_nums=()):
     """Parse all packets in the provided pcap file."""
-    # Keep a copy of each dictionary that may change after parsing packets
-    init_network_keys = copy.deepcopy(config.network_keys)
-    init_link_keys = copy.deepcopy(config.link_keys)
-    init_networks = copy.deepcopy(config.networks)
-    init_short_addresses = copy.deepcopy(config.short_addresses)
-    init_extended_addresses = copy.deepcopy(config.extended_addresses)
-    init_pairs = copy.deepcopy(config.pairs)
+    # Keep track of the dictionary entries that change after parsing packets
+    config.reset_touched_entries()
 
     # Reset all data entries in the dictionary
     config.reset_entries()
 
     # Collect data that are common for all the packets of the pcap file
-    head, tail = os.path.split(os.path.abspath(filepath))
+    head, tail = split_pcap_filepath(filepath)
     config.entry["pcap_directory"] = head
     config.entry["pcap_filename"] = tail
 
@@ -50,8 +72,24 @@ def pcap_file(filepath, msg_queue):
          "Reading packets from the \"{}\" file..."
          "".format(filepath)))
     config.entry["pkt_num"] = 0
-    pcap_reader = PcapReader(filepath)
-    for pkt in pcap_reader:
+    try:
+        pcap_reader = open_pcap_file(filepath)
+    except ValueError as err:
+        msg_queue.put((config.ERROR_MSG, str(err)))
+        return
+    duplicate_pkt_nums = set(duplicate_pkt_nums)
+    while True:
+        # Packets that were captured by other pcap files are not dissected
+        if config.entry["pkt_num"] + 1 in duplicate_pkt_nums:
+            if next(pcap_reader, None) is None:
+                break
+            config.entry["pkt_num"] += 1
+            continue
+        try:
+            pkt = pcap_reader.read_packet()
+        except EOFError:
+            break
+
         # Collect data about the packet
         config.entry["pkt_num"] += 1
         config.entry["pkt_time"] = float(pkt.time)
@@ -79,30 +117,35 @@ def pcap_file(filepath, msg_queue):
     msg_queue.put(
         (config.INFO_MSG,
          "Parsed {} packets from the \"{}\" file"
-         "".format(config.entry["pkt_num"], filepath)))
-
-    # Send a copy of each dictionary that changed after parsing packets
-    if config.network_keys != init_network_keys:
-        msg_queue.put(
-            (config.NETWORK_KEYS_MSG,
-             copy.deepcopy(config.network_keys)))
-    if config.link_keys != init_link_keys:
-        msg_queue.put(
-            (config.LINK_KEYS_MSG,
-             copy.deepcopy(config.link_keys)))
-    if config.networks != init_networks:
-        msg_queue.put(
-            (config.NETWORKS_MSG,
-             copy.deepcopy(config.networks)))
-    if config.short_addresses != init_short_addresses:
-        msg_queue.put(
-            (config.SHORT_ADDRESSES_MSG,
-             copy.deepcopy(config.short_addresses)))
-    if config.extended_addresses != init_extended_addresses:
+         "".format(config.entry["pkt_num"] - len(duplicate_pkt_nums),
+                   filepath)))
+    if len(duplicate_pkt_nums) > 0:
         msg_queue.put(
-            (config.EXTENDED_ADDRESSES_MSG,
-             copy.deepcopy(config.extended_addresses)))
-    if config.pairs != init_pairs:
-        msg_queue.put(
-            (config.PAIRS_MSG,
-             copy.deepcopy(config.pairs)))
+            (config.INFO_MSG,
+             "Skipped {} duplicate packets from the \"{}\" file"
+             "".format(len(duplicate_pkt_nums), filepath)))
+
+    # Send only the dictionary entries that may have changed
+    for msg in config.get_touched_entries_msgs():
+        msg_queue.put(msg)
+
+
+def dissect_frame(frame, network_keys, link_keys):
+    """Return the fields of an IEEE 802.15.4 frame that is parsed again."""
+    # Use the provided keys along with the loaded ones, while keeping
+    # the data entries of any packet that is being parsed
+    saved_keys = (config.network_keys, config.link_keys)
+    saved_entry = dict(config.entry)
+    config.network_keys = dict(network_keys, **config.network_keys)
+    config.link_keys = dict(link_keys, **config.link_keys)
+    try:
+        # The messages about the frame were already sent when it was parsed
+        config.reset_entries()
+        config.entry["pcap_directory"] = ""
+        config.entry["pcap_filename"] = ""
+        config.entry["pkt_num"] = 0
+        phy_fields(Dot15d4FCS(frame), queue.SimpleQueue())
+        return dict(config.entry)
+    finally:
+        config.network_keys, config.link_keys = saved_keys
+        config.entry.update(saved_entry)
@@ -0,0 +1,108 @@
+# Copyright (C) 2021 Dimitrios-Georgios Akestoridis
+#
+# This file is part of Zigator.
+#
+# Zigator is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 only,
+# as published by the Free Software Foundation.
+#
+# Zigator is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Zigator. If not, see <https://www.gnu.org/licenses/>.
+
+import heapq
+
+from scapy.all import RawPcapReader
+from scapy.all import Scapy_Exception
+
+from .pcap_file import open_pcap_file
+
+
+# Data link types of pcap files whose PHY payloads can be compared
+DLT_LINUX_SLL = 113
+DLT_IEEE802_15_4_WITHFCS = 195
+
+# Number of bytes of the header that precedes the PHY payload in SLL frames
+SLL_HEADER_LENGTH = 16
+
+
+def read_frames(filepath):
+    """Yield the time, the number, and the raw bytes of each packet."""
+    try:
+        raw_reader = open_pcap_file(filepath, RawPcapReader)
+    except (ValueError, Scapy_Exception, OSError):
+        # The error will be reported when the pcap file is parsed
+        return
+
+    try:
+        pkt_num = 0
+        for (pkt_bytes, pkt_metadata) in raw_reader:
+            pkt_num += 1
+
+            # Timestamps are expressed in nanoseconds to avoid rounding
+            # errors, while pcapng files specify a link type per packet
+            if hasattr(pkt_metadata, "tshigh"):
+                linktype = pkt_metadata.linktype
+                pkt_time = (
+                    ((pkt_metadata.tshigh << 32) + pkt_metadata.tslow)
+                    * 1000000000 // pkt_metadata.tsresol
+                )
+            else:
+                linktype = raw_reader.linktype
+                pkt_time = (
+                    pkt_metadata.sec * 1000000000
+                    + pkt_metadata.usec * (1 if raw_reader.nano else 1000)
+                )
+
+            yield (pkt_time, pkt_num, linktype, pkt_bytes,
+                   pkt_metadata.wirelen)
+    finally:
+        raw_reader.close()
+
+
+def get_phy_payload(linktype, pkt_bytes):
+    """Return the PHY payload of the provided packet, if possible."""
+    if linktype == DLT_IEEE802_15_4_WITHFCS:
+        return pkt_bytes
+    elif linktype == DLT_LINUX_SLL:
+        return pkt_bytes[SLL_HEADER_LENGTH:]
+    else:
+        return None
+
+
+def merge_pcap_files(filepaths, offsets=None):
+    """Yield the packets of the provided pcap files in chronological order."""
+    if offsets is None:
+        offsets = [0] * len(filepaths)
+
+    # Each pcap file is opened only when its first packet is reached,
+    # so that the number of open files is limited by the number of pcap
+    # files that overlap in time, rather than the total number of them
+    heap = []
+    for file_index in range(len(filepaths)):
+        frame = next(read_frames(filepaths[file_index]), None)
+        if frame is not None:
+            heap.append((frame[0] + offsets[file_index], file_index, 0))
+    heapq.heapify(heap)
+
+    readers = {}
+    while len(heap) > 0:
+        entry = heapq.heappop(heap)
+        file_index = entry[1]
+        if entry[2] == 0:
+            readers[file_index] = read_frames(filepaths[file_index])
+        else:
+            yield entry
+
+        # Schedule the next packet of the same pcap file
+        frame = next(readers[file_index], None)
+        if frame is None:
+            del readers[file_index]
+        else:
+            heapq.heappush(
+                heap,
+                (frame[0] + offsets[file_index], file_index) + frame[1:])
@@ -0,0 +1,144 @@
+# Copyright (C) 2021 Dimitrios-Georgios Akestoridis
+#
+# This file is part of Zigator.
+#
+# Zigator is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 only,
+# as published by the Free Software Foundation.
+#
+# Zigator is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Zigator. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Query cache module for the zigator package
+"""
+
+import hashlib
+import sqlite3
+import time
+
+from . import serialization
+
+
+# Define the suffix of the sidecar file of each cached database
+CACHE_SUFFIX = "-cache"
+
+# Define the default maximum size of the cached results in bytes
+MAX_CACHE_SIZE = 256 * 1024 * 1024
+
+# Define the number of seconds to wait for other processes that use
+# the same sidecar file
+CACHE_TIMEOUT = 60.0
+
+
+def get_cache_key(command, params):
+    """Return the key of the results of a query."""
+    return hashlib.blake2b(
+        serialization.dumps((command, tuple(params))).encode(),
+        digest_size=16).digest()
+
+
+class QueryCache(object):
+    """Results of queries that are stored in a sidecar file.
+
+    All the results are discarded whenever the fingerprint of the cached
+    database changes, which is checked before each lookup and insertion,
+    while the least recently used results are evicted whenever the stored
+    results exceed the maximum size.
+    """
+
+    def __init__(self, cache_filepath, get_fingerprint,
+                 max_size=MAX_CACHE_SIZE):
+        self.get_fingerprint = get_fingerprint
+        self.fingerprint = None
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.connection = sqlite3.connect(
+            cache_filepath,
+            timeout=CACHE_TIMEOUT,
+            isolation_level=None)
+        self.cursor = self.connection.cursor()
+        self.cursor.execute("PRAGMA journal_mode=WAL")
+        self.cursor.execute("PRAGMA synchronous=NORMAL")
+        self.cursor.execute("CREATE TABLE IF NOT EXISTS fingerprint("
+                            "state TEXT NOT NULL)")
+        self.cursor.execute("CREATE TABLE IF NOT EXISTS results("
+                            "key BLOB PRIMARY KEY, "
+                            "result TEXT NOT NULL, "
+                            "size INTEGER NOT NULL, "
+                            "last_used REAL NOT NULL)")
+
+    def check_fingerprint(self):
+        # Discard the results of any previous contents of the database
+        fingerprint = serialization.dumps(self.get_fingerprint())
+        if fingerprint == self.fingerprint:
+            return
+        self.cursor.execute("BEGIN IMMEDIATE")
+        try:
+            self.cursor.execute("SELECT state FROM fingerprint")
+            if self.cursor.fetchall() != [(fingerprint,)]:
+                self.cursor.execute("DELETE FROM fingerprint")
+                self.cursor.execute("DELETE FROM results")
+                self.cursor.execute("INSERT INTO fingerprint VALUES (?)",
+                                    (fingerprint,))
+            self.cursor.execute("COMMIT")
+        except Exception:
+            self.cursor.execute("ROLLBACK")
+            raise
+        self.fingerprint = fingerprint
+
+    def get(self, command, params):
+        self.check_fingerprint()
+        key = get_cache_key(command, params)
+        self.cursor.execute("SELECT result FROM results WHERE key=?", (key,))
+        results = self.cursor.fetchall()
+        if len(results) == 0:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.cursor.execute("UPDATE results SET last_used=? WHERE key=?",
+                            (time.time(), key))
+        return serialization.loads(results[0][0])
+
+    def put(self, command, params, result):
+        # Results that would not fit in the cache are not stored
+        text = serialization.dumps(result)
+        if len(text) > self.max_size:
+            return
+
+        self.check_fingerprint()
+        self.cursor.execute("BEGIN IMMEDIATE")
+        try:
+            self.cursor.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                (get_cache_key(command, params), text, len(text),
+                 time.time()))
+
+            # Evict the least recently used results that exceed the limit
+            self.cursor.execute("SELECT SUM(size) FROM results")
+            excess_size = self.cursor.fetchall()[0][0] - self.max_size
+            if excess_size > 0:
+                self.cursor.execute("SELECT key, size FROM results "
+                                    "ORDER BY last_used")
+                evicted_keys = []
+                for (key, size) in self.cursor.fetchall():
+                    if excess_size <= 0:
+                        break
+                    evicted_keys.append((key,))
+                    excess_size -= size
+                self.cursor.executemany("DELETE FROM results WHERE key=?",
+                                        evicted_keys)
+            self.cursor.execute("COMMIT")
+        except Exception:
+            self.cursor.execute("ROLLBACK")
+            raise
+
+    def close(self):
+        self.cursor.close()
+        self.connection.close()
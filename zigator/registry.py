@@ -0,0 +1,154 @@
+# Copyright (C) 2021 Dimitrios-Georgios Akestoridis
+#
+# This file is part of Zigator.
+#
+# Zigator is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 only,
+# as published by the Free Software Foundation.
+#
+# Zigator is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Zigator. If not, see <https://www.gnu.org/licenses/>.
+
+
+def format_shortaddr(value):
+    """Return the hex string of a PAN ID or a short address."""
+    return "0x{:04x}".format(value)
+
+
+def format_extendedaddr(value):
+    """Return the hex string of an extended address or an extended PAN ID."""
+    return "{:016x}".format(value)
+
+
+def format_localaddr(localaddr):
+    """Return the string of a PAN ID and short address pair."""
+    return str((format_shortaddr(localaddr[0]),
+                format_shortaddr(localaddr[1])))
+
+
+class NetworkRecord(object):
+    """Information about a network with a specific PAN ID."""
+    __slots__ = ("epidset", "earliest", "latest")
+
+    def __init__(self, epidset, earliest, latest):
+        self.epidset = set(epidset)
+        self.earliest = earliest
+        self.latest = latest
+
+    def __eq__(self, other):
+        if not isinstance(other, NetworkRecord):
+            return NotImplemented
+        return self.to_tuple() == other.to_tuple()
+
+    __hash__ = None
+
+    def update(self, epidset, earliest, latest):
+        self.epidset.update(epidset)
+        update_timestamps(self, earliest, latest)
+
+    def copy(self):
+        return NetworkRecord(self.epidset, self.earliest, self.latest)
+
+    def to_tuple(self):
+        return (frozenset(self.epidset), self.earliest, self.latest)
+
+
+class AddressRecord(object):
+    """Information about a device with a specific address."""
+    __slots__ = ("altset", "macset", "nwkset", "earliest", "latest")
+
+    def __init__(self, altset, macset, nwkset, earliest, latest):
+        self.altset = set(altset)
+        self.macset = set(macset)
+        self.nwkset = set(nwkset)
+        self.earliest = earliest
+        self.latest = latest
+
+    def __eq__(self, other):
+        if not isinstance(other, AddressRecord):
+            return NotImplemented
+        return self.to_tuple() == other.to_tuple()
+
+    __hash__ = None
+
+    def update(self, altset, macset, nwkset, earliest, latest):
+        self.altset.update(altset)
+        self.macset.update(macset)
+        self.nwkset.update(nwkset)
+        update_timestamps(self, earliest, latest)
+
+    def copy(self):
+        return AddressRecord(self.altset, self.macset, self.nwkset,
+                             self.earliest, self.latest)
+
+    def to_tuple(self):
+        return (frozenset(self.altset), frozenset(self.macset),
+                frozenset(self.nwkset), self.earliest, self.latest)
+
+
+class PairRecord(object):
+    """Information about MAC Data packets between two devices."""
+    __slots__ = ("earliest", "latest")
+
+    def __init__(self, earliest, latest):
+        self.earliest = earliest
+        self.latest = latest
+
+    def __eq__(self, other):
+        if not isinstance(other, PairRecord):
+            return NotImplemented
+        return self.to_tuple() == other.to_tuple()
+
+    __hash__ = None
+
+    def update(self, earliest, latest):
+        update_timestamps(self, earliest, latest)
+
+    def copy(self):
+        return PairRecord(self.earliest, self.latest)
+
+    def to_tuple(self):
+        return (self.earliest, self.latest)
+
+
+def update_timestamps(record, earliest, latest):
+    if earliest is not None:
+        if record.earliest is None or earliest < record.earliest:
+            record.earliest = earliest
+    if latest is not None:
+        if record.latest is None or latest > record.latest:
+            record.latest = latest
+
+
+def copy_records(records):
+    """Return an independent copy of the provided records."""
+    return {key: records[key].copy() for key in records.keys()}
+
+
+def export_records(records, keys=None):
+    """Return the compact representation of the provided records."""
+    if keys is None:
+        keys = records.keys()
+    return {key: records[key].to_tuple() for key in keys}
+
+
+def import_records(record_class, exported_records):
+    """Return the records of the provided compact representation."""
+    return {
+        key: record_class(*exported_records[key])
+        for key in exported_records.keys()
+    }
+
+
+def merge_records(records, record_class, exported_records):
+    """Merge the provided compact representation into the records."""
+    for key in exported_records.keys():
+        if key in records.keys():
+            records[key].update(*exported_records[key])
+        else:
+            records[key] = record_class(*exported_records[key])
@@ -0,0 +1,80 @@
+# Copyright (C) 2021 Dimitrios-Georgios Akestoridis
+#
+# This file is part of Zigator.
+#
+# Zigator is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 only,
+# as published by the Free Software Foundation.
+#
+# Zigator is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Zigator. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Serialization module for the zigator package
+"""
+
+import json
+
+
+# Define the types that are stored without any conversion
+SCALAR_TYPES = (type(None), bool, int, float, str)
+
+
+def encode_value(value):
+    """Return the JSON-compatible representation of a value."""
+    if isinstance(value, SCALAR_TYPES):
+        return value
+    elif isinstance(value, tuple):
+        return [encode_value(item) for item in value]
+    elif isinstance(value, list):
+        return {"list": [encode_value(item) for item in value]}
+    elif isinstance(value, (set, frozenset)):
+        return {"set": [encode_value(item) for item in value]}
+    elif isinstance(value, dict):
+        return {
+            "dict": [
+                [encode_value(key), encode_value(value[key])]
+                for key in value.keys()
+            ],
+        }
+    elif isinstance(value, bytes):
+        return {"bytes": value.hex()}
+    else:
+        raise ValueError("Unable to serialize values of type {}"
+                         "".format(type(value)))
+
+
+def decode_value(value):
+    """Return the value of a JSON-compatible representation."""
+    if isinstance(value, SCALAR_TYPES):
+        return value
+    elif isinstance(value, list):
+        return tuple(decode_value(item) for item in value)
+    elif isinstance(value, dict) and len(value) == 1:
+        if "list" in value.keys():
+            return [decode_value(item) for item in value["list"]]
+        elif "set" in value.keys():
+            return frozenset(decode_value(item) for item in value["set"])
+        elif "dict" in value.keys():
+            return {
+                decode_value(key): decode_value(item)
+                for (key, item) in value["dict"]
+            }
+        elif "bytes" in value.keys():
+            return bytes.fromhex(value["bytes"])
+    raise ValueError("Unable to deserialize the value {}".format(value))
+
+
+def dumps(value):
+    """Return the JSON string of a value."""
+    return json.dumps(encode_value(value), separators=(",", ":"))
+
+
+def loads(text):
+    """Return the value of a JSON string."""
+    return decode_value(json.loads(text))
@@ -0,0 +1,1352 @@
+#!/usr/bin/env python3
+
+# Copyright (C) 2021 Dimitrios-Georgios Akestoridis
+#
+# This file is part of Zigator.
+#
+# Zigator is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 only,
+# as published by the Free Software Foundation.
+#
+# Zigator is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Zigator. If not, see <https://www.gnu.org/licenses/>.
+
+import ast
+import os
+import pickle
+import re
+import shutil
+import sqlite3
+import subprocess
+import tempfile
+import time
+import unittest
+
+import numpy as np
+
+from zigator.analysis import battery_percentages
+from zigator.analysis import battery_statuses
+from zigator.analysis import column_engine
+from zigator.analysis import column_stats
+from zigator.analysis import distinct_matches
+from zigator.analysis import field_values
+from zigator.analysis import form_frequencies
+from zigator.analysis import matching_frequencies
+from zigator.analysis import scheduler
+from zigator.analysis import solo_frequencies
+from zigator.analysis.index_advisor import INDEX_PREFIX
+from zigator.analysis.index_advisor import advise_indexes
+from zigator.analysis.scheduler import DEFAULT_SELECTIVITY
+from zigator.analysis.scheduler import estimate_selectivity
+from zigator.analysis.scheduler import get_row_estimator
+from zigator.analysis.scheduler import shard_devices
+from zigator.analysis.sketches import CountMinSketch
+from zigator.analysis.sketches import HyperLogLog
+from zigator.analysis.sketches import TaskSketch
+from zigator.analysis.sketches import encode_values
+from zigator.analysis.sketches import hash_column
+from zigator.analysis.sketches import hash_values
+from zigator.db import PKT_COLUMN_NAMES
+from zigator.db import Database
+from zigator.query_cache import CACHE_SUFFIX
+from zigator.query_cache import QueryCache
+
+
+DIR_PATH = os.path.dirname(os.path.abspath(__file__))
+DATA_PATH = os.path.join(DIR_PATH, "data")
+
+PCAP_FILENAMES = sorted(os.listdir(DATA_PATH))
+
+# The battery measurements of IAS Zone devices are stored separately, so
+# that the expected contents of the databases of the test data are intact
+IAS_DATA_PATH = os.path.join(DIR_PATH, "ias-data")
+
+IAS_FILEPATHS = [
+    os.path.join("battery-percentages", "battery-percentages-{}.tsv"
+                 "".format(device))
+    for device in ["00124b0000000001", "00124b0000000003", "None"]
+] + [
+    os.path.join("battery-statuses", "battery-statuses-{}.tsv"
+                 "".format(device))
+    for device in ["00124b0000000002", "00124b0000000004", "None"]
+]
+
+
+def write_keys(home_dirpath):
+    """Write the keys that decrypt the test data in a home directory."""
+    config_dirpath = os.path.join(home_dirpath, ".config", "zigator")
+    os.makedirs(config_dirpath)
+    for (filename, entry) in [
+        ("network-keys.tsv", "11111111111111111111111111111111\ttest_1"),
+        ("link-keys.tsv", "33333333333333333333333333333333\ttest_3"),
+        ("install-codes.tsv", "55555555555555555555555555555555a9d1\ttest_5"),
+    ]:
+        with open(os.path.join(config_dirpath, filename), "w") as fp:
+            fp.write(entry + "\n")
+
+
+def run_zigator(env, *args):
+    """Return the exit status and the logs of a zigator command."""
+    cp = subprocess.run(["zigator"] + list(args), env=env,
+                        capture_output=True)
+    return cp.returncode, cp.stderr.decode()
+
+
+def extract_legacy_measurements(database, cluster_id, attribute_id,
+                                datatype, cmd_ids, get_measurement):
+    """Extract measurements by splitting the attribute lists of packets."""
+    measurements = {}
+    for (cmd_id, field_names) in [
+        ("0x01: Read Attributes Response", [
+            "zcl_readattributesresponse_identifiers",
+            "zcl_readattributesresponse_datatypes",
+            "zcl_readattributesresponse_values",
+            "zcl_readattributesresponse_statuses",
+        ]),
+        ("0x0a: Report Attributes", [
+            "zcl_reportattributes_identifiers",
+            "zcl_reportattributes_datatypes",
+            "zcl_reportattributes_data",
+        ]),
+    ]:
+        if cmd_id not in cmd_ids:
+            continue
+        for fetched_tuple in database.fetch_values(
+                "packets",
+                ["pkt_time", "der_nwk_srcextendedaddr"] + field_names,
+                battery_percentages.DEVICE_CONDITIONS[:-1] + [
+                    ("aps_cluster_id", cluster_id),
+                    ("zcl_cmd_id", cmd_id),
+                ],
+                False):
+            fields = [x.split(",") for x in fetched_tuple[2:]]
+            if any(len(field) != len(fields[0]) for field in fields):
+                continue
+
+            # Only the first attribute with the identifier is examined
+            for i in range(len(fields[0])):
+                if fields[0][i] == attribute_id:
+                    if (fields[1][i] == datatype
+                            and (len(fields) < 4
+                                 or fields[3][i] == "0x00: SUCCESS")):
+                        measurements.setdefault(fetched_tuple[1], []).append(
+                            (fetched_tuple[0], get_measurement(fields[2][i])))
+                    break
+    return measurements
+
+
+def write_legacy_measurements(measurements, out_filepath_format):
+    """Write the measurements of each device sorted by their timestamps."""
+    for srcextendedaddr in measurements.keys():
+        measurements[srcextendedaddr].sort(key=lambda x: x[0])
+        with open(out_filepath_format.format(srcextendedaddr), "w") as fp:
+            for measurement in measurements[srcextendedaddr]:
+                fp.write("{}\t{}\n".format(*measurement))
+
+
+class MixedDatabase(object):
+    """Rows of a single column whose values have different types."""
+
+    def iter_values(self, tablename, selected_columns, conditions, distinct,
+                    fetch_size):
+        return iter([(1,), (1.0,), ("1",), (None,), (1,)])
+
+
+class TestAnalysis(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # The test data are parsed and analyzed only once, so that the
+        # output of each variation of the analysis can be compared with it
+        cls.class_dir = tempfile.TemporaryDirectory()
+        cls.env = dict(os.environ, HOME=cls.class_dir.name)
+        write_keys(cls.class_dir.name)
+        cls.db_filepath = os.path.join(cls.class_dir.name, "flat.db")
+        cls.out_dirpath = os.path.join(cls.class_dir.name, "flat")
+        for args in [
+            ("parse", DATA_PATH, cls.db_filepath),
+            ("analyze", cls.db_filepath, cls.out_dirpath),
+        ]:
+            returncode, output = run_zigator(cls.env, *args)
+            if returncode != 0:
+                cls.class_dir.cleanup()
+                raise RuntimeError(output)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.class_dir.cleanup()
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+
+    def test_database_reads(self):
+        """Test reading the packets through the database class."""
+        db_filepath = self.copy_database()
+        database = Database(db_filepath)
+        self.addCleanup(database.disconnect)
+        rows = database.fetch_values(
+            "packets",
+            ["pkt_time", "mac_frametype"],
+            None,
+            False)
+        self.assertEqual(len(rows), 47)
+        self.assertEqual(
+            list(database.iter_values(
+                "packets",
+                ["pkt_time", "mac_frametype"],
+                None,
+                False,
+                fetch_size=5)),
+            rows)
+        self.assertEqual(
+            database.matching_frequency(
+                "packets",
+                [("mac_frametype", "0b001: MAC Data")]),
+            29)
+        self.assertEqual(
+            database.grouped_count("packets", ["mac_frametype"], False),
+            [
+                ("0b000: MAC Beacon", 1),
+                ("0b001: MAC Data", 29),
+                ("0b010: MAC Acknowledgment", 3),
+                ("0b011: MAC Command", 7),
+            ])
+
+        # The read operations can be restricted to a range of row IDs
+        database.set_rowid_range(10, 20)
+        self.assertEqual(
+            database.fetch_values("packets", ["pkt_time"], None, False),
+            [(row[0],) for row in rows[10:20]])
+        database.set_rowid_range()
+        self.assertEqual(
+            len(database.fetch_values("packets", ["pkt_time"], None, False)),
+            47)
+
+    def test_database_connections(self):
+        """Test copying packets between two concurrent connections."""
+        source = Database(self.copy_database())
+        self.addCleanup(source.disconnect)
+        source.set_rowid_range(None, 20)
+        db_filepath = self.get_path("copy.db")
+        with Database(db_filepath) as target:
+            target.create_table("packets")
+            target.insert_many(
+                "packets",
+                (dict(zip(PKT_COLUMN_NAMES, row))
+                 for row in source.fetch_values(
+                     "packets",
+                     PKT_COLUMN_NAMES,
+                     None,
+                     False)))
+            self.assertEqual(target.rowid_range, (None, None))
+        self.assertEqual(
+            self.fetch_rows(db_filepath, "SELECT * FROM packets"),
+            self.fetch_rows(self.db_filepath,
+                            "SELECT * FROM packets WHERE rowid<=20"))
+
+        # Unsupported pragma values are rejected
+        with self.assertRaises(ValueError):
+            source.set_pragma("journal_mode", True)
+
+    def test_advised_indexes(self):
+        """Test creating the indexes of the analysis query patterns."""
+        indexnames = sorted(index[0] for index in advise_indexes())
+        self.assertGreater(len(indexnames), 1)
+        self.assertEqual(self.fetch_indexnames(self.db_filepath), indexnames)
+
+        # Indexes that are missing are created again and obsolete ones
+        # are dropped, without affecting the results of the analysis
+        db_filepath = self.copy_database()
+        connection = sqlite3.connect(db_filepath)
+        for indexname in indexnames[:2]:
+            connection.execute("DROP INDEX {}".format(indexname))
+        connection.execute("CREATE INDEX advised_pkt_num ON packets(pkt_num)")
+        connection.commit()
+        connection.close()
+        out_dirpath = self.get_path("out")
+        output = self.zigator("analyze", db_filepath, out_dirpath)
+        self.assertRegex(output, r"Created 2 indexes in ")
+        self.assertEqual(self.fetch_indexnames(db_filepath), indexnames)
+        self.assertSameOutput(self.out_dirpath, out_dirpath)
+
+        # Indexes that already exist are not created again
+        output = self.zigator("analyze", db_filepath, out_dirpath)
+        self.assertNotRegex(output, r"Created \d+ indexes")
+
+    def test_grouped_frequencies(self):
+        """Test counting the matching packets with one grouped query."""
+        database = Database(self.copy_database())
+        self.addCleanup(database.disconnect)
+        num_values = 0
+        for condition_match in matching_frequencies.CONDITION_MATCHES:
+            aggregate = matching_frequencies.aggregate_task(
+                database,
+                condition_match)
+            self.assertEqual(
+                aggregate,
+                self.count_each_value(
+                    database,
+                    condition_match[1],
+                    condition_match[2]),
+                condition_match[0])
+            num_values += len(aggregate)
+        for packet_type in form_frequencies.PACKET_TYPES:
+            aggregate = form_frequencies.aggregate_task(database, packet_type)
+            self.assertEqual(
+                aggregate,
+                self.count_each_value(
+                    database,
+                    form_frequencies.INSPECTED_COLUMNS,
+                    packet_type[1]),
+                packet_type[0])
+            num_values += len(aggregate)
+        self.assertGreater(num_values, 0)
+
+    def test_in_memory_analysis(self):
+        """Test analyzing the columns that workers share in memory."""
+        out_dirpath = self.get_path("out")
+        self.zigator("analyze", self.copy_database(), out_dirpath,
+                     "--in_memory", "--num_workers", "2")
+        self.assertSameOutput(self.out_dirpath, out_dirpath)
+
+    def test_multiple_workers(self):
+        """Test scheduling the tasks of all methods on several workers."""
+        out_dirpath = self.get_path("out")
+        self.zigator("analyze", self.copy_database(), out_dirpath,
+                     "--num_workers", "3")
+        self.assertSameOutput(self.out_dirpath, out_dirpath)
+
+    def test_estimate_selectivity(self):
+        """Test estimating the cost of tasks from column statistics."""
+        column_stats = {
+            "mac_frametype": (100, 10, 4, {"a": 50, "b": 20}),
+            "nwk_frametype": (10, 0, 1, {"c": 10}),
+            "aps_frametype": (0, 0, 0, {}),
+        }
+        for (condition, selectivity) in [
+            (("mac_frametype", "a"), 0.5),
+            (("mac_frametype", None), 0.1),
+            (("mac_frametype", "d"), 0.1),
+            (("!mac_frametype", None), 0.9),
+            (("!mac_frametype", "a"), 0.4),
+            (("nwk_frametype", "d"), 0.0),
+            (("aps_frametype", "e"), 0.0),
+            (("<mac_frametype", "a"), DEFAULT_SELECTIVITY),
+            (("mac_cmd_id", "f"), DEFAULT_SELECTIVITY),
+            (("mac_frametype|nwk_frametype", "c"), 1.0),
+            (("mac_frametype|aps_frametype", "a"), 0.5),
+            (("!mac_frametype|nwk_frametype", "c"), 0.8),
+        ]:
+            self.assertAlmostEqual(
+                estimate_selectivity(column_stats, condition),
+                selectivity,
+                msg=condition)
+
+        # The statistics that were stored while parsing are used
+        database = Database(self.copy_database())
+        self.addCleanup(database.disconnect)
+        estimate_rows = get_row_estimator(database)
+        self.assertAlmostEqual(
+            estimate_rows(
+                47,
+                [("error_msg", None), ("mac_frametype", "0b001: MAC Data")]),
+            29.0)
+        database.set_packet_filters([("mac_frametype", "0b000: MAC Beacon")])
+        self.assertAlmostEqual(estimate_rows(47, [("error_msg", None)]), 1.0)
+
+    def test_incremental_analysis(self):
+        """Test analyzing only the packets after the stored aggregates."""
+        pcap_dirpath = self.get_path("pcaps")
+        os.makedirs(pcap_dirpath)
+        for filename in PCAP_FILENAMES[:4]:
+            shutil.copy(os.path.join(DATA_PATH, filename), pcap_dirpath)
+        db_filepath = self.get_path("incremental.db")
+        self.zigator("parse", pcap_dirpath, db_filepath)
+        out_dirpath = self.get_path("incremental")
+        output = self.zigator("analyze", db_filepath, out_dirpath,
+                              "--incremental")
+        self.assertIn("Loaded the stored aggregates of 0 tasks", output)
+        self.assertRegex(output, r"Stored the aggregates of \d+ tasks "
+                                 r"up to row 33")
+
+        # The aggregates of the packets of the new pcap files are merged
+        # with the stored ones
+        for filename in PCAP_FILENAMES[4:]:
+            shutil.copy(os.path.join(DATA_PATH, filename), pcap_dirpath)
+        self.zigator("parse", pcap_dirpath, db_filepath, "--resume")
+        shutil.rmtree(out_dirpath)
+        output = self.zigator("analyze", db_filepath, out_dirpath,
+                              "--incremental")
+        self.assertRegex(output, r"Loaded the stored aggregates of "
+                                 r"[1-9]\d* tasks")
+        self.assertRegex(output, r"Stored the aggregates of \d+ tasks "
+                                 r"up to row 47")
+
+        # The output is the same as that of a complete analysis
+        full_db = self.get_path("full.db")
+        self.zigator("parse", pcap_dirpath, full_db)
+        full_dirpath = self.get_path("full")
+        self.zigator("analyze", full_db, full_dirpath)
+        self.assertSameOutput(full_dirpath, out_dirpath)
+
+        # The stored aggregates are used even without new packets
+        shutil.rmtree(out_dirpath)
+        self.zigator("analyze", db_filepath, out_dirpath, "--incremental")
+        self.assertSameOutput(full_dirpath, out_dirpath)
+
+    def test_incremental_invalidation(self):
+        """Test discarding the aggregates of modified packets."""
+        db_filepath = self.copy_database()
+        out_dirpath = self.get_path("out")
+        self.zigator("analyze", db_filepath, out_dirpath, "--incremental")
+        self.assertIn("analysis_aggregates",
+                      self.fetch_tablenames(db_filepath))
+
+        # Updating packets after the watermark preserves the aggregates
+        with Database(db_filepath) as database:
+            database.update_packets(
+                ["der_mac_srcpanid"],
+                ["0xffff"],
+                [(">rowid", 47)])
+        self.assertIn("analysis_aggregates",
+                      self.fetch_tablenames(db_filepath))
+
+        # Updating packets that were aggregated discards the aggregates
+        with Database(db_filepath) as database:
+            database.update_packets(
+                ["der_mac_srcpanid"],
+                ["0xffff"],
+                [("pkt_num", 1), ("error_msg", None)])
+        tablenames = self.fetch_tablenames(db_filepath)
+        self.assertNotIn("analysis_aggregates", tablenames)
+        self.assertNotIn("column_stats", tablenames)
+        shutil.rmtree(out_dirpath)
+        output = self.zigator("analyze", db_filepath, out_dirpath,
+                              "--incremental")
+        self.assertIn("Loaded the stored aggregates of 0 tasks", output)
+
+        # Resuming a parse that deletes packets discards the aggregates
+        db_filepath = self.copy_database()
+        self.zigator("analyze", db_filepath, out_dirpath, "--incremental")
+        connection = sqlite3.connect(db_filepath)
+        connection.execute("DELETE FROM parsed_files WHERE pcap_filename=?",
+                           (PCAP_FILENAMES[-1],))
+        connection.commit()
+        connection.close()
+        self.zigator("parse", DATA_PATH, db_filepath, "--resume")
+        shutil.rmtree(out_dirpath)
+        output = self.zigator("analyze", db_filepath, out_dirpath,
+                              "--incremental")
+        self.assertIn("Loaded the stored aggregates of 0 tasks", output)
+        self.assertSameOutput(self.out_dirpath, out_dirpath)
+
+    def test_distinct_matches(self):
+        """Test grouping the distinct matches of in-memory columns."""
+        database = Database(self.copy_database())
+        self.addCleanup(database.disconnect)
+
+        # The distinct codes of several chunks of rows are merged
+        chunk_size = column_engine.CHUNK_SIZE
+        self.addCleanup(setattr, column_engine, "CHUNK_SIZE", chunk_size)
+        column_engine.CHUNK_SIZE = 10
+        engine = column_engine.ColumnEngine(
+            database,
+            column_engine.get_required_columns(),
+            fetch_size=8)
+        self.assertEqual(engine.num_rows, 47)
+        num_matches = 0
+        for column_match in distinct_matches.COLUMN_MATCHES:
+            aggregate = distinct_matches.aggregate_task(database,
+                                                        column_match)
+            self.assertEqual(
+                distinct_matches.aggregate_task(engine, column_match),
+                aggregate,
+                column_match[0])
+            num_matches += len(aggregate)
+        self.assertGreater(num_matches, 0)
+        self.assertEqual(
+            sorted(engine.fetch_values(
+                "packets",
+                ["mac_frametype", "phy_length"],
+                [("error_msg", None)],
+                True)),
+            sorted(database.fetch_values(
+                "packets",
+                ["mac_frametype", "phy_length"],
+                [("error_msg", None)],
+                True)))
+
+    def test_shared_engine(self):
+        """Test sharing the in-memory columns with other processes."""
+        database = Database(self.copy_database())
+        self.addCleanup(database.disconnect)
+        engine = column_engine.ColumnEngine(
+            database,
+            column_engine.get_required_columns())
+        aggregates = [
+            distinct_matches.aggregate_task(engine, column_match)
+            for column_match in distinct_matches.COLUMN_MATCHES
+        ]
+        engine.share()
+        self.addCleanup(engine.unlink)
+        if column_engine.shared_memory is not None:
+            self.assertEqual(sorted(engine.blocks.keys()),
+                             sorted(engine.codes.keys()))
+
+        # Spawned processes attach to the same codes
+        other = pickle.loads(pickle.dumps(engine))
+        self.addCleanup(other.close)
+        self.assertEqual(sorted(other.codes.keys()),
+                         sorted(engine.codes.keys()))
+        for column_name in engine.codes.keys():
+            self.assertTrue(np.array_equal(other.codes[column_name],
+                                           engine.codes[column_name]))
+        self.assertEqual(
+            [
+                distinct_matches.aggregate_task(other, column_match)
+                for column_match in distinct_matches.COLUMN_MATCHES
+            ],
+            aggregates)
+
+        # Equal values of different types are decoded separately,
+        # while conditions match them as SQLite does
+        engine = column_engine.ColumnEngine(MixedDatabase(), ["mixed"])
+        self.assertEqual(
+            [(type(x), x) for x in engine.values["mixed"]],
+            [(int, 1), (float, 1.0), (str, "1"), (type(None), None)])
+        self.assertEqual(
+            engine.matching_frequency("packets", [("mixed", 1)]), 3)
+        self.assertEqual(
+            engine.matching_frequency("packets", [("!mixed", 1.0)]), 1)
+        self.assertEqual(
+            engine.grouped_count("packets", ["mixed"], True),
+            [(1, 2), (1.0, 1), ("1", 1), (None, 1)])
+
+    def test_zcl_attributes(self):
+        """Test extracting the reported ZCL attributes while parsing."""
+        db_filepath = self.parse_ias_data()
+        self.assertEqual(
+            self.fetch_rows(
+                db_filepath,
+                "SELECT cluster_id, attribute_id, datatype, COUNT(*) "
+                "FROM zcl_attributes GROUP BY cluster_id, attribute_id"),
+            [
+                ("0x0001: Power Configuration", "0x0021",
+                 "0x20: Unsigned 8-bit integer", 18),
+                ("0x0500: IAS Zone", "0x0002", "0x19: 16-bit bitmap", 9),
+            ])
+
+        # Each attribute refers to the packet that reported it
+        self.assertEqual(
+            self.fetch_rows(
+                db_filepath,
+                "SELECT COUNT(*) FROM zcl_attributes JOIN packets "
+                "ON packets.rowid=zcl_attributes.pkt_rowid "
+                "WHERE packets.aps_cluster_id=zcl_attributes.cluster_id"),
+            [(27,)])
+        self.assertEqual(
+            self.fetch_rows(
+                db_filepath,
+                "SELECT pkt_rowid, value FROM zcl_attributes "
+                "ORDER BY pkt_rowid LIMIT 2"),
+            [(1, "0xc8"), (3, "0xc6")])
+
+        # The battery analysis methods examine the extracted attributes
+        out_dirpath = self.get_path("out")
+        self.zigator("analyze", db_filepath, out_dirpath, "--methods",
+                     "battery-percentages", "battery-statuses")
+        output_files = self.read_output(out_dirpath)
+        self.assertEqual(sorted(output_files.keys()), IAS_FILEPATHS)
+        self.assertEqual(
+            output_files[IAS_FILEPATHS[0]],
+            "1600000007.0\t100.0\n"
+            "1600000049.0\t95.0\n"
+            "1600000091.0\t90.0\n"
+            "1600000133.0\t85.0\n"
+            "1600000175.0\t80.0\n"
+            "1600000217.0\t75.0\n")
+        self.assertEqual(
+            output_files[IAS_FILEPATHS[3]],
+            "1600000014.0\t0\n"
+            "1600000056.0\t0\n"
+            "1600000098.0\t0\n"
+            "1600000140.0\t1\n"
+            "1600000182.0\t1\n"
+            "1600000224.0\t1\n")
+
+    def test_legacy_measurements(self):
+        """Test extracting the same measurements as the attribute lists."""
+        db_filepath = self.parse_ias_data()
+        connection = sqlite3.connect(db_filepath)
+        for (rowid, values) in [
+            # Only the first reported attribute of a packet is examined
+            (13, {
+                "zcl_reportattributes_identifiers": "0x0021,0x0021",
+                "zcl_reportattributes_datatypes":
+                    "0x20: Unsigned 8-bit integer,"
+                    "0x20: Unsigned 8-bit integer",
+                "zcl_reportattributes_data": "0xb4,0x10",
+            }),
+            (19, {
+                "zcl_readattributesresponse_identifiers": "0x0021,0x0021",
+                "zcl_readattributesresponse_statuses":
+                    "0x86: UNSUPPORTED_ATTRIBUTE,0x00: SUCCESS",
+                "zcl_readattributesresponse_datatypes":
+                    "0x20: Unsigned 8-bit integer,"
+                    "0x20: Unsigned 8-bit integer",
+                "zcl_readattributesresponse_values": "0x00,0x20",
+            }),
+            # Attribute lists of different lengths are ignored
+            (31, {"zcl_readattributesresponse_identifiers": "0x0021,0x0020"}),
+            # Equal timestamps are sorted by command and then by packet
+            (1, {"pkt_time": 1600000049.0}),
+            (8, {"pkt_time": 1600000140.0}),
+            (14, {"pkt_time": 1600000140.0}),
+        ]:
+            connection.execute(
+                "UPDATE packets SET {} WHERE rowid=?".format(
+                    ", ".join("{}=?".format(x) for x in values.keys())),
+                tuple(values.values()) + (rowid,))
+        connection.execute("DROP TABLE zcl_attributes")
+        connection.commit()
+        connection.close()
+        database = Database(db_filepath)
+        self.addCleanup(database.disconnect)
+        with self.assertLogs(level="WARNING") as cm:
+            database.extract_zcl_attributes()
+        self.assertEqual(
+            cm.output,
+            ["WARNING:root:Invalid ZCL Read Attributes Response entries"])
+
+        # The order of the reported attributes does not matter
+        database.cursor.execute("CREATE TEMP TABLE reversed_attributes AS "
+                                "SELECT * FROM zcl_attributes "
+                                "ORDER BY rowid DESC")
+        database.cursor.execute("DELETE FROM zcl_attributes")
+        database.cursor.execute("INSERT INTO zcl_attributes "
+                                "SELECT * FROM reversed_attributes")
+        database.commit()
+
+        out_dirpath = self.get_path("out")
+        expected_dirpath = self.get_path("expected")
+        os.makedirs(out_dirpath)
+        os.makedirs(expected_dirpath)
+        battery_percentages.extract_measurements(database, out_dirpath)
+        battery_statuses.extract_measurements(database, out_dirpath)
+        write_legacy_measurements(
+            extract_legacy_measurements(
+                database,
+                "0x0001: Power Configuration",
+                "0x0021",
+                "0x20: Unsigned 8-bit integer",
+                ["0x01: Read Attributes Response", "0x0a: Report Attributes"],
+                lambda x: "{:.1f}".format(int(x, 16) / 2.0)),
+            os.path.join(expected_dirpath, "battery-percentages-{}.tsv"))
+        measurements = extract_legacy_measurements(
+            database,
+            "0x0500: IAS Zone",
+            "0x0002",
+            "0x19: 16-bit bitmap",
+            ["0x01: Read Attributes Response"],
+            battery_statuses.get_battery_status)
+        for (pkt_time, srcextendedaddr, zone_status) in database.fetch_values(
+                "packets",
+                ["pkt_time", "der_nwk_srcextendedaddr",
+                 "zcl_iaszone_zonestatuschangenotif_zonestatus"],
+                battery_statuses.DEVICE_CONDITIONS + [
+                    ("zcl_cmd_id", "0x00: Zone Status Change Notification"),
+                ],
+                False):
+            measurements.setdefault(srcextendedaddr, []).append(
+                (pkt_time, battery_statuses.get_battery_status(zone_status)))
+        write_legacy_measurements(
+            measurements,
+            os.path.join(expected_dirpath, "battery-statuses-{}.tsv"))
+        self.assertSameOutput(expected_dirpath, out_dirpath)
+        output_files = self.read_output(out_dirpath)
+        self.assertTrue(output_files["battery-percentages-{}.tsv".format(
+            "00124b0000000001")].startswith(
+                "1600000049.0\t95.0\n"
+                "1600000049.0\t100.0\n"
+                "1600000091.0\t90.0\n"
+                "1600000175.0\t80.0\n"))
+
+    def test_approximate_analysis(self):
+        """Test approximating the results within their error bounds."""
+        out_dirpath = self.get_path("out")
+        self.zigator("analyze", self.copy_database(), out_dirpath,
+                     "--approx")
+        approx_files = self.read_output(out_dirpath)
+        exact_files = self.read_output(self.out_dirpath)
+        self.assertGreater(len(approx_files), 0)
+        for filepath in approx_files.keys():
+            approx_results = self.read_results(approx_files[filepath])
+            exact_results = self.read_results(exact_files[filepath])
+            self.assertEqual(sorted(approx_results.keys()),
+                             sorted(exact_results.keys()),
+                             filepath)
+            for (key, approx_result) in approx_results.items():
+                match = re.fullmatch(r"(\d+) \(\+/- (\d+)\)",
+                                     approx_result)
+                self.assertIsNotNone(match, filepath)
+                estimate, error = int(match.group(1)), int(match.group(2))
+                if filepath.startswith("distinct-matches"):
+                    # The error of the distinct matches is a standard error
+                    exact = len(ast.literal_eval(exact_results[key]))
+                    self.assertLessEqual(abs(estimate - exact), 3 * error,
+                                         filepath)
+                else:
+                    exact = int(exact_results[key])
+                    self.assertGreaterEqual(estimate, exact, filepath)
+                    self.assertLessEqual(estimate, exact + error, filepath)
+
+    def test_sketches(self):
+        """Test the error bounds of the streaming sketches."""
+        sketch = CountMinSketch(0.01, 0.01)
+        counts = {hash_values((i,)): i % 7 + 1 for i in range(2000)}
+        for (hashed, count) in counts.items():
+            sketch.update(hashed, count)
+        self.assertEqual(sketch.total, sum(counts.values()))
+        num_exceeded = 0
+        for (hashed, count) in counts.items():
+            estimate = sketch.estimate(hashed)
+            self.assertGreaterEqual(estimate, count)
+            if estimate > count + sketch.get_error():
+                num_exceeded += 1
+        self.assertLessEqual(num_exceeded, 0.01 * len(counts))
+
+        sketch = HyperLogLog(0.02)
+        for i in range(20000):
+            sketch.add(hash_values((i % 10000,)))
+        self.assertLessEqual(abs(sketch.count() - 10000),
+                             3 * sketch.get_error())
+
+        # Updating the sketches with arrays of hashes is the same as
+        # updating them with each hash separately
+        hashes = np.array([hash_values((i,)) for i in range(2000)],
+                          dtype=np.uint64)
+        counts = np.arange(2000) % 7 + 1
+        sketch = CountMinSketch(0.01, 0.01)
+        other = CountMinSketch(0.01, 0.01)
+        sketch.update_many(hashes, counts)
+        for (hashed, count) in zip(hashes.tolist(), counts.tolist()):
+            other.update(hashed, count)
+        self.assertTrue(np.array_equal(sketch.table, other.table))
+        self.assertEqual(sketch.total, other.total)
+        self.assertEqual(
+            sketch.estimate_many(hashes).tolist(),
+            [other.estimate(hashed) for hashed in hashes.tolist()])
+        sketch = HyperLogLog(0.02)
+        other = HyperLogLog(0.02)
+        sketch.add_many(hashes)
+        for hashed in hashes.tolist():
+            other.add(hashed)
+        self.assertTrue(np.array_equal(sketch.registers, other.registers))
+
+        # The errors of the sketches should be between 0 and 1
+        for (sketch_class, args) in [
+            (CountMinSketch, (0, 0.01)),
+            (CountMinSketch, (0.01, 1)),
+            (HyperLogLog, (1.5,)),
+        ]:
+            with self.assertRaises(ValueError):
+                sketch_class(*args)
+
+    def test_task_sketch(self):
+        """Test the distinct matches of evicted candidates."""
+        sketch = TaskSketch(["var"], ["mat"], [], 0.5, 0.01, 0.1)
+        for chunk in [
+            [("x", i) for i in range(10)],
+            [("y{}".format(i), 0) for i in range(4) for _ in range(20)],
+            [("x", i % 10 + 10) for i in range(100)],
+        ]:
+            columns = {
+                "var": encode_values([row[0] for row in chunk]),
+                "mat": encode_values([row[1] for row in chunk]),
+            }
+            hashes = {
+                column_name: hash_column(*columns[column_name])
+                for column_name in columns.keys()
+            }
+            sketch.update(columns, hashes, np.ones(len(chunk), dtype=bool))
+            if chunk[0][0] == "y0":
+                self.assertNotIn(("x",), sketch.candidates.values())
+
+        # The matches of the evicted candidate are still counted
+        match = re.fullmatch(r"(\d+) \(\+/- (\d+)\)",
+                             sketch.get_distinct_matches()[("x",)])
+        self.assertLessEqual(abs(int(match.group(1)) - 20),
+                             3 * int(match.group(2)))
+
+        # Equal values of different types are counted separately
+        distinct_values, codes = encode_values([1, 1.0, True, 1, None])
+        self.assertEqual([type(x) for x in distinct_values],
+                         [int, float, bool, type(None)])
+        self.assertEqual(codes.tolist(), [0, 1, 2, 0, 3])
+
+    def test_solo_frequencies(self):
+        """Test counting the values of each column in a separate task."""
+        db_filepath = self.copy_database()
+        database = Database(db_filepath)
+        self.addCleanup(database.disconnect)
+        self.assertEqual(
+            scheduler.METHODS["solo-frequencies"][0],
+            [[column_name]
+             for column_name in solo_frequencies.INSPECTED_COLUMNS])
+        self.assertGreater(len(database.load_column_stats()), 0)
+        aggregate = solo_frequencies.aggregate_task(
+            database,
+            solo_frequencies.INSPECTED_COLUMNS)
+        for column_name in ["error_msg", "mac_frametype", "nwk_cmd_id"]:
+            conditions = "" if column_name == "error_msg" else (
+                " WHERE error_msg IS NULL")
+            for (value, count) in self.fetch_rows(
+                    db_filepath,
+                    "SELECT {0}, COUNT(*) FROM packets{1} GROUP BY {0}"
+                    "".format(column_name, conditions)):
+                self.assertEqual(aggregate[(column_name, value)], count)
+
+        # The grouped counts of the columns are the same as the stored
+        # statistics of the columns
+        database.discard_aggregates()
+        database.commit()
+        self.assertEqual(database.load_column_stats(), {})
+        self.assertEqual(
+            solo_frequencies.aggregate_task(
+                database,
+                solo_frequencies.INSPECTED_COLUMNS),
+            aggregate)
+
+        out_dirpath = self.get_path("out")
+        self.zigator("analyze", db_filepath, out_dirpath, "--methods",
+                     "solo-frequencies")
+        self.assertSameOutput(
+            os.path.join(self.out_dirpath, "solo-frequencies"),
+            os.path.join(out_dirpath, "solo-frequencies"))
+
+    def test_field_values(self):
+        """Test tracking the distinct values of each column separately."""
+        database = Database(self.copy_database())
+        self.addCleanup(database.disconnect)
+        engine = column_engine.ColumnEngine(
+            database,
+            field_values.INSPECTED_COLUMNS)
+        num_values = 0
+        for packet_type in field_values.PACKET_TYPES:
+            aggregate = field_values.aggregate_task(database, packet_type)
+            self.assertEqual(
+                field_values.aggregate_task(engine, packet_type),
+                aggregate,
+                packet_type[0])
+
+            # The counts of each column are the same as the counts of
+            # its distinct values
+            for column_name in ["mac_frametype", "nwk_cmd_id",
+                                "aps_cluster_id"]:
+                self.assertEqual(
+                    {
+                        (column_name,) + var_value: count
+                        for (var_value, count) in self.count_each_value(
+                            database,
+                            [column_name],
+                            packet_type[1]).items()
+                    },
+                    {
+                        key: aggregate[key] for key in aggregate.keys()
+                        if key[0] == column_name
+                    },
+                    packet_type[0])
+
+            num_values += len(aggregate)
+        self.assertGreater(num_values, 0)
+
+    def test_column_stats(self):
+        """Test the statistics of the columns that were parsed."""
+        database = Database(self.copy_database())
+        self.addCleanup(database.disconnect)
+        stats = database.load_column_stats()
+        for column_name in ["error_msg", "phy_length", "mac_frametype",
+                            "nwk_cmd_id", "der_mac_srcpanid"]:
+            conditions = "" if column_name == "error_msg" else (
+                " WHERE error_msg IS NULL")
+            [(num_rows, num_values, distinct_count, min_value,
+              max_value)] = self.fetch_rows(
+                self.db_filepath,
+                "SELECT COUNT(*), COUNT({0}), COUNT(DISTINCT {0}), "
+                "MIN({0}), MAX({0}) FROM packets{1}"
+                "".format(column_name, conditions))
+            value_counts = self.fetch_rows(
+                self.db_filepath,
+                "SELECT {0}, COUNT(*) FROM packets{1} GROUP BY {0} "
+                "HAVING {0} IS NOT NULL".format(column_name, conditions))
+            self.assertEqual(
+                stats[column_name][:5],
+                (num_rows, num_rows - num_values, distinct_count, min_value,
+                 max_value),
+                column_name)
+            self.assertEqual(
+                sorted(stats[column_name][5], key=lambda x: str(x[0])),
+                sorted(value_counts, key=lambda x: str(x[0])),
+                column_name)
+            self.assertEqual(stats[column_name][6], 0)
+
+    def test_column_summary(self):
+        """Test bounding the statistics of columns with many values."""
+        max_top_values = column_stats.MAX_TOP_VALUES
+        self.addCleanup(setattr, column_stats, "MAX_TOP_VALUES",
+                        max_top_values)
+        column_stats.MAX_TOP_VALUES = 5
+        summary = column_stats.ColumnSummary()
+        counts = {i: 1 for i in range(100)}
+        counts.update({i: 50 - i for i in range(5)})
+        values = [value for value in counts.keys()
+                  for _ in range(counts[value])]
+        for start in range(0, len(values), 16):
+            summary.update(values[start:start + 16] + [None])
+        (num_rows, null_count, distinct_count, min_value, max_value,
+         top_values, top_error) = summary.get_stats()
+        self.assertEqual(num_rows, len(values) + null_count)
+        self.assertEqual(null_count, (len(values) + 15) // 16)
+        self.assertAlmostEqual(distinct_count, 100, delta=5)
+        self.assertEqual((min_value, max_value), (0, 99))
+
+        # The counts of the most frequent values are underestimated
+        # by at most the reported error
+        self.assertGreater(top_error, 0)
+        self.assertLessEqual(len(top_values), 5)
+        self.assertEqual([x[0] for x in top_values], [0, 1, 2, 3, 4])
+        for (value, count) in top_values:
+            self.assertLessEqual(count, counts[value])
+            self.assertGreaterEqual(count, counts[value] - top_error)
+
+    def test_partitioned_layout(self):
+        """Test analyzing packets that are partitioned by layer."""
+        db_filepath = self.parse_layout("--partitioned")
+        tablenames = self.fetch_tablenames(db_filepath)
+        self.assertIn("packets_core", tablenames)
+        self.assertNotIn("packets", tablenames)
+        self.assertEqual(
+            self.fetch_rows(db_filepath,
+                            "SELECT * FROM packets ORDER BY rowid"),
+            self.fetch_rows(self.db_filepath,
+                            "SELECT * FROM packets ORDER BY rowid"))
+
+        # Each partition stores only the fields of its packets
+        self.assertLess(
+            self.fetch_rows(db_filepath,
+                            "SELECT COUNT(*) FROM packets_nwk")[0][0],
+            47)
+
+    def test_compressed_layout(self):
+        """Test analyzing packets whose large columns are compressed."""
+        db_filepath = self.parse_layout("--partitioned", "--compressed")
+        for column_name in ["mac_show", "nwk_aux_decshow"]:
+            [(compressed_size, blob_rows)] = self.fetch_rows(
+                db_filepath,
+                "SELECT SUM(LENGTH({0})), SUM(TYPEOF({0})=\"blob\") "
+                "FROM packets_blobs".format(column_name))
+            [(text_size, text_rows)] = self.fetch_rows(
+                self.db_filepath,
+                "SELECT SUM(LENGTH({0})), COUNT({0}) FROM packets"
+                "".format(column_name))
+            self.assertLess(compressed_size, text_size)
+            self.assertEqual(blob_rows, text_rows)
+
+    def test_lazy_layout(self):
+        """Test analyzing packets whose frames are dissected on demand."""
+        db_filepath = self.parse_layout("--partitioned", "--lazy")
+        self.assertEqual(
+            sorted(x for x in self.fetch_tablenames(db_filepath)
+                   if x.startswith("packets_")),
+            ["packets_core", "packets_frames"])
+        database = Database(db_filepath)
+        self.addCleanup(database.disconnect)
+        self.assertEqual(
+            database.matching_frequency(
+                "packets",
+                [("mac_srcaddrmode", "0b11: Extended source MAC address")]),
+            5)
+        with self.assertRaises(ValueError):
+            database.update_packets(["mac_srcaddrmode"], [None], [])
+
+        # The frames are decrypted with the keys that were used while
+        # parsing them, even if they are no longer configured
+        env = dict(self.env, HOME=self.get_path("home"))
+        os.makedirs(env["HOME"])
+        out_dirpath = self.get_path("unconfigured")
+        returncode, output = run_zigator(env, "analyze", db_filepath,
+                                         out_dirpath)
+        self.assertEqual(returncode, 0, output)
+        self.assertSameOutput(self.out_dirpath, out_dirpath)
+
+    def test_query_cache(self):
+        """Test storing the results of queries in a sidecar file."""
+        cache_filepath = self.get_path("test.db" + CACHE_SUFFIX)
+        fingerprint = [(47, 0)]
+        query_cache = QueryCache(cache_filepath, lambda: fingerprint[0],
+                                 max_size=100)
+        self.assertIsNone(query_cache.get("SELECT 1", ()))
+        query_cache.put("SELECT 1", (), [(1, None, "a")])
+        self.assertEqual(query_cache.get("SELECT 1", ()), [(1, None, "a")])
+        self.assertIsNone(query_cache.get("SELECT 1", (2,)))
+        self.assertEqual((query_cache.hits, query_cache.misses), (1, 2))
+
+        # The least recently used results are evicted first
+        query_cache.put("SELECT 2", (), ["b" * 30])
+        time.sleep(0.01)
+        self.assertIsNotNone(query_cache.get("SELECT 1", ()))
+        query_cache.put("SELECT 3", (), ["c" * 30])
+        self.assertIsNotNone(query_cache.get("SELECT 1", ()))
+        self.assertIsNone(query_cache.get("SELECT 2", ()))
+        self.assertIsNotNone(query_cache.get("SELECT 3", ()))
+
+        # Results that exceed the maximum size are not stored
+        query_cache.put("SELECT 4", (), ["d" * 100])
+        self.assertIsNone(query_cache.get("SELECT 4", ()))
+        query_cache.close()
+
+        # The results are discarded when the fingerprint changes
+        query_cache = QueryCache(cache_filepath, lambda: (47, 0),
+                                 max_size=100)
+        self.assertIsNotNone(query_cache.get("SELECT 1", ()))
+        query_cache.close()
+        query_cache = QueryCache(cache_filepath, lambda: fingerprint[0],
+                                 max_size=100)
+        self.assertIsNotNone(query_cache.get("SELECT 1", ()))
+        fingerprint[0] = (47, 1)
+        self.assertIsNone(query_cache.get("SELECT 1", ()))
+        query_cache.close()
+
+        # The fingerprint of a database follows the writes of any
+        # connection after it was connected
+        db_filepath = self.copy_database()
+        database = Database(db_filepath)
+        self.addCleanup(database.disconnect)
+        fingerprint = database.get_fingerprint()
+        num_modifications = fingerprint[1]
+        self.assertEqual(fingerprint[0], 47)
+        self.assertIs(database.get_fingerprint(), fingerprint)
+        connection = sqlite3.connect(db_filepath)
+        connection.execute("INSERT INTO packets "
+                           "SELECT * FROM packets WHERE rowid=1")
+        connection.commit()
+        connection.close()
+        self.assertEqual(database.get_fingerprint(),
+                         (48, num_modifications))
+        database.update_packets(
+            ["der_mac_srcpanid"],
+            ["0xffff"],
+            [("rowid", 48)])
+        self.assertEqual(database.get_fingerprint(),
+                         (48, num_modifications + 1))
+
+    def test_cached_analysis(self):
+        """Test reusing the results of the queries of an analysis."""
+        db_filepath = self.copy_database()
+        out_dirpath = self.get_path("out")
+        self.zigator("analyze", db_filepath, out_dirpath, "--query_cache")
+        self.assertSameOutput(self.out_dirpath, out_dirpath)
+        cache_command = "SELECT COUNT(*) FROM results"
+        [(num_results,)] = self.fetch_rows(db_filepath + CACHE_SUFFIX,
+                                           cache_command)
+        self.assertGreater(num_results, 0)
+
+        # The cached results are used while the database is not modified
+        shutil.rmtree(out_dirpath)
+        self.zigator("analyze", db_filepath, out_dirpath, "--query_cache")
+        self.assertSameOutput(self.out_dirpath, out_dirpath)
+        self.assertEqual(
+            self.fetch_rows(db_filepath + CACHE_SUFFIX, cache_command),
+            [(num_results,)])
+
+        # The cached results of modified packets are not used
+        with Database(db_filepath) as database:
+            database.update_packets(
+                ["der_mac_srcpanid"],
+                ["0xffff"],
+                [("error_msg", None), ("mac_frametype", "0b000: MAC Beacon")])
+        shutil.rmtree(out_dirpath)
+        self.zigator("analyze", db_filepath, out_dirpath, "--query_cache")
+        expected_dirpath = self.get_path("expected")
+        self.zigator("analyze", db_filepath, expected_dirpath)
+        self.assertSameOutput(expected_dirpath, out_dirpath)
+        self.assertNotEqual(self.read_output(self.out_dirpath),
+                            self.read_output(out_dirpath))
+
+    def test_other_databases(self):
+        """Test merging the analysis results of multiple databases."""
+        first_db = self.copy_database("first.db", "rowid<=23")
+        second_db = self.copy_database("second.db", "rowid>23")
+        out_dirpath = self.get_path("out")
+        output = self.zigator("analyze", first_db, out_dirpath,
+                              "--other_databases", second_db,
+                              "--num_workers", "2")
+        self.assertIn("Analyzing traffic stored in 2 databases", output)
+        self.assertSameOutput(self.out_dirpath, out_dirpath)
+
+        # Methods whose results cannot be merged are rejected
+        output = self.zigator("analyze", first_db, out_dirpath,
+                              "--other_databases", second_db,
+                              "--methods", "battery-statuses",
+                              returncode=1)
+        self.assertIn("cannot be merged", output)
+
+    def test_packet_filters(self):
+        """Test analyzing the packets of a time range and a PAN ID."""
+        db_filepath = self.copy_database()
+        out_dirpath = self.get_path("out")
+        self.zigator("analyze", db_filepath, out_dirpath,
+                     "--since", "1599996417", "--until", "2020-09-13T11:35:29",
+                     "--panid", "7777")
+        expected_db = self.copy_database(
+            "expected.db",
+            "(der_mac_srcpanid=\"0x7777\" OR der_mac_dstpanid=\"0x7777\") "
+            "AND pkt_time>=1599996417 AND pkt_time<1599996929")
+        expected_dirpath = self.get_path("expected")
+        self.zigator("analyze", expected_db, expected_dirpath)
+        self.assertSameOutput(expected_dirpath, out_dirpath)
+
+        # The PAN ID matches either the source or the destination PAN ID,
+        # whose indexes are combined
+        filter_command = (
+            "SELECT COUNT(*) FROM packets "
+            "WHERE (der_mac_srcpanid=\"0x99aa\" "
+            "OR der_mac_dstpanid=\"0x99aa\") "
+            "AND pkt_time>=1599995905")
+        self.assertEqual(self.fetch_rows(db_filepath, filter_command),
+                         [(2,)])
+        self.assertIn(
+            "MULTI-INDEX OR",
+            str(self.fetch_rows(db_filepath,
+                                "EXPLAIN QUERY PLAN " + filter_command)))
+        out_dirpath = self.get_path("either")
+        self.zigator("analyze", db_filepath, out_dirpath, "--since",
+                     "1599995905", "--panid", "99aa")
+        expected_db = self.copy_database(
+            "either.db",
+            "der_mac_srcpanid=\"0x99aa\" OR der_mac_dstpanid=\"0x99aa\"")
+        expected_dirpath = self.get_path("expected-either")
+        self.zigator("analyze", expected_db, expected_dirpath)
+        self.assertSameOutput(expected_dirpath, out_dirpath)
+
+        output = self.zigator("analyze", self.copy_database(), out_dirpath,
+                              "--panid", "0x10000", returncode=1)
+        self.assertIn("Invalid PAN ID", output)
+
+    def test_time_buckets(self):
+        """Test analyzing the packets of each interval separately."""
+        db_filepath = self.copy_database()
+        out_dirpath = self.get_path("hour")
+        self.zigator("analyze", db_filepath, out_dirpath, "--bucket", "hour")
+        self.assertEqual(os.listdir(out_dirpath), ["20200913T110000Z"])
+        self.assertSameOutput(
+            self.out_dirpath,
+            os.path.join(out_dirpath, "20200913T110000Z"))
+
+        # The frequencies of all the intervals add up to the total ones
+        out_dirpath = self.get_path("minute")
+        self.zigator("analyze", db_filepath, out_dirpath, "--bucket",
+                     "minute")
+        bucket_dirnames = sorted(os.listdir(out_dirpath))
+        self.assertEqual(len(bucket_dirnames), 9)
+        self.assertEqual(bucket_dirnames[0], "20200913T111800Z")
+        for method_name in ["matching-frequencies", "group-frequencies"]:
+            expected_files = self.read_output(
+                os.path.join(self.out_dirpath, method_name))
+            for filepath in expected_files.keys():
+                frequencies = {}
+                for bucket_dirname in bucket_dirnames:
+                    bucket_filepath = os.path.join(
+                        out_dirpath,
+                        bucket_dirname,
+                        method_name,
+                        filepath)
+                    with open(bucket_filepath) as fp:
+                        results = self.read_results(fp.read())
+                    for (key, count) in results.items():
+                        frequencies[key] = frequencies.get(key, 0) + int(
+                            count)
+                self.assertEqual(
+                    frequencies,
+                    {
+                        key: int(count) for (key, count) in
+                        self.read_results(expected_files[filepath]).items()
+                    },
+                    filepath)
+
+    def test_battery_shards(self):
+        """Test sharding the battery analyses by device."""
+        db_filepath = self.parse_ias_data()
+        database = Database(db_filepath)
+        self.addCleanup(database.disconnect)
+        for (conditions, devices) in [
+            (battery_percentages.DEVICE_CONDITIONS,
+             ["00124b0000000001", "00124b0000000003"]),
+            (battery_statuses.DEVICE_CONDITIONS,
+             ["00124b0000000002", "00124b0000000004"]),
+        ]:
+            for num_shards in [1, 2, 3]:
+                shards = shard_devices(database, conditions, num_shards)
+                self.assertEqual(len(shards), min(num_shards, 2) + 1)
+
+                # Each packet is examined by exactly one shard
+                self.assertEqual(
+                    sum(database.matching_frequency(
+                        "packets",
+                        conditions + shard) for shard in shards),
+                    database.matching_frequency("packets", conditions))
+                for device in devices + [None]:
+                    self.assertEqual(
+                        [shard for shard in shards
+                         if database.matching_frequency(
+                             "packets",
+                             conditions + shard
+                             + [("der_nwk_srcextendedaddr", device)]) > 0],
+                        [shards[0]] if device is None else [
+                            shards[min(devices.index(device) + 1,
+                                       len(shards) - 1)]
+                        ])
+
+        # The output of several workers is the same as that of one worker
+        out_dirpaths = []
+        for num_workers in ["1", "3"]:
+            out_dirpaths.append(self.get_path("out" + num_workers))
+            self.zigator("analyze", db_filepath, out_dirpaths[-1],
+                         "--methods", "battery-percentages",
+                         "battery-statuses", "--num_workers", num_workers)
+        self.assertEqual(sorted(self.read_output(out_dirpaths[0]).keys()),
+                         IAS_FILEPATHS)
+        self.assertSameOutput(out_dirpaths[0], out_dirpaths[1])
+
+    def get_path(self, filename):
+        return os.path.join(self.tmp_dir.name, filename)
+
+    def copy_database(self, filename="test.db", where_clause=None):
+        db_filepath = self.get_path(filename)
+        shutil.copyfile(self.db_filepath, db_filepath)
+
+        # Keep only the packets that satisfy the provided clause, if any,
+        # along with statistics that cover only them
+        if where_clause is not None:
+            connection = sqlite3.connect(db_filepath)
+            connection.execute("DELETE FROM packets WHERE NOT COALESCE"
+                               "(({}), 0)".format(where_clause))
+            connection.execute("DROP TABLE column_stats")
+            connection.commit()
+            connection.close()
+        return db_filepath
+
+    def parse_ias_data(self):
+        db_filepath = self.get_path("ias.db")
+        self.zigator("parse", IAS_DATA_PATH, db_filepath)
+        return db_filepath
+
+    def parse_layout(self, *args):
+        # The packets of the test data are the same in every layout
+        db_filepath = self.get_path("layout.db")
+        self.zigator("parse", DATA_PATH, db_filepath, *args)
+        database = Database(db_filepath)
+        self.addCleanup(database.disconnect)
+        self.assertTrue(database.partitioned)
+        self.assertEqual(database.compressed, "--compressed" in args)
+        self.assertEqual(database.lazy, "--lazy" in args)
+        flat_database = Database(self.db_filepath)
+        self.addCleanup(flat_database.disconnect)
+        self.assertEqual(
+            database.fetch_values("packets", PKT_COLUMN_NAMES, None, False),
+            flat_database.fetch_values(
+                "packets",
+                PKT_COLUMN_NAMES,
+                None,
+                False))
+        for tablename in ["networks", "short_addresses",
+                          "extended_addresses", "pairs"]:
+            command = "SELECT * FROM {}".format(tablename)
+            self.assertEqual(
+                sorted(self.fetch_rows(db_filepath, command), key=repr),
+                sorted(self.fetch_rows(self.db_filepath, command), key=repr))
+
+        # The output of the analysis is the same as that of the flat layout
+        out_dirpath = self.get_path("out")
+        self.zigator("analyze", db_filepath, out_dirpath)
+        self.assertSameOutput(self.out_dirpath, out_dirpath)
+        return db_filepath
+
+    def zigator(self, *args, returncode=0):
+        obtained_returncode, output = run_zigator(self.env, *args)
+        self.assertEqual(obtained_returncode, returncode, output)
+        return output
+
+    def fetch_indexnames(self, db_filepath):
+        return [
+            row[0] for row in self.fetch_rows(
+                db_filepath,
+                "SELECT name FROM sqlite_master WHERE type=\"index\" "
+                "ORDER BY name")
+            if row[0].startswith(INDEX_PREFIX)
+        ]
+
+    def count_each_value(self, database, var_columns, conditions):
+        # Count the matching packets of each distinct value separately
+        counts = {}
+        for var_value in database.fetch_values(
+                "packets",
+                var_columns,
+                conditions,
+                True):
+            var_conditions = list(conditions) + list(zip(var_columns,
+                                                         var_value))
+            counts[var_value] = database.matching_frequency("packets",
+                                                            var_conditions)
+        return counts
+
+    def fetch_tablenames(self, db_filepath):
+        return [
+            row[0] for row in self.fetch_rows(
+                db_filepath,
+                "SELECT name FROM sqlite_master WHERE type=\"table\"")
+        ]
+
+    def fetch_rows(self, db_filepath, command):
+        connection = sqlite3.connect(db_filepath)
+        rows = connection.execute(command).fetchall()
+        connection.close()
+        return rows
+
+    def read_output(self, out_dirpath):
+        # Map the relative path of each output file to its contents
+        output_files = {}
+        for (dirpath, _, filenames) in os.walk(out_dirpath):
+            for filename in filenames:
+                filepath = os.path.join(dirpath, filename)
+                with open(filepath) as fp:
+                    output_files[os.path.relpath(filepath, out_dirpath)] = (
+                        fp.read()
+                    )
+        return output_files
+
+    def read_results(self, contents):
+        # Map the values of each line of an output file to their result
+        return dict(
+            line.rsplit("\t", 1) for line in contents.splitlines()
+        )
+
+    def assertSameOutput(self, expected_dirpath, obtained_dirpath):
+        expected_files = self.read_output(expected_dirpath)
+        self.assertGreater(len(expected_files), 0)
+        obtained_files = self.read_output(obtained_dirpath)
+        self.assertEqual(sorted(obtained_files.keys()),
+                         sorted(expected_files.keys()))
+        for filepath in expected_files.keys():
+            self.assertEqual(obtained_files[filepath],
+                             expected_files[filepath],
+                             filepath)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -34,6 +34,7 @@ class TestIntegration(unittest.TestCase):
         self.assertPrintConfig()
         self.assertAddConfigEntry()
         self.assertParse()
+        self.assertResume()
         self.assertRmConfigEntry()
         self.assertPrintConfig()
 
@@ -236,17 +237,54 @@ class TestIntegration(unittest.TestCase):
             "ORDER BY name")
         self.assertEqual(
             cursor.fetchall(), [
+                ("column_stats",),
                 ("extended_addresses",),
                 ("networks",),
                 ("packets",),
                 ("pairs",),
+                ("parsed_files",),
+                ("parsing_state",),
                 ("short_addresses",),
+                ("sqlite_stat1",),
+                ("zcl_attributes",),
             ])
         self.assertExtendedAddressesTable(cursor)
         self.assertNetworksTable(cursor)
         self.assertPacketsTable(cursor)
         self.assertPairsTable(cursor)
         self.assertShortAddresses(cursor)
+        cursor.execute("SELECT COUNT(*) FROM parsed_files")
+        self.assertEqual(cursor.fetchall(), [(8,)])
+        cursor.close()
+        connection.close()
+
+    def assertResume(self):
+        pcap_directory = os.path.join(DIR_PATH, "data")
+        db_filepath = os.path.join(DIR_PATH, "info-logging.db")
+        with self.assertLogs(level="INFO") as cm:
+            zigator.main([
+                "zigator",
+                "parse",
+                pcap_directory,
+                db_filepath,
+                "--resume",
+            ])
+        self.assertTrue(re.search(
+            r"^INFO:root:Resuming the parsing process after 8 completed "
+            r"pcap files and 0 discarded packets$",
+            cm.output[1]) is not None)
+        self.assertTrue(re.search(
+            r"^INFO:root:Skipping 8 pcap files that were already parsed$",
+            cm.output[3]) is not None)
+
+        connection = sqlite3.connect(db_filepath)
+        connection.text_factory = str
+        cursor = connection.cursor()
+        self.assertExtendedAddressesTable(cursor)
+        self.assertNetworksTable(cursor)
+        self.assertPacketsTable(cursor)
+        self.assertPairsTable(cursor)
+        self.assertShortAddresses(cursor)
         cursor.close()
         connection.close()
 
@@ -306,7 +344,7 @@ class TestIntegration(unittest.TestCase):
             cm.output[1]) is not None)
 
     def assertLoggingOutput(self, cm):
-        self.assertEqual(len(cm.output), 44)
+        self.assertEqual(len(cm.output), 46)
 
         self.assertTrue(re.search(
             r"^INFO:root:Started Zigator version "
@@ -472,6 +510,14 @@ class TestIntegration(unittest.TestCase):
             r"^WARNING:root:Generated 1 \""
             r"There are no MAC Association Request fields\" parsing errors$",
             cm.output[43]) is not None)
+        self.assertTrue(re.search(
+            r"^INFO:root:Computed the statistics of [0-9]+ columns "
+            r"in [0-9]+\.[0-9]{3} seconds$",
+            cm.output[44]) is not None)
+        self.assertTrue(re.search(
+            r"^INFO:root:Created [1-9][0-9]* indexes in [0-9]+\.[0-9]{3} "
+            r"seconds using [0-9]+ bytes$",
+            cm.output[45]) is not None)
 
     def assertExtendedAddressesTable(self, cursor):
         cursor.execute(
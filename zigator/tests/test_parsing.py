@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+
+# Copyright (C) 2021 Dimitrios-Georgios Akestoridis
+#
+# This file is part of Zigator.
+#
+# Zigator is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 only,
+# as published by the Free Software Foundation.
+#
+# Zigator is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Zigator. If not, see <https://www.gnu.org/licenses/>.
+
+import json
+import os
+import shutil
+import signal
+import sqlite3
+import struct
+import subprocess
+import tempfile
+import time
+import unittest
+
+from zigator.parsing.stream import read_frames
+
+
+DIR_PATH = os.path.dirname(os.path.abspath(__file__))
+DATA_PATH = os.path.join(DIR_PATH, "data")
+
+PCAP_FILENAMES = sorted(os.listdir(DATA_PATH))
+
+# Define the maximum number of seconds to wait for a watched directory
+WATCH_TIMEOUT = 120.0
+
+COMPARED_TABLES = [
+    "packets",
+    "networks",
+    "short_addresses",
+    "extended_addresses",
+    "pairs",
+]
+
+
+class TestParsing(unittest.TestCase):
+    def setUp(self):
+        # Each test uses its own configuration directory with the keys
+        # that decrypt the test data
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.env = dict(os.environ, HOME=self.tmp_dir.name)
+        config_dirpath = os.path.join(self.tmp_dir.name, ".config", "zigator")
+        os.makedirs(config_dirpath)
+        for (filename, entry) in [
+            ("network-keys.tsv", "11111111111111111111111111111111\ttest_1"),
+            ("link-keys.tsv", "33333333333333333333333333333333\ttest_3"),
+            ("install-codes.tsv",
+             "55555555555555555555555555555555a9d1\ttest_5"),
+        ]:
+            with open(os.path.join(config_dirpath, filename), "w") as fp:
+                fp.write(entry + "\n")
+        self.pcap_dirpath = self.get_path("pcaps")
+        os.makedirs(self.pcap_dirpath)
+
+    def test_resume_interrupted_parse(self):
+        """Test resuming a parse that was interrupted."""
+        self.copy_pcap_files(PCAP_FILENAMES)
+        full_db = self.get_path("full.db")
+        self.zigator("parse", self.pcap_dirpath, full_db)
+
+        # Emulate a parse whose last pcap files were not completed
+        resumed_db = self.get_path("resumed.db")
+        shutil.copyfile(full_db, resumed_db)
+        connection = sqlite3.connect(resumed_db)
+        connection.executemany(
+            "DELETE FROM parsed_files WHERE pcap_filename=?",
+            [(filename,) for filename in PCAP_FILENAMES[-3:]])
+        connection.commit()
+        connection.close()
+
+        output = self.zigator("parse", self.pcap_dirpath, resumed_db,
+                              "--resume")
+        self.assertIn("Resuming the parsing process after 5 completed "
+                      "pcap files", output)
+        self.assertIn("Skipping 5 pcap files that were already parsed",
+                      output)
+        self.assertSameTables(full_db, resumed_db)
+        self.assertEqual(
+            self.fetch_table(resumed_db, "parsed_files"),
+            self.fetch_table(full_db, "parsed_files"))
+
+        # The parsing state is stored as JSON text
+        for (name, state) in self.fetch_table(resumed_db, "parsing_state"):
+            self.assertIsInstance(json.loads(state), dict)
+
+    def test_resume_new_pcap_files(self):
+        """Test resuming a parse after more pcap files were captured."""
+        self.copy_pcap_files(PCAP_FILENAMES[:4])
+        resumed_db = self.get_path("resumed.db")
+        self.zigator("parse", self.pcap_dirpath, resumed_db)
+        self.copy_pcap_files(PCAP_FILENAMES[4:])
+        self.zigator("parse", self.pcap_dirpath, resumed_db, "--resume")
+
+        full_db = self.get_path("full.db")
+        self.zigator("parse", self.pcap_dirpath, full_db)
+        self.assertSameTables(full_db, resumed_db)
+
+    def test_resume_without_progress(self):
+        """Test resuming a parse of a database without any progress."""
+        self.copy_pcap_files(PCAP_FILENAMES)
+        db_filepath = self.get_path("full.db")
+        self.zigator("parse", self.pcap_dirpath, db_filepath)
+        connection = sqlite3.connect(db_filepath)
+        connection.execute("DROP TABLE parsed_files")
+        connection.commit()
+        connection.close()
+
+        output = self.zigator("parse", self.pcap_dirpath, db_filepath,
+                              "--resume", returncode=1)
+        self.assertIn("does not contain any parsing progress", output)
+
+    def test_parse_multiple_workers(self):
+        """Test merging the registries of several parsing processes."""
+        self.copy_pcap_files(PCAP_FILENAMES)
+        single_db = self.get_path("single.db")
+        self.zigator("parse", self.pcap_dirpath, single_db,
+                     "--num_workers", "1")
+        multiple_db = self.get_path("multiple.db")
+        self.zigator("parse", self.pcap_dirpath, multiple_db,
+                     "--num_workers", "3")
+        self.assertSameTables(single_db, multiple_db)
+
+    def test_watch_directory(self):
+        """Test parsing pcap files as they are closed in a directory."""
+        self.copy_pcap_files(PCAP_FILENAMES[:5])
+        watched_db = self.get_path("watched.db")
+        log_filepath = self.get_path("watch.log")
+        with open(log_filepath, "w+") as fp:
+            p = subprocess.Popen(
+                ["zigator", "parse", self.pcap_dirpath, watched_db,
+                 "--watch", "--watch_delay", "0.2"],
+                env=self.env,
+                stderr=fp)
+            try:
+                self.wait_for_parsed_files(watched_db, 5, log_filepath)
+                self.copy_pcap_files(PCAP_FILENAMES[5:])
+                self.wait_for_parsed_files(watched_db, 8, log_filepath)
+            finally:
+                p.send_signal(signal.SIGINT)
+                p.wait(WATCH_TIMEOUT)
+            fp.seek(0)
+            output = fp.read()
+        self.assertEqual(p.returncode, 0, output)
+        self.assertIn("Stopped watching", output)
+
+        full_db = self.get_path("full.db")
+        self.zigator("parse", self.pcap_dirpath, full_db)
+        self.assertSameTables(full_db, watched_db)
+
+    def test_dedup_overlapping_sniffers(self):
+        """Test skipping packets that were captured by two sniffers."""
+        sensor_dirpaths = self.make_sensor_dirpaths(
+            PCAP_FILENAMES[3:7],
+            PCAP_FILENAMES[4:6])
+        dedup_db = self.get_path("dedup.db")
+        output = self.zigator("parse", self.pcap_dirpath, dedup_db,
+                              "--dedup_tolerance", "0.5")
+        self.assertIn("Skipped 11 duplicate packets", output)
+        self.assertIn("Skipped 1 duplicate packets", output)
+
+        # Only the packets of the first sniffer should have been stored
+        first_db = self.get_path("first.db")
+        self.zigator("parse", sensor_dirpaths[0], first_db)
+        self.assertSameTables(first_db, dedup_db)
+
+        # Without a tolerance, the packets of both sniffers are stored
+        all_db = self.get_path("all.db")
+        self.zigator("parse", self.pcap_dirpath, all_db)
+        self.assertEqual(
+            len(self.fetch_table(all_db, "packets")),
+            len(self.fetch_table(first_db, "packets")) + 12)
+
+    def test_dedup_parsed_pcap_files(self):
+        """Test skipping packets that were captured by parsed pcap files."""
+        sensor_dirpaths = self.make_sensor_dirpaths(PCAP_FILENAMES[3:7], [])
+        dedup_db = self.get_path("dedup.db")
+        self.zigator("parse", self.pcap_dirpath, dedup_db)
+        self.copy_pcap_files(PCAP_FILENAMES[4:6], sensor_dirpaths[1])
+        output = self.zigator("parse", self.pcap_dirpath, dedup_db,
+                              "--resume", "--dedup_tolerance", "0.5")
+        self.assertIn("Skipped 11 duplicate packets", output)
+
+        first_db = self.get_path("first.db")
+        self.zigator("parse", sensor_dirpaths[0], first_db)
+        self.assertSameTables(first_db, dedup_db)
+
+    def test_merge_pcaps(self):
+        """Test merging the pcap files of multiple sensors."""
+        sensor_dirpaths = self.make_sensor_dirpaths(
+            PCAP_FILENAMES[2:4],
+            PCAP_FILENAMES[4:6])
+        merged_filepath = self.get_path("merged.pcap")
+        output = self.zigator("merge-pcaps", self.pcap_dirpath,
+                              merged_filepath)
+        self.assertIn("Merged 40 packets from 4 pcap files", output)
+
+        # The merged pcap file contains the same frames in chronological
+        # order, which results in the same parsed packets
+        merged_frames = [
+            (pkt_time, pkt_bytes)
+            for (pkt_time, _, _, pkt_bytes, _) in read_frames(merged_filepath)
+        ]
+        self.assertEqual(
+            [frame[0] for frame in merged_frames],
+            sorted(frame[0] for frame in merged_frames))
+        sensor_frames = []
+        for dirpath in sensor_dirpaths:
+            for filename in os.listdir(dirpath):
+                sensor_frames.extend(
+                    (pkt_time, pkt_bytes)
+                    for (pkt_time, _, _, pkt_bytes, _) in read_frames(
+                        os.path.join(dirpath, filename)))
+        self.assertEqual(sorted(merged_frames), sorted(sensor_frames))
+
+    def test_merge_pcaps_clock_offsets(self):
+        """Test correcting the clock offsets of sensors while merging."""
+        sensor_dirpaths = self.make_sensor_dirpaths(PCAP_FILENAMES[3:4], [])
+        shift_pcap_file(
+            os.path.join(DATA_PATH, PCAP_FILENAMES[3]),
+            os.path.join(sensor_dirpaths[1], PCAP_FILENAMES[3]),
+            250000)
+        merged_filepath = self.get_path("merged.pcap")
+        output = self.zigator("merge-pcaps", self.pcap_dirpath,
+                              merged_filepath, "--correct_clocks")
+        self.assertIn("Estimated a clock offset of -0.250000000 seconds",
+                      output)
+
+        # Each frame was captured by both sensors at the same time
+        merged_frames = [
+            (pkt_time, pkt_bytes)
+            for (pkt_time, _, _, pkt_bytes, _) in read_frames(merged_filepath)
+        ]
+        self.assertEqual(len(merged_frames), 30)
+        for i in range(0, len(merged_frames), 2):
+            self.assertEqual(merged_frames[i], merged_frames[i + 1])
+
+    def test_merge_pcaps_before_epoch(self):
+        """Test merging packets whose corrected times precede the epoch."""
+        sensor_dirpaths = self.make_sensor_dirpaths(
+            [],
+            PCAP_FILENAMES[2:4])
+        # The clock of the first sensor started shortly before the capture
+        shift_pcap_file(
+            os.path.join(DATA_PATH, PCAP_FILENAMES[3]),
+            os.path.join(sensor_dirpaths[0], PCAP_FILENAMES[3]),
+            -1599996672000000)
+        merged_filepath = self.get_path("merged.pcap")
+        output = self.zigator("merge-pcaps", self.pcap_dirpath,
+                              merged_filepath, "--correct_clocks",
+                              "--max_clock_offset", "2000000000")
+        self.assertIn("The times of 13 packets preceded the epoch", output)
+        self.assertIn("Merged 43 packets from 3 pcap files", output)
+
+        # The earlier packets of the second sensor are clamped to zero
+        pkt_times = [frame[0] for frame in read_frames(merged_filepath)]
+        self.assertEqual(pkt_times[:13], [0] * 13)
+        self.assertEqual(pkt_times, sorted(pkt_times))
+
+    def test_merge_pcaps_without_packets(self):
+        """Test merging a directory without any pcap files."""
+        merged_filepath = self.get_path("merged.pcap")
+        output = self.zigator("merge-pcaps", self.pcap_dirpath,
+                              merged_filepath, returncode=1)
+        self.assertIn("No packets were found", output)
+        self.assertFalse(os.path.exists(merged_filepath))
+        self.assertFalse(os.path.exists(merged_filepath + ".tmp"))
+
+    def test_merge_pcaps_wrong_data_link_type(self):
+        """Test merging pcap files with different data link types."""
+        self.make_sensor_dirpaths(PCAP_FILENAMES[0:1], PCAP_FILENAMES[2:3])
+        merged_filepath = self.get_path("merged.pcap")
+        with open(merged_filepath, "wb") as fp:
+            fp.write(b"previous contents")
+        output = self.zigator("merge-pcaps", self.pcap_dirpath,
+                              merged_filepath, returncode=1)
+        self.assertIn("has a different data link type", output)
+
+        # The previous output file is left intact
+        with open(merged_filepath, "rb") as fp:
+            self.assertEqual(fp.read(), b"previous contents")
+        self.assertFalse(os.path.exists(merged_filepath + ".tmp"))
+
+    def get_path(self, filename):
+        return os.path.join(self.tmp_dir.name, filename)
+
+    def copy_pcap_files(self, filenames, dirpath=None):
+        if dirpath is None:
+            dirpath = self.pcap_dirpath
+        for filename in filenames:
+            shutil.copy(os.path.join(DATA_PATH, filename), dirpath)
+
+    def make_sensor_dirpaths(self, *sensor_filenames):
+        # The pcap files of each sensor are stored in a separate directory
+        sensor_dirpaths = []
+        for (i, filenames) in enumerate(sensor_filenames):
+            dirpath = os.path.join(self.pcap_dirpath, "sensor{}".format(i))
+            os.makedirs(dirpath)
+            self.copy_pcap_files(filenames, dirpath)
+            sensor_dirpaths.append(dirpath)
+        return sensor_dirpaths
+
+    def zigator(self, *args, returncode=0):
+        cp = subprocess.run(["zigator"] + list(args), env=self.env,
+                            capture_output=True)
+        output = cp.stderr.decode()
+        self.assertEqual(cp.returncode, returncode, output)
+        return output
+
+    def wait_for_parsed_files(self, db_filepath, num_files, log_filepath):
+        # Each detected batch of pcap files is completed once the derived
+        # information of its packets is updated
+        start_time = time.time()
+        while time.time() - start_time < WATCH_TIMEOUT:
+            with open(log_filepath) as fp:
+                output = fp.read()
+            try:
+                connection = sqlite3.connect(db_filepath)
+                parsed_files = connection.execute(
+                    "SELECT COUNT(*) FROM parsed_files").fetchall()[0][0]
+                connection.close()
+            except sqlite3.OperationalError:
+                # The database is not initialized or is being written
+                parsed_files = None
+            if (parsed_files == num_files
+                    and output.count("closed pcap files\n") == output.count(
+                        "Updated the derived information")):
+                return
+            time.sleep(0.2)
+        self.fail("Expected {} parsed pcap files".format(num_files))
+
+    def fetch_table(self, db_filepath, tablename):
+        connection = sqlite3.connect(db_filepath)
+        cursor = connection.cursor()
+        cursor.execute("SELECT * FROM {}".format(tablename))
+        num_columns = len(cursor.description)
+        cursor.execute("SELECT * FROM {} ORDER BY {}".format(
+            tablename,
+            ", ".join(str(i) for i in range(1, num_columns + 1))))
+        rows = cursor.fetchall()
+        cursor.close()
+        connection.close()
+        return rows
+
+    def assertSameTables(self, expected_db, obtained_db):
+        for tablename in COMPARED_TABLES:
+            expected_rows = self.fetch_table(expected_db, tablename)
+            self.assertGreater(len(expected_rows), 0)
+            self.assertEqual(
+                self.fetch_table(obtained_db, tablename),
+                expected_rows,
+                tablename)
+
+
+def shift_pcap_file(in_filepath, out_filepath, shift):
+    """Copy a pcap file while delaying its packets by some microseconds."""
+    with open(in_filepath, "rb") as fp:
+        data = fp.read()
+    records = [data[:24]]
+    offset = 24
+    while offset < len(data):
+        ts_sec, ts_usec, incl_len, orig_len = struct.unpack(
+            "<IIII", data[offset:offset + 16])
+        ts_sec += (ts_usec + shift) // 1000000
+        ts_usec = (ts_usec + shift) % 1000000
+        records.append(struct.pack("<IIII", ts_sec, ts_usec, incl_len,
+                                   orig_len))
+        records.append(data[offset + 16:offset + 16 + incl_len])
+        offset += 16 + incl_len
+    with open(out_filepath, "wb") as fp:
+        fp.write(b"".join(records))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+
+# Copyright (C) 2021 Dimitrios-Georgios Akestoridis
+#
+# This file is part of Zigator.
+#
+# Zigator is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 only,
+# as published by the Free Software Foundation.
+#
+# Zigator is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Zigator. If not, see <https://www.gnu.org/licenses/>.
+
+import unittest
+
+from zigator import registry
+from zigator import serialization
+
+
+class TestRegistry(unittest.TestCase):
+    def test_record_equality(self):
+        """Test comparing records with each other and other objects."""
+        self.assertEqual(
+            registry.NetworkRecord([0x0123456789abcdef], 1.0, 2.0),
+            registry.NetworkRecord({0x0123456789abcdef}, 1.0, 2.0))
+        self.assertNotEqual(
+            registry.NetworkRecord([0x0123456789abcdef], 1.0, 2.0),
+            registry.NetworkRecord([0x0123456789abcdef], 1.0, 3.0))
+        self.assertEqual(
+            registry.AddressRecord([(0x1234, 0x0001)], ["FFD"], [], None,
+                                   None),
+            registry.AddressRecord([(0x1234, 0x0001)], ["FFD"], [], None,
+                                   None))
+        self.assertEqual(registry.PairRecord(1.0, 2.0),
+                         registry.PairRecord(1.0, 2.0))
+
+        # Records are never equal to objects of other classes
+        self.assertNotEqual(registry.PairRecord(1.0, 2.0), (1.0, 2.0))
+        self.assertNotEqual(registry.PairRecord(None, None), None)
+        self.assertNotEqual(
+            registry.PairRecord(1.0, 2.0),
+            registry.NetworkRecord([], 1.0, 2.0))
+
+        # Records are mutable, so they cannot be hashed
+        for record in [
+            registry.NetworkRecord([], None, None),
+            registry.AddressRecord([], [], [], None, None),
+            registry.PairRecord(None, None),
+        ]:
+            with self.assertRaises(TypeError):
+                hash(record)
+
+    def test_record_updates(self):
+        """Test updating the sets and timestamps of records."""
+        record = registry.AddressRecord([(0x1234, 0x0001)], [], [], 5.0, 6.0)
+        record.update([(0x1234, 0x0002)], ["RFD"], [], 4.0, 5.5)
+        record.update([], [], ["Zigbee End Device"], None, 7.0)
+        self.assertEqual(
+            record.to_tuple(),
+            (frozenset({(0x1234, 0x0001), (0x1234, 0x0002)}),
+             frozenset({"RFD"}),
+             frozenset({"Zigbee End Device"}),
+             4.0,
+             7.0))
+
+    def test_export_import_records(self):
+        """Test the compact representation of records."""
+        records = {
+            (0x1234, 0x0001): registry.AddressRecord(
+                [0x0123456789abcdef], ["FFD"], ["Zigbee Router"], 1.0, 2.0),
+            (0x1234, 0x0002): registry.AddressRecord(
+                [], [], [], None, None),
+        }
+        exported_records = registry.export_records(records)
+        self.assertEqual(
+            registry.import_records(registry.AddressRecord,
+                                    exported_records),
+            records)
+
+        # The compact representation survives its serialization,
+        # which is how the parsing state is stored
+        self.assertEqual(
+            serialization.loads(serialization.dumps(exported_records)),
+            exported_records)
+
+        # Copies of records are independent of the original records
+        copied_records = registry.copy_records(records)
+        copied_records[(0x1234, 0x0002)].update([], ["RFD"], [], None, None)
+        self.assertNotEqual(copied_records, records)
+        self.assertEqual(
+            registry.import_records(registry.AddressRecord,
+                                    exported_records),
+            records)
+
+    def test_merge_records(self):
+        """Test merging the compact representation of records."""
+        records = {
+            0x1234: registry.NetworkRecord([0x01], 5.0, 6.0),
+        }
+        registry.merge_records(
+            records,
+            registry.NetworkRecord,
+            {
+                0x1234: (frozenset({0x02}), 4.0, 5.0),
+                0x5678: (frozenset(), None, None),
+            })
+        self.assertEqual(
+            registry.export_records(records),
+            {
+                0x1234: (frozenset({0x01, 0x02}), 4.0, 6.0),
+                0x5678: (frozenset(), None, None),
+            })
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -21,7 +21,7 @@ from .. import config
 from .network_graphs import network_graphs
 
 
-def main(db_filepath, out_dirpath):
+def main(db_filepath, out_dirpath, query_cache=False):
     """Visualize traffic stored in a database file."""
     # Sanity check
     if not os.path.isfile(db_filepath):
@@ -34,6 +34,8 @@ def main(db_filepath, out_dirpath):
     # Connect to the provided database
     logging.info("Visualizing traffic stored in the \"{}\" database..."
                  "".format(db_filepath))
+    if query_cache:
+        config.db.enable_query_caches()
     config.db.connect(db_filepath)
 
     # Write the results of each visualization method in the output directory
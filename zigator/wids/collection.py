@@ -45,64 +45,16 @@ def battery_percentage():
         )
         and config.entry["aps_cluster_id"] == "0x0001: Power Configuration"
     ):
-        if config.entry["zcl_cmd_id"] == "0x01: Read Attributes Response":
-            identifiers = config.entry[
-                "zcl_readattributesresponse_identifiers"
-            ].split(",")
-            statuses = config.entry[
-                "zcl_readattributesresponse_statuses"
-            ].split(",")
-            datatypes = config.entry[
-                "zcl_readattributesresponse_datatypes"
-            ].split(",")
-            values = config.entry[
-                "zcl_readattributesresponse_values"
-            ].split(",")
+        row_data = {
+            "pkt_time": "{:.6f}".format(config.entry["pkt_time"]),
+            "srcpanid": config.entry["der_mac_srcpanid"],
+            "srcshortaddr": config.entry["der_mac_srcshortaddr"],
+        }
+        for attribute in config.db.get_zcl_attributes(config.entry):
             if (
-                len(identifiers) != len(statuses)
-                or len(identifiers) != len(datatypes)
-                or len(identifiers) != len(values)
+                attribute["attribute_id"] == "0x0021"
+                and attribute["datatype"] == "0x20: Unsigned 8-bit integer"
             ):
+                row_data["percentage"] = int(attribute["value"], 16) / 2.0
+                config.db.insert("battery_percentages", row_data)
                 return
-            row_data = {
-                "pkt_time": "{:.6f}".format(config.entry["pkt_time"]),
-                "srcpanid": config.entry["der_mac_srcpanid"],
-                "srcshortaddr": config.entry["der_mac_srcshortaddr"],
-            }
-            for i in range(len(identifiers)):
-                if (
-                    identifiers[i] == "0x0021"
-                    and statuses[i] == "0x00: SUCCESS"
-                    and datatypes[i] == "0x20: Unsigned 8-bit integer"
-                ):
-                    row_data["percentage"] = int(values[i], 16) / 2.0
-                    config.db.insert("battery_percentages", row_data)
-                    return
-        elif config.entry["zcl_cmd_id"] == "0x0a: Report Attributes":
-            identifiers = config.entry[
-                "zcl_reportattributes_identifiers"
-            ].split(",")
-            datatypes = config.entry[
-                "zcl_reportattributes_datatypes"
-            ].split(",")
-            data = config.entry[
-                "zcl_reportattributes_data"
-            ].split(",")
-            if (
-                len(identifiers) != len(datatypes)
-                or len(identifiers) != len(data)
-            ):
-                return
-            row_data = {
-                "pkt_time": "{:.6f}".format(config.entry["pkt_time"]),
-                "srcpanid": config.entry["der_mac_srcpanid"],
-                "srcshortaddr": config.entry["der_mac_srcshortaddr"],
-            }
-            for i in range(len(identifiers)):
-                if (
-                    identifiers[i] == "0x0021"
-                    and datatypes[i] == "0x20: Unsigned 8-bit integer"
-                ):
-                    row_data["percentage"] = int(data[i], 16) / 2.0
-                    config.db.insert("battery_percentages", row_data)
-                    return
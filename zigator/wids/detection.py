@@ -125,33 +125,14 @@ def low_battery(panid):
                config.entry["nwk_srcshortaddr"]),
         }
         if config.entry["zcl_cmd_id"] == "0x01: Read Attributes Response":
-            identifiers = config.entry[
-                "zcl_readattributesresponse_identifiers"
-            ].split(",")
-            statuses = config.entry[
-                "zcl_readattributesresponse_statuses"
-            ].split(",")
-            datatypes = config.entry[
-                "zcl_readattributesresponse_datatypes"
-            ].split(",")
-            values = config.entry[
-                "zcl_readattributesresponse_values"
-            ].split(",")
-            if (
-                len(identifiers) != len(statuses)
-                or len(identifiers) != len(datatypes)
-                or len(identifiers) != len(values)
-            ):
-                return
-            for i in range(len(identifiers)):
+            for attribute in config.db.get_zcl_attributes(config.entry):
                 if (
-                    identifiers[i] == "0x0002"
-                    and statuses[i] == "0x00: SUCCESS"
-                    and datatypes[i] == "0x19: 16-bit bitmap"
+                    attribute["attribute_id"] == "0x0002"
+                    and attribute["datatype"] == "0x19: 16-bit bitmap"
                     and (
                         (
                             int.from_bytes(
-                                bytes.fromhex(values[i][2:]),
+                                bytes.fromhex(attribute["value"][2:]),
                                 byteorder="little",
                             )
                             >> 3
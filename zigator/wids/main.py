@@ -37,7 +37,10 @@ from . import (
     detection,
     server,
 )
-from .. import config
+from .. import (
+    config,
+    registry,
+)
 from ..parsing.derive_info import derive_info
 from ..parsing.phy_fields import phy_fields
 
@@ -347,19 +350,13 @@ def check_zip_files():
 def parser(preparsing_queue, postparsing_queue):
     signal.signal(signal.SIGINT, signal.SIG_IGN)
 
-    prev_network_keys = deepcopy(config.network_keys)
-    prev_link_keys = deepcopy(config.link_keys)
-    prev_networks = deepcopy(config.networks)
-    prev_short_addresses = deepcopy(config.short_addresses)
-    prev_extended_addresses = deepcopy(config.extended_addresses)
-    prev_pairs = deepcopy(config.pairs)
-
     while True:
         msg_type, msg_obj = preparsing_queue.get()
         if msg_type == config.PKT_MSG:
             pkt, pcap_filepath, pkt_num = msg_obj
 
             config.reset_entries()
+            config.reset_touched_entries()
             head, tail = os.path.split(os.path.abspath(pcap_filepath))
             config.entry["pcap_directory"] = head
             config.entry["pcap_filename"] = tail
@@ -370,54 +367,8 @@ def parser(preparsing_queue, postparsing_queue):
                 derive_info()
 
             postparsing_queue.put((config.PKT_MSG, deepcopy(config.entry)))
-            if config.network_keys != prev_network_keys:
-                new_network_keys = {}
-                for key_name in config.network_keys.keys():
-                    if key_name not in prev_network_keys.keys():
-                        key_bytes = config.network_keys[key_name]
-                        prev_network_keys[key_name] = key_bytes
-                        new_network_keys[key_name] = key_bytes
-                if len(new_network_keys.keys()) > 0:
-                    postparsing_queue.put(
-                        (config.NETWORK_KEYS_MSG, deepcopy(new_network_keys)),
-                    )
-            if config.link_keys != prev_link_keys:
-                new_link_keys = {}
-                for key_name in config.link_keys.keys():
-                    if key_name not in prev_link_keys.keys():
-                        key_bytes = config.link_keys[key_name]
-                        prev_link_keys[key_name] = key_bytes
-                        new_link_keys[key_name] = key_bytes
-                if len(new_link_keys.keys()) > 0:
-                    postparsing_queue.put(
-                        (config.LINK_KEYS_MSG, deepcopy(new_link_keys)),
-                    )
-            if config.networks != prev_networks:
-                prev_networks = deepcopy(config.networks)
-                postparsing_queue.put(
-                    (config.NETWORKS_MSG, deepcopy(prev_networks)),
-                )
-            if config.short_addresses != prev_short_addresses:
-                prev_short_addresses = deepcopy(config.short_addresses)
-                postparsing_queue.put(
-                    (
-                        config.SHORT_ADDRESSES_MSG,
-                        deepcopy(prev_short_addresses),
-                    ),
-                )
-            if config.extended_addresses != prev_extended_addresses:
-                prev_extended_addresses = deepcopy(config.extended_addresses)
-                postparsing_queue.put(
-                    (
-                        config.EXTENDED_ADDRESSES_MSG,
-                        deepcopy(prev_extended_addresses),
-                    ),
-                )
-            if config.pairs != prev_pairs:
-                prev_pairs = deepcopy(config.pairs)
-                postparsing_queue.put(
-                    (config.PAIRS_MSG, deepcopy(prev_pairs)),
-                )
+            for msg in config.get_touched_entries_msgs():
+                postparsing_queue.put(msg)
         elif msg_type == config.NETWORK_KEYS_MSG:
             for key_name in msg_obj.keys():
                 return_msg = config.add_new_key(
@@ -427,7 +378,6 @@ def parser(preparsing_queue, postparsing_queue):
                 )
                 if return_msg is not None:
                     logging.warning(return_msg)
-            prev_network_keys = deepcopy(config.network_keys)
         elif msg_type == config.LINK_KEYS_MSG:
             for key_name in msg_obj.keys():
                 return_msg = config.add_new_key(
@@ -437,7 +387,6 @@ def parser(preparsing_queue, postparsing_queue):
                 )
                 if return_msg is not None:
                     logging.warning(return_msg)
-            prev_link_keys = deepcopy(config.link_keys)
         elif msg_type == config.RETURN_MSG:
             postparsing_queue.put((msg_type, msg_obj))
             break
@@ -519,16 +468,32 @@ def gatherer(
                             logging.warning(return_msg)
             elif msg_type == config.NETWORKS_MSG:
                 with networks_lock:
-                    config.networks = msg_obj
+                    registry.merge_records(
+                        config.networks,
+                        registry.NetworkRecord,
+                        msg_obj,
+                    )
             elif msg_type == config.SHORT_ADDRESSES_MSG:
                 with short_addresses_lock:
-                    config.short_addresses = msg_obj
+                    registry.merge_records(
+                        config.short_addresses,
+                        registry.AddressRecord,
+                        msg_obj,
+                    )
             elif msg_type == config.EXTENDED_ADDRESSES_MSG:
                 with extended_addresses_lock:
-                    config.extended_addresses = msg_obj
+                    registry.merge_records(
+                        config.extended_addresses,
+                        registry.AddressRecord,
+                        msg_obj,
+                    )
             elif msg_type == config.PAIRS_MSG:
                 with pairs_lock:
-                    config.pairs = msg_obj
+                    registry.merge_records(
+                        config.pairs,
+                        registry.PairRecord,
+                        msg_obj,
+                    )
             elif msg_type == config.RETURN_MSG:
                 if num_uncommitted_entries > 0:
                     config.db.commit()
@@ -18,18 +18,21 @@ import cherrypy
 import logging
 import os
 import psutil
-import sqlite3
 import string
 from copy import deepcopy
 from datetime import datetime
 from glob import glob
 from time import time
 
-from .. import config
+from .. import (
+    config,
+    registry,
+)
 
 SENSOR_ID = None
 OUTPUT_DIRECTORY = None
 DB_FILEPATH = None
+DB_PRAGMAS = {"query_only": 1}
 NETWORK_KEYS_LOCK = None
 LINK_KEYS_LOCK = None
 NETWORKS_LOCK = None
@@ -176,22 +179,20 @@ class NetworksService(object):
         networks_list = []
         with NETWORKS_LOCK:
             for panid in config.networks.keys():
-                epidset_members = sorted(
-                    list(config.networks[panid]["epidset"]),
-                )
+                record = config.networks[panid]
+                epidset_members = [
+                    registry.format_extendedaddr(epid)
+                    for epid in sorted(list(record.epidset))
+                ]
                 earliest_timestamp = None
-                if config.networks[panid]["earliest"] is not None:
-                    earliest_timestamp = "{:.6f}".format(
-                        config.networks[panid]["earliest"],
-                    )
+                if record.earliest is not None:
+                    earliest_timestamp = "{:.6f}".format(record.earliest)
                 latest_timestamp = None
-                if config.networks[panid]["latest"] is not None:
-                    latest_timestamp = "{:.6f}".format(
-                        config.networks[panid]["latest"],
-                    )
+                if record.latest is not None:
+                    latest_timestamp = "{:.6f}".format(record.latest)
                 networks_list.append(
                     {
-                        "panid": panid,
+                        "panid": registry.format_shortaddr(panid),
                         "epidset": ";".join(epidset_members),
                         "earliest": earliest_timestamp,
                         "latest": latest_timestamp,
@@ -207,35 +208,23 @@ class ShortAddressesService(object):
         short_addresses_list = []
         with SHORT_ADDRESSES_LOCK:
             for (panid, saddr) in config.short_addresses.keys():
-                altset_members = sorted(
-                    list(config.short_addresses[(panid, saddr)]["altset"]),
-                )
-                macset_members = sorted(
-                    list(config.short_addresses[(panid, saddr)]["macset"]),
-                )
-                nwkset_members = sorted(
-                    list(config.short_addresses[(panid, saddr)]["nwkset"]),
-                )
+                record = config.short_addresses[(panid, saddr)]
+                altset_members = [
+                    registry.format_extendedaddr(eaddr)
+                    for eaddr in sorted(list(record.altset))
+                ]
+                macset_members = sorted(list(record.macset))
+                nwkset_members = sorted(list(record.nwkset))
                 earliest_timestamp = None
-                if (
-                    config.short_addresses[(panid, saddr)]["earliest"]
-                    is not None
-                ):
-                    earliest_timestamp = "{:.6f}".format(
-                        config.short_addresses[(panid, saddr)]["earliest"],
-                    )
+                if record.earliest is not None:
+                    earliest_timestamp = "{:.6f}".format(record.earliest)
                 latest_timestamp = None
-                if (
-                    config.short_addresses[(panid, saddr)]["latest"]
-                    is not None
-                ):
-                    latest_timestamp = "{:.6f}".format(
-                        config.short_addresses[(panid, saddr)]["latest"],
-                    )
+                if record.latest is not None:
+                    latest_timestamp = "{:.6f}".format(record.latest)
                 short_addresses_list.append(
                     {
-                        "panid": panid,
-                        "shortaddr": saddr,
+                        "panid": registry.format_shortaddr(panid),
+                        "shortaddr": registry.format_shortaddr(saddr),
                         "altset": ";".join(altset_members),
                         "macset": ";".join(macset_members),
                         "nwkset": ";".join(nwkset_members),
@@ -253,30 +242,22 @@ class ExtendedAddressesService(object):
         extended_addresses_list = []
         with EXTENDED_ADDRESSES_LOCK:
             for eaddr in config.extended_addresses.keys():
+                record = config.extended_addresses[eaddr]
                 altset_members = [
-                    str(localaddr) for localaddr in sorted(
-                        list(config.extended_addresses[eaddr]["altset"]),
-                    )
+                    registry.format_localaddr(localaddr)
+                    for localaddr in sorted(list(record.altset))
                 ]
-                macset_members = sorted(
-                    list(config.extended_addresses[eaddr]["macset"]),
-                )
-                nwkset_members = sorted(
-                    list(config.extended_addresses[eaddr]["nwkset"]),
-                )
+                macset_members = sorted(list(record.macset))
+                nwkset_members = sorted(list(record.nwkset))
                 earliest_timestamp = None
-                if config.extended_addresses[eaddr]["earliest"] is not None:
-                    earliest_timestamp = "{:.6f}".format(
-                        config.extended_addresses[eaddr]["earliest"],
-                    )
+                if record.earliest is not None:
+                    earliest_timestamp = "{:.6f}".format(record.earliest)
                 latest_timestamp = None
-                if config.extended_addresses[eaddr]["latest"] is not None:
-                    latest_timestamp = "{:.6f}".format(
-                        config.extended_addresses[eaddr]["latest"],
-                    )
+                if record.latest is not None:
+                    latest_timestamp = "{:.6f}".format(record.latest)
                 extended_addresses_list.append(
                     {
-                        "extendedaddr": eaddr,
+                        "extendedaddr": registry.format_extendedaddr(eaddr),
                         "altset": ";".join(altset_members),
                         "macset": ";".join(macset_members),
                         "nwkset": ";".join(nwkset_members),
@@ -294,17 +275,14 @@ class PairsService(object):
         pairs_list = []
         with PAIRS_LOCK:
             for (panid, saddr, daddr) in config.pairs.keys():
+                record = config.pairs[(panid, saddr, daddr)]
                 pairs_list.append(
                     {
-                        "panid": panid,
-                        "srcaddr": saddr,
-                        "dstaddr": daddr,
-                        "earliest": "{:.6f}".format(
-                            config.pairs[(panid, saddr, daddr)]["earliest"],
-                        ),
-                        "latest": "{:.6f}".format(
-                            config.pairs[(panid, saddr, daddr)]["latest"],
-                        ),
+                        "panid": registry.format_shortaddr(panid),
+                        "srcaddr": registry.format_shortaddr(saddr),
+                        "dstaddr": registry.format_shortaddr(daddr),
+                        "earliest": "{:.6f}".format(record.earliest),
+                        "latest": "{:.6f}".format(record.latest),
                     },
                 )
         return pairs_list
@@ -314,9 +292,8 @@ class PairsService(object):
 class PacketCountersService(object):
     @cherrypy.tools.json_out()
     def GET(self, last=None):
-        with sqlite3.connect(DB_FILEPATH) as connection:
-            connection.text_factory = str
-            cursor = connection.cursor()
+        with config.db.Database(DB_FILEPATH, DB_PRAGMAS) as database:
+            cursor = database.cursor
             pending_group = (
                 datetime
                 .fromtimestamp(time())
@@ -451,9 +428,8 @@ class PacketCountersService(object):
 class ByteCountersService(object):
     @cherrypy.tools.json_out()
     def GET(self, last=None):
-        with sqlite3.connect(DB_FILEPATH) as connection:
-            connection.text_factory = str
-            cursor = connection.cursor()
+        with config.db.Database(DB_FILEPATH, DB_PRAGMAS) as database:
+            cursor = database.cursor
             pending_group = (
                 datetime
                 .fromtimestamp(time())
@@ -590,9 +566,8 @@ class ByteCountersService(object):
 class MACSeqnumsService(object):
     @cherrypy.tools.json_out()
     def GET(self, last=None):
-        with sqlite3.connect(DB_FILEPATH) as connection:
-            connection.text_factory = str
-            cursor = connection.cursor()
+        with config.db.Database(DB_FILEPATH, DB_PRAGMAS) as database:
+            cursor = database.cursor
             if last is None:
                 cursor.execute(
                     "SELECT pkt_time, mac_seqnum, "
@@ -638,9 +613,8 @@ class MACSeqnumsService(object):
 class BeaconSeqnumsService(object):
     @cherrypy.tools.json_out()
     def GET(self, last=None):
-        with sqlite3.connect(DB_FILEPATH) as connection:
-            connection.text_factory = str
-            cursor = connection.cursor()
+        with config.db.Database(DB_FILEPATH, DB_PRAGMAS) as database:
+            cursor = database.cursor
             if last is None:
                 cursor.execute(
                     "SELECT pkt_time, mac_seqnum, "
@@ -686,9 +660,8 @@ class BeaconSeqnumsService(object):
 class NWKSeqnumsService(object):
     @cherrypy.tools.json_out()
     def GET(self, last=None):
-        with sqlite3.connect(DB_FILEPATH) as connection:
-            connection.text_factory = str
-            cursor = connection.cursor()
+        with config.db.Database(DB_FILEPATH, DB_PRAGMAS) as database:
+            cursor = database.cursor
             if last is None:
                 cursor.execute(
                     "SELECT pkt_time, nwk_seqnum, "
@@ -734,9 +707,8 @@ class NWKSeqnumsService(object):
 class NWKAUXSeqnumsService(object):
     @cherrypy.tools.json_out()
     def GET(self, last=None):
-        with sqlite3.connect(DB_FILEPATH) as connection:
-            connection.text_factory = str
-            cursor = connection.cursor()
+        with config.db.Database(DB_FILEPATH, DB_PRAGMAS) as database:
+            cursor = database.cursor
             if last is None:
                 cursor.execute(
                     "SELECT pkt_time, nwk_aux_framecounter, "
@@ -779,9 +751,8 @@ class NWKAUXSeqnumsService(object):
 class BatteryPercentagesService(object):
     @cherrypy.tools.json_out()
     def GET(self, last=None):
-        with sqlite3.connect(DB_FILEPATH) as connection:
-            connection.text_factory = str
-            cursor = connection.cursor()
+        with config.db.Database(DB_FILEPATH, DB_PRAGMAS) as database:
+            cursor = database.cursor
             if last is None:
                 cursor.execute(
                     "SELECT pkt_time, srcpanid, srcshortaddr, percentage "
@@ -814,9 +785,8 @@ class BatteryPercentagesService(object):
 class EventsService(object):
     @cherrypy.tools.json_out()
     def GET(self, last=None):
-        with sqlite3.connect(DB_FILEPATH) as connection:
-            connection.text_factory = str
-            cursor = connection.cursor()
+        with config.db.Database(DB_FILEPATH, DB_PRAGMAS) as database:
+            cursor = database.cursor
             if last is None:
                 cursor.execute(
                     "SELECT pkt_time, description "